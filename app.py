@@ -3,6 +3,9 @@ import argparse
 from app.utils.init_db import create_admin
 from app.utils.init_taxonomies import create_taxonomies, create_galaxies
 from app.utils.utils import get_modules_list
+from app.case.export_core import build_export_query, parse_export_args, export_ndjson, export_tar
+from app.utils.profiler import report_from_file
+from app.stats.stats_core import rollup_missing
 from flask import render_template, request, Response
 import json
 
@@ -25,6 +28,15 @@ parser.add_argument("-i", "--init_db", help="Initialise the db if it not exist",
 parser.add_argument("-r", "--recreate_db", help="Delete and initialise the db", action="store_true")
 parser.add_argument("-d", "--delete_db", help="Delete the db", action="store_true")
 parser.add_argument("-tg", "--taxo_galaxies", help="Add or update taxonomies and galaxies", action="store_true")
+parser.add_argument("-e", "--export", help="Export cases to a file, ndjson or gzip tar depending of --export_format")
+parser.add_argument("--export_format", help="Format of the export: ndjson or tar", choices=["ndjson", "tar"], default="ndjson")
+parser.add_argument("--completed", help="Export only completed (true) or ongoing (false) cases")
+parser.add_argument("--date_from", help="Export cases created from this date, %%Y-%%m-%%d")
+parser.add_argument("--date_to", help="Export cases created until this date, %%Y-%%m-%%d")
+parser.add_argument("--org_id", help="Export cases where this org is present")
+parser.add_argument("--tags", help="Export cases with one of these tags, comma separated")
+parser.add_argument("--stats_rollup", help="Roll up the statistics of the past days not rolled up yet", action="store_true")
+parser.add_argument("--profiler_report", help="Print the percentiles per endpoint of a query profiler log file")
 args = parser.parse_args()
 
 os.environ.setdefault('FLASKENV', 'development')
@@ -54,6 +66,27 @@ elif args.taxo_galaxies:
     with app.app_context():
         create_taxonomies()
         create_galaxies()
+elif args.stats_rollup:
+    with app.app_context():
+        print(f"[+] {rollup_missing()} days rolled up")
+elif args.profiler_report:
+    for endpoint in report_from_file(args.profiler_report):
+        print(json.dumps(endpoint))
+elif args.export:
+    with app.app_context():
+        filters = parse_export_args(vars(args))
+        if "message" in filters:
+            print(filters["message"])
+            sys.exit(1)
+        query = build_export_query(**filters)
+        if args.export_format == "tar":
+            with open(args.export, "wb") as write_file:
+                for chunk in export_tar(query):
+                    write_file.write(chunk)
+        else:
+            with open(args.export, "w") as write_file:
+                for line in export_ndjson(query):
+                    write_file.write(line)
 else:
     get_modules_list()
     app.run(host=app.config.get("FLASK_URL"), port=app.config.get("FLASK_PORT"))
\ No newline at end of file
@@ -32,6 +32,13 @@ def create_app():
     login_manager.login_view = "account.login"
     login_manager.init_app(app)
 
+    from .utils import profiler
+    profiler.init_app(app, db)
+
+    # Pick up the modules reloaded by another worker
+    from .utils.utils import MODULES
+    app.before_request(MODULES.check)
+
     from .main.home import home_blueprint
     from .account.account import account_blueprint
     from .case.case import case_blueprint
@@ -43,6 +50,7 @@ def create_app():
     from .connectors.connectors import connector_blueprint
     from .analyzer.analyzer import analyzer_blueprint
     from .custom_tags.custom_tags import custom_tags_blueprint
+    from .stats.stats import stats_blueprint
     app.register_blueprint(home_blueprint, url_prefix="/")
     app.register_blueprint(account_blueprint, url_prefix="/account")
     app.register_blueprint(case_blueprint, url_prefix="/case")
@@ -55,6 +63,7 @@ def create_app():
     app.register_blueprint(analyzer_blueprint, url_prefix="/analyzer")
     csrf.exempt(analyzer_blueprint)
     app.register_blueprint(custom_tags_blueprint, url_prefix="/custom_tags")
+    app.register_blueprint(stats_blueprint, url_prefix="/stats")
 
 
     from .case.case_api import api_case_blueprint
@@ -63,17 +72,23 @@ def create_app():
     from .tools.templating_api import api_templating_blueprint
     from .tools.importer_api import api_importer_blueprint
     from .my_assignment.my_assignment_api import api_assignment_blueprint
+    from .case.batch_api import api_batch_blueprint
+    from .stats.stats_api import api_stats_blueprint
     csrf.exempt(api_case_blueprint)
     csrf.exempt(api_task_blueprint)
     csrf.exempt(api_admin_blueprint)
     csrf.exempt(api_templating_blueprint)
     csrf.exempt(api_importer_blueprint)
     csrf.exempt(api_assignment_blueprint)
+    csrf.exempt(api_batch_blueprint)
+    csrf.exempt(api_stats_blueprint)
     app.register_blueprint(api_case_blueprint, url_prefix="/api/case")
     app.register_blueprint(api_task_blueprint, url_prefix="/api/task")
     app.register_blueprint(api_admin_blueprint, url_prefix="/api/admin")
     app.register_blueprint(api_templating_blueprint, url_prefix="/api/template")
     app.register_blueprint(api_importer_blueprint, url_prefix="/api/importer")
     app.register_blueprint(api_assignment_blueprint, url_prefix="/api/my_assignment")
+    app.register_blueprint(api_batch_blueprint, url_prefix="/api/batch")
+    app.register_blueprint(api_stats_blueprint, url_prefix="/api/stats")
 
     return app
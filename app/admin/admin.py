@@ -1,4 +1,4 @@
-from flask import Blueprint, jsonify, render_template, redirect, url_for, request, flash
+from flask import Blueprint, current_app, jsonify, render_template, redirect, url_for, request, flash
 from flask_login import (
     current_user,
     login_required,
@@ -8,6 +8,7 @@ from .form import RegistrationForm, CreateOrgForm, AdminEditUserFrom
 from . import admin_core as AdminModel
 from ..decorators import admin_required
 from ..utils.utils import form_to_dict
+from ..utils import profiler as Profiler
 
 admin_blueprint = Blueprint(
     'admin',
@@ -215,13 +216,14 @@ def get_taxonomies():
 def get_taxonomies_page():
     """Get taxonomies of a specific page"""
     page = request.args.get('page', 1, type=int)
-    return {"taxonomies": AdminModel.get_taxonomies_page(page)}
+    taxonomies, nb_pages = AdminModel.get_taxonomies_page(page, request.args.get('search'))
+    return {"taxonomies": taxonomies, "nb_pages": nb_pages}
 
 @admin_blueprint.route("/nb_page_taxo", methods=['GET'])
 @login_required
 def nb_page_taxo():
     """Get number of page to list all taxonomies"""
-    return {"nb_page": AdminModel.get_nb_page_taxo()}
+    return {"nb_page": AdminModel.get_nb_page_taxo(request.args.get('search'))}
 
 @admin_blueprint.route("/get_tags", methods=['GET'])
 @login_required
@@ -264,14 +266,14 @@ def get_galaxies():
 def get_galaxies_page():
     """Get galaxies of a specific page"""
     page = request.args.get('page', 1, type=int)
-    gal = AdminModel.get_galaxies_page(page)
-    return {"galaxies": gal}
+    galaxies, nb_pages = AdminModel.get_galaxies_page(page, request.args.get('search'))
+    return {"galaxies": galaxies, "nb_pages": nb_pages}
 
 @admin_blueprint.route("/nb_page_galaxies", methods=['GET'])
 @login_required
 def nb_page_galaxies():
     """Get number of page to list all galaxies"""
-    return {"nb_page": AdminModel.get_nb_page_galaxies()}
+    return {"nb_page": AdminModel.get_nb_page_galaxies(request.args.get('search'))}
 
 @admin_blueprint.route("/get_tags_galaxy", methods=['GET'])
 @login_required
@@ -299,3 +301,25 @@ def galaxy_status():
     galaxy_id = request.args.get('galaxy', type=int)
     AdminModel.galaxy_status(galaxy_id)
     return {"message":"Galaxy changed", "toast_class": "success-subtle"}, 200
+
+
+
+############
+# Profiler #
+############
+
+@admin_blueprint.route("/profiler", methods=['GET'])
+@login_required
+@admin_required
+def profiler():
+    """Query profiler's report page"""
+    return render_template("admin/profiler.html")
+
+@admin_blueprint.route("/profiler_report", methods=['GET'])
+@login_required
+@admin_required
+def profiler_report():
+    """Percentiles per endpoint of the requests seen by this worker"""
+    if not Profiler.is_enabled(current_app):
+        return {"message": "Query profiler is disabled, set QUERY_PROFILER in the config", "toast_class": "warning-subtle"}, 400
+    return {"endpoints": Profiler.get_report(current_app)}, 200
@@ -1,9 +1,12 @@
 import os
 from .. import db
-from ..db_class.db import Cluster, Galaxy, User, Role, Org, Case_Org, Task_User, Taxonomy
+from ..db_class.db import Cluster, Galaxy, User, Role, Org, Case_Org, Task_User, Taxonomy, Tags
+from sqlalchemy import func
 from ..utils.utils import generate_api_key
 import uuid
 
+PAGE_SIZE = 25
+
 
 def get_all_users():
     """Return all users"""
@@ -52,8 +55,14 @@ def get_all_user_org(org_id):
 def get_taxonomies():
     return [taxo.to_json() for taxo in Taxonomy.query.all()]
 
-def get_nb_page_taxo():
-    return int(len(get_taxonomies())/25)+1
+def build_taxonomy_query(search=None):
+    query = Taxonomy.query
+    if search:
+        query = query.filter(Taxonomy.name.ilike(f"%{search}%"))
+    return query
+
+def get_nb_page_taxo(search=None):
+    return _nb_page(build_taxonomy_query(search).count())
 
 def get_tags(taxonomy_id):
     return [tag.to_json() for tag in Taxonomy.query.get(taxonomy_id).tags]
@@ -72,8 +81,14 @@ def get_clusters():
 def get_clusters_galaxy(galaxy_id):
     return [cluster.to_json() for cluster in get_galaxy(galaxy_id).clusters]
 
-def get_nb_page_galaxies():
-    return int(len(get_galaxies()) / 25) + 1
+def build_galaxy_query(search=None):
+    query = Galaxy.query
+    if search:
+        query = query.filter(Galaxy.name.ilike(f"%{search}%"))
+    return query
+
+def get_nb_page_galaxies(search=None):
+    return _nb_page(build_galaxy_query(search).count())
 
 def get_tags_galaxy(galaxy_id):
     return [cluster.tag for cluster in get_galaxy(galaxy_id).clusters]
@@ -234,42 +249,31 @@ def delete_org_core(oid):
         return False
     
 
-def get_taxonomies_page(page):
-    nb_taxo = 25
-    to_give = nb_taxo * page
-    taxo_list = get_taxonomies()
-    
-    if to_give > len(taxo_list):
-        limit = len(taxo_list)
-    else:
-        limit = to_give
-    to_start = limit - nb_taxo
+def _nb_page(nb_rows):
+    return max(1, -(-nb_rows // PAGE_SIZE))
 
-    out_list = list()
-    for i in range(to_start, limit):
-        out_list.append(taxo_list[i])
-    return out_list
+def _count_by(column, ids):
+    """Count rows grouped by column for the given ids, in one query"""
+    return dict(db.session.query(column, func.count()).filter(column.in_(ids)).group_by(column).all())
+
+def get_taxonomies_page(page, search=None):
+    """Taxonomies of a page with their number of tags"""
+    query = build_taxonomy_query(search)
+    taxonomies = query.order_by(Taxonomy.id).limit(PAGE_SIZE).offset((max(page, 1) - 1) * PAGE_SIZE).all()
+    nb_tags = _count_by(Tags.taxonomy_id, [taxo.id for taxo in taxonomies])
+    return [{**taxo.to_json(), "nb_tags": nb_tags.get(taxo.id, 0)} for taxo in taxonomies], _nb_page(query.count())
 
 def taxonomy_status(taxonomy_id):
     taxo = Taxonomy.query.get(taxonomy_id)
     taxo.exclude = not taxo.exclude
     db.session.commit()
 
-def get_galaxies_page(page):
-    nb_galaxies = 25
-    to_give = nb_galaxies * page
-    galaxies_list = get_galaxies()
-    
-    if to_give > len(galaxies_list):
-        limit = len(galaxies_list)
-    else:
-        limit = to_give
-    to_start = limit - nb_galaxies
-
-    out_list = list()
-    for i in range(to_start, limit):
-        out_list.append(galaxies_list[i])
-    return out_list
+def get_galaxies_page(page, search=None):
+    """Galaxies of a page with their number of clusters"""
+    query = build_galaxy_query(search)
+    galaxies = query.order_by(Galaxy.name).limit(PAGE_SIZE).offset((max(page, 1) - 1) * PAGE_SIZE).all()
+    nb_clusters = _count_by(Cluster.galaxy_id, [galax.id for galax in galaxies])
+    return [{**galax.to_json(), "nb_clusters": nb_clusters.get(galax.id, 0)} for galax in galaxies], _nb_page(query.count())
 
 def galaxy_status(galaxy_id):
     gal = get_galaxy(galaxy_id)
@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 from dateutil import relativedelta
 import schedule
 import time
+import os
 
 from ..db_class.db import Case, Notification, Recurring_Notification
 
@@ -58,9 +59,29 @@ def job():
                 session.commit()
     print(f"[+] Finished. {cp} new notifications")
 
+
+def stats_job():
+    """Roll up the statistics of yesterday, the dashboard then reads past days from the rollups only"""
+    os.environ.setdefault('FLASKENV', 'development')
+    from .. import create_app
+    from ..stats.stats_core import rollup_missing
+    with create_app().app_context():
+        print(f"[+] {rollup_missing()} days of statistics rolled up")
+
+def mail_job():
+    """Send the mails left in the spool, a web worker only drains it once a new mail is queued"""
+    from ..utils.utils import MODULES, get_modules_list
+    get_modules_list()
+    if "email" in MODULES:
+        sent = MODULES["email"].drain_spool()
+        if sent:
+            print(f"[+] {sent} mails sent from the spool")
+
 # job()
 print("[+] Started...")
 schedule.every().day.at("02:00").do(job)
+schedule.every().day.at("00:10").do(stats_job)
+schedule.every().minute.do(mail_job)
 
 while True:
     schedule.run_pending()
@@ -0,0 +1,40 @@
+from flask import Blueprint, request
+from . import batch_core as BatchModel
+from . import case_core_api as CaseModelApi
+
+from flask_restx import Api, Resource
+from ..decorators import api_required, editor_required
+
+api_batch_blueprint = Blueprint('api_batch', __name__)
+api = Api(api_batch_blueprint,
+        title='flowintel API', 
+        description='API to manage a case management instance.', 
+        version='0.1', 
+        default='GenericAPI', 
+        default_label='Generic flowintel API', 
+        doc='/doc/'
+    )
+
+
+@api.route('/', methods=['POST'])
+@api.doc(description='Execute a list of operations on cases and tasks in one transaction')
+class Batch(Resource):
+    method_decorators = [editor_required, api_required]
+    @api.doc(params={
+        "operations": "Required. List of operations, each with an 'op' key: create_task (case_id, title...), "
+                      "change_status (task_id, status_id), assign_users (task_id, users_id), "
+                      "add_tags (case_id or task_id, tags, clusters), complete (case_id or task_id)"
+    })
+    def post(self):
+        current_user = CaseModelApi.get_user_api(request.headers)
+        if request.json and "operations" in request.json:
+            operations = request.json["operations"]
+            if not isinstance(operations, list):
+                return {"message": "'operations' need to be a list"}, 400
+            if len(operations) > BatchModel.MAX_OPERATIONS:
+                return {"message": f"Too many operations, max {BatchModel.MAX_OPERATIONS}"}, 400
+            results = BatchModel.run_batch(operations, current_user)
+            if type(results) == dict:
+                return results, 400
+            return {"results": results}, 200
+        return {"message": "Need to pass 'operations'"}, 400
@@ -0,0 +1,272 @@
+import uuid
+import logging
+import datetime
+
+from .. import db
+from ..db_class.db import *
+
+from . import common_core as CommonModel
+from . import order_core as OrderModel
+from . import case_core_api as CaseModelApi
+from ..custom_tags import custom_tags_core as CustomModel
+from ..utils import tagHelper as TagHelper
+
+
+OPERATIONS = ["create_task", "change_status", "assign_users", "add_tags", "complete"]
+MAX_OPERATIONS = 500
+
+logger = logging.getLogger("flowintel.batch")
+
+
+class BatchError(Exception):
+    pass
+
+
+class BatchContext:
+    """State shared by the operations of a batch"""
+    def __init__(self, operations, user):
+        self.user = user
+        self.now = datetime.datetime.now(tz=datetime.timezone.utc)
+        self.history = list()
+        self.notifications = list()
+        self.touched_cases = set()
+        self.touched_tasks = set()
+
+        case_ids = {op["case_id"] for op in operations if isinstance(op, dict) and str(op.get("case_id", "")).isdigit()}
+        task_ids = {op["task_id"] for op in operations if isinstance(op, dict) and str(op.get("task_id", "")).isdigit()}
+
+        self.tasks = {task.id: task for task in Task.query.filter(Task.id.in_(task_ids)).all()}
+        case_ids.update(task.case_id for task in self.tasks.values())
+        self.cases = {case.id: case for case in Case.query.filter(Case.id.in_(case_ids)).all()}
+
+        # Single permission resolution for the whole batch
+        if user.is_admin():
+            self.allowed_cases = set(self.cases)
+        else:
+            self.allowed_cases = {c_o.case_id for c_o in Case_Org.query.filter(Case_Org.org_id==user.org_id, Case_Org.case_id.in_(self.cases)).all()}
+
+        self.status = {status.name: status.id for status in Status.query.all()}
+
+    def get_case(self, case_id):
+        case = self.cases.get(int(case_id)) if str(case_id).isdigit() else None
+        if not case:
+            raise BatchError("Case not found")
+        if case.id not in self.allowed_cases:
+            raise BatchError("Permission denied")
+        return case
+
+    def get_task(self, task_id):
+        task = self.tasks.get(int(task_id)) if str(task_id).isdigit() else None
+        if not task:
+            raise BatchError("Task not found")
+        self.get_case(task.case_id)
+        return task
+
+    def notify(self, message, case_id, user_id, html_icon):
+        self.notifications.append(Notification(
+            message=message,
+            is_read=False,
+            user_id=user_id,
+            case_id=case_id,
+            creation_date=self.now,
+            html_icon=html_icon
+        ))
+
+
+def _create_task(op, ctx):
+    case = ctx.get_case(op.get("case_id"))
+    form_dict = CaseModelApi.verif_create_case_task(dict(op), False)
+    if "message" in form_dict:
+        raise BatchError(form_dict["message"])
+    for instance_name in form_dict["connectors"]:
+        instance = CommonModel.get_instance_by_name(instance_name)
+        if not User_Connector_Instance.query.filter_by(user_id=ctx.user.id, instance_id=instance.id).first():
+            raise BatchError(f"Connector '{instance_name}' not owned by the user")
+
+    case.nb_tasks = (case.nb_tasks or 0) + 1
+    task = Task(
+        uuid=str(uuid.uuid4()),
+        title=form_dict["title"],
+        description=form_dict["description"],
+        url=form_dict["url"],
+        creation_date=ctx.now,
+        last_modif=ctx.now,
+        deadline=CommonModel.deadline_check(form_dict["deadline_date"], form_dict["deadline_time"]),
+        case_id=case.id,
+        status_id=ctx.status.get("Created", 1),
+        case_order_id=case.nb_tasks,
+        completed=False,
+        nb_notes=0
+    )
+    db.session.add(task)
+    db.session.flush()
+
+    for tag in form_dict["tags"]:
+        db.session.add(Task_Tags(tag_id=CommonModel.get_tag(tag).id, task_id=task.id))
+    for cluster in form_dict["clusters"]:
+        db.session.add(Task_Galaxy_Tags(cluster_id=CommonModel.get_cluster_by_name(cluster).id, task_id=task.id))
+    for instance_name in form_dict["connectors"]:
+        db.session.add(Task_Connector_Instance(
+            task_id=task.id,
+            instance_id=CommonModel.get_instance_by_name(instance_name).id,
+            identifier=form_dict["identifier"].get(instance_name) if form_dict["identifier"] else None
+        ))
+    for custom_tag_name in form_dict["custom_tags"]:
+        db.session.add(Task_Custom_Tags(task_id=task.id, custom_tag_id=CustomModel.get_custom_tag_by_name(custom_tag_name).id))
+
+    ctx.tasks[task.id] = task
+    ctx.touched_cases.add(case.id)
+    ctx.history.append((case.uuid, f"Task '{task.title}' Created"))
+    return {"task_id": task.id}
+
+
+def _change_status(op, ctx):
+    task = ctx.get_task(op.get("task_id"))
+    if op.get("status_id") not in ctx.status.values():
+        raise BatchError("Status not found")
+    task.status_id = op["status_id"]
+    ctx.touched_tasks.add(task.id)
+    ctx.history.append((ctx.cases[task.case_id].uuid, f"Status changed for task '{task.title}'"))
+    return {"task_id": task.id}
+
+
+def _assign_users(op, ctx):
+    task = ctx.get_task(op.get("task_id"))
+    users_id = op.get("users_id")
+    if not isinstance(users_id, list) or not all(str(user_id).isdigit() for user_id in users_id):
+        raise BatchError("Need to pass 'users_id' as a list of id")
+    users_id = [int(user_id) for user_id in users_id]
+    users = {user.id: user for user in User.query.filter(User.id.in_(users_id)).all()}
+    unknown = [user_id for user_id in users_id if user_id not in users]
+    if unknown:
+        raise BatchError(f"Users not found: {unknown}")
+
+    case = ctx.cases[task.case_id]
+    already = {t_u.user_id for t_u in Task_User.query.filter(Task_User.task_id==task.id, Task_User.user_id.in_(users_id)).all()}
+    for user in users.values():
+        if user.id in already:
+            continue
+        db.session.add(Task_User(task_id=task.id, user_id=user.id))
+        ctx.notify(f"You have been assign to: '{task.id}-{task.title}' of case '{case.id}-{case.title}'", case.id, user.id, "fa-solid fa-hand")
+        ctx.history.append((case.uuid, f"Task '{task.id}-{task.title}' assigned to {user.first_name} {user.last_name}"))
+    ctx.touched_tasks.add(task.id)
+    return {"task_id": task.id, "assigned": [user_id for user_id in users if user_id not in already]}
+
+
+def _add_tags(op, ctx):
+    tags = op.get("tags", [])
+    clusters = op.get("clusters", [])
+    if not isinstance(tags, list) or not isinstance(clusters, list):
+        raise BatchError("'tags' and 'clusters' need to be lists")
+    invalid = TagHelper.find_invalid(tags=tags, clusters=clusters)
+    if invalid:
+        raise BatchError(TagHelper.invalid_message(invalid))
+
+    if "task_id" in op:
+        target = ctx.get_task(op["task_id"])
+        tag_class, cluster_class, column = Task_Tags, Task_Galaxy_Tags, "task_id"
+        case = ctx.cases[target.case_id]
+    else:
+        target = ctx.get_case(op.get("case_id"))
+        tag_class, cluster_class, column = Case_Tags, Case_Galaxy_Tags, "case_id"
+        case = target
+
+    tag_rows = Tags.query.filter(Tags.name.in_(tags)).all()
+    if column == "task_id":
+        ctx.touched_tasks.add(target.id)
+    ctx.touched_cases.add(case.id)
+    present = {row.tag_id for row in tag_class.query.filter_by(**{column: target.id}).all()}
+    for tag in tag_rows:
+        if tag.id not in present:
+            db.session.add(tag_class(tag_id=tag.id, **{column: target.id}))
+
+    cluster_rows = Cluster.query.filter(Cluster.name.in_(clusters)).all()
+    present = {row.cluster_id for row in cluster_class.query.filter_by(**{column: target.id}).all()}
+    for cluster in cluster_rows:
+        if cluster.id not in present:
+            db.session.add(cluster_class(cluster_id=cluster.id, **{column: target.id}))
+
+    ctx.history.append((case.uuid, f"Tags added to '{target.title}'"))
+    return {column: target.id}
+
+
+def _complete_task(task, case, ctx):
+    if task.completed:
+        return
+    old_order = task.case_order_id
+    task.completed = True
+    task.status_id = ctx.status.get("Finished")
+    task.finish_date = ctx.now
+    task.case_order_id = -1
+    db.session.flush()
+    OrderModel.close_gap("task", case.id, old_order)
+    case.nb_tasks -= 1
+    for task_user in Task_User.query.filter_by(task_id=task.id).all():
+        ctx.notify(f"Task '{task.id}-{task.title}' of case '{case.id}-{case.title}' completed", case.id, task_user.user_id, "fa-solid fa-check")
+    ctx.tasks[task.id] = task
+    ctx.touched_tasks.add(task.id)
+    ctx.history.append((case.uuid, f"Task '{task.title}' completed"))
+
+
+def _complete(op, ctx):
+    if "task_id" in op:
+        task = ctx.get_task(op["task_id"])
+        case = ctx.cases[task.case_id]
+        _complete_task(task, case, ctx)
+        ctx.touched_cases.add(case.id)
+        return {"task_id": task.id}
+
+    case = ctx.get_case(op.get("case_id"))
+    if not case.completed:
+        case.completed = True
+        case.status_id = ctx.status.get("Finished")
+        case.finish_date = ctx.now
+        for task in case.tasks.filter_by(completed=False).all():
+            _complete_task(task, case, ctx)
+        org_ids = [c_o.org_id for c_o in Case_Org.query.filter_by(case_id=case.id).all()]
+        for user in User.query.filter(User.org_id.in_(org_ids), User.id!=ctx.user.id).all():
+            ctx.notify(f"Case: '{case.id}-{case.title}' is now completed", case.id, user.id, "fa-solid fa-square-check")
+        ctx.history.append((case.uuid, "Case completed"))
+    ctx.touched_cases.add(case.id)
+    return {"case_id": case.id}
+
+
+HANDLERS = {
+    "create_task": _create_task,
+    "change_status": _change_status,
+    "assign_users": _assign_users,
+    "add_tags": _add_tags,
+    "complete": _complete
+}
+
+
+def run_batch(operations, user):
+    """Execute a list of operations in one transaction and return a result per operation"""
+    ctx = BatchContext(operations, user)
+    results = list()
+    try:
+        for index, op in enumerate(operations):
+            if not isinstance(op, dict) or op.get("op") not in HANDLERS:
+                results.append({"index": index, "status": "error", "message": f"Unknown operation, need one of: {', '.join(OPERATIONS)}"})
+                continue
+            try:
+                result = HANDLERS[op["op"]](op, ctx)
+                results.append({"index": index, "status": "ok", **result})
+            except BatchError as e:
+                results.append({"index": index, "status": "error", "message": str(e)})
+
+        for task_id in ctx.touched_tasks:
+            ctx.tasks[task_id].last_modif = ctx.now
+            ctx.touched_cases.add(ctx.tasks[task_id].case_id)
+        for case_id in ctx.touched_cases:
+            ctx.cases[case_id].last_modif = ctx.now
+        db.session.add_all(ctx.notifications)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception("Batch of %s aborted", user.email)
+        return {"message": "Batch aborted, nothing has been saved"}
+
+    for case_uuid, message in ctx.history:
+        CommonModel.save_history(case_uuid, user, message)
+    return results
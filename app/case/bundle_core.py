@@ -0,0 +1,148 @@
+import gzip
+import json
+import hashlib
+from collections import OrderedDict
+
+from flask import request, Response
+from ..db_class.db import *
+
+from ..utils import cacheHelper as CacheHelper
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+KINDS = ["taxonomies", "galaxies", "tags", "clusters"]
+# Number of assembled responses kept for the current version
+MAX_RESPONSES = 256
+CACHE_MAX_AGE = 31536000
+
+
+def _new_state(signature):
+    return {"version": hashlib.sha1(repr(signature).encode()).hexdigest()[:12], "fragments": {}, "responses": OrderedDict()}
+
+def _state():
+    """Version and assembled bundles of the current reference data"""
+    return CacheHelper.cached("reference_bundles", CacheHelper.REFERENCE, _new_state)
+
+
+def get_version():
+    """Short version of the reference data, part of the bundle urls"""
+    return _state()["version"]
+
+
+def _build_fragment(kind, name):
+    """Json of one taxonomy or galaxy list, None if it doesn't exist"""
+    if kind == "taxonomies":
+        data = [taxo.to_json() for taxo in Taxonomy.query.filter_by(exclude=False).all()]
+    elif kind == "galaxies":
+        data = [galax.to_json() for galax in Galaxy.query.filter_by(exclude=False).order_by('name').all()]
+    elif kind == "tags":
+        taxo = Taxonomy.query.filter_by(name=name).first()
+        if not taxo:
+            return None
+        data = [tag.to_json() for tag in taxo.tags if not tag.exclude]
+    else:
+        galaxy = Galaxy.query.filter_by(name=name).first()
+        if not galaxy:
+            return None
+        clusters = Cluster.query.filter_by(galaxy_id=galaxy.id).all()
+        data = list()
+        for cluster in clusters:
+            if not cluster.exclude:
+                # Same as Cluster.to_json, without a galaxy query per cluster
+                json_cluster = {column.name: getattr(cluster, column.name) for column in Cluster.__table__.columns}
+                json_cluster["icon"] = galaxy.icon
+                data.append(json_cluster)
+    return json.dumps(data)
+
+
+def _fragment(state, kind, name=None):
+    key = (kind, name)
+    if key not in state["fragments"]:
+        state["fragments"][key] = _build_fragment(kind, name)
+    return state["fragments"][key]
+
+
+def _compress(body):
+    """Precompute the encoded versions of a bundle"""
+    encoded = {"identity": body, "gzip": gzip.compress(body, compresslevel=6)}
+    if brotli:
+        encoded["br"] = brotli.compress(body)
+    return encoded
+
+
+def get_bundle(kind, names=None, state=None):
+    """Return the encoded versions of a bundle, same format as the get_* endpoints of case"""
+    state = state or _state()
+    names = tuple(names or [])
+    key = (kind, names)
+    if key in state["responses"]:
+        state["responses"].move_to_end(key)
+        return state["responses"][key]
+
+    if kind in ["taxonomies", "galaxies"]:
+        body = f'{{"{kind}": {_fragment(state, kind)}}}'
+    else:
+        parts = list()
+        for name in names:
+            fragment = _fragment(state, kind, name)
+            parts.append(f'{json.dumps(name)}: {fragment if fragment is not None else "[]"}')
+        body = f'{{"{kind}": {{{", ".join(parts)}}}}}'
+
+    state["responses"][key] = _compress(body.encode())
+    if len(state["responses"]) > MAX_RESPONSES:
+        state["responses"].popitem(last=False)
+    return state["responses"][key]
+
+
+def parse_bundle_args(kind, args):
+    """Return the list of taxonomies or galaxies of a bundle request"""
+    if kind not in KINDS:
+        return {"message": f"Bundle need to be one of: {', '.join(KINDS)}"}
+    if kind in ["taxonomies", "galaxies"]:
+        return []
+    arg = "taxonomies" if kind == "tags" else "galaxies"
+    if arg not in args:
+        return {"message": f"'{arg}' is missing"}
+    try:
+        names = json.loads(args.get(arg))
+    except ValueError:
+        return {"message": f"'{arg}' need to be a json list"}
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        return {"message": f"'{arg}' need to be a json list"}
+    return names
+
+
+def choose_encoding(accept_encoding, encoded):
+    for encoding in ["br", "gzip"]:
+        if encoding in encoded and encoding in accept_encoding:
+            return encoding
+    return "identity"
+
+
+def bundle_response(kind, names, immutable=False):
+    """Response of a bundle, compressed if the client accepts it"""
+    state = _state()
+    version = state["version"]
+    encoded = get_bundle(kind, names, state)
+    etag = hashlib.sha1(f"{version}:{kind}:{names}".encode()).hexdigest()
+    if immutable:
+        cache_control = f"private, max-age={CACHE_MAX_AGE}, immutable"
+    else:
+        cache_control = "private, no-cache"
+    headers = {"ETag": f'"{etag}"', "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+
+    encoding = choose_encoding(request.headers.get("Accept-Encoding", ""), encoded)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(encoded[encoding], mimetype="application/json", headers=headers)
+
+
+def bundle_url(kind):
+    """Version stamped url of a bundle, used by the forms"""
+    return f"/case/bundle/{get_version()}/{kind}"
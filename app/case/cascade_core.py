@@ -0,0 +1,104 @@
+import os
+import datetime
+
+from .. import db
+from ..db_class.db import *
+from sqlalchemy import select, update, delete, func
+
+from ..notification import notification_core as NotifModel
+
+
+# Rows depending on the tasks of a case: (model, task column)
+TASK_DEPENDENCIES = [
+    (Task_Tags, "task_id"),
+    (Task_Galaxy_Tags, "task_id"),
+    (Task_User, "task_id"),
+    (Task_Connector_Instance, "task_id"),
+    (Task_Custom_Tags, "task_id"),
+    (Note, "task_id"),
+    (File, "task_id")
+]
+
+# Rows depending on a case: (model, case column)
+CASE_DEPENDENCIES = [
+    (Case_Tags, "case_id"),
+    (Case_Galaxy_Tags, "case_id"),
+    (Case_Org, "case_id"),
+    (Case_Connector_Instance, "case_id"),
+    (Case_Custom_Tags, "case_id"),
+    (Case_Link_Case, "case_id_1"),
+    (Case_Link_Case, "case_id_2"),
+    (Recurring_Notification, "case_id")
+]
+
+
+def _assigned_count(task_ids):
+    """Number of tasks assigned to each user among task_ids"""
+    return dict(db.session.execute(
+        select(Task_User.user_id, func.count(Task_User.id)).where(Task_User.task_id.in_(task_ids)).group_by(Task_User.user_id)
+    ).all())
+
+
+def _notify_case(case, message, task_message, html_icon, current_user, task_ids):
+    """One notification per user of the case orgs and per user assigned to a task"""
+    assigned = _assigned_count(task_ids)
+    users = {user_id: message for user_id in NotifModel.get_case_users_id(case.id) if user_id != current_user.id}
+    for user_id, count in assigned.items():
+        if user_id != current_user.id:
+            users[user_id] = f"{message}, {task_message(count)}"
+    NotifModel.add_notifications(users, case.id, html_icon)
+
+
+def delete_case(case, current_user):
+    """Delete a case, its tasks and every dependent row in a few statements"""
+    task_ids = select(Task.id).where(Task.case_id==case.id).scalar_subquery()
+    files = [file_uuid for (file_uuid,) in db.session.execute(select(File.uuid).where(File.task_id.in_(task_ids))).all()]
+
+    _notify_case(case, f"Case: '{case.id}-{case.title}' was deleted",
+                 lambda count: f"{count} of your tasks deleted", "fa-solid fa-trash", current_user, task_ids)
+
+    for model, column in TASK_DEPENDENCIES:
+        db.session.execute(delete(model).where(getattr(model, column).in_(task_ids)).execution_options(synchronize_session=False))
+    db.session.execute(delete(Task).where(Task.case_id==case.id).execution_options(synchronize_session=False))
+    for model, column in CASE_DEPENDENCIES:
+        db.session.execute(delete(model).where(getattr(model, column)==case.id).execution_options(synchronize_session=False))
+    db.session.delete(case)
+    db.session.commit()
+    db.session.expire_all()
+    return files
+
+
+def unlink_files(folder, files_uuid):
+    """Remove files from disk once the rows are deleted"""
+    for file_uuid in files_uuid:
+        try:
+            os.remove(os.path.join(folder, file_uuid))
+        except OSError:
+            pass
+
+
+def complete_case(case, current_user):
+    """Complete a case and all its active tasks in one update"""
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    finished = Status.query.filter_by(name="Finished").first().id
+    task_ids = [task_id for (task_id,) in db.session.execute(
+        select(Task.id).where(Task.case_id==case.id, Task.completed==False)
+    ).all()]
+
+    _notify_case(case, f"Case: '{case.id}-{case.title}' is now completed",
+                 lambda count: f"{count} of your tasks completed", "fa-solid fa-square-check", current_user, task_ids)
+
+    if task_ids:
+        db.session.execute(
+            update(Task).where(Task.id.in_(task_ids))
+                        .values(completed=True, status_id=finished, case_order_id=-1, last_modif=now, finish_date=now,
+                                version=func.coalesce(Task.version, 0) + 1)
+                        .execution_options(synchronize_session="fetch")
+        )
+    case.completed = True
+    case.status_id = finished
+    case.nb_tasks = 0
+    case.last_modif = now
+    case.finish_date = now
+    db.session.commit()
+    return len(task_ids)
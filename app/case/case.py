@@ -1,15 +1,20 @@
 import ast
 import json
-from flask import Blueprint, render_template, redirect, jsonify, request, flash
+from flask import Blueprint, render_template, redirect, jsonify, request, flash, url_for
 from .form import CaseForm, CaseEditForm, RecurringForm
 from flask_login import login_required, current_user
 from . import case_core as CaseModel
 from . import common_core as CommonModel
 from . import task_core as TaskModel
+from . import typeahead_core as TypeaheadModel
+from . import bundle_core as BundleModel
+from . import graph_core as GraphModel
+from . import correlation_core as CorrelationModel
 from ..db_class.db import Task_Template, Case_Template
 from ..decorators import editor_required
 from ..utils.utils import form_to_dict
 from ..utils.formHelper import prepare_tags_connectors
+from ..utils.conditionalHelper import conditional_response
 from ..custom_tags import custom_tags_core as CustomModel
 
 case_blueprint = Blueprint(
@@ -195,8 +200,11 @@ def get_cases():
 @case_blueprint.route("/get_case/<cid>", methods=['GET'])
 @login_required
 def get_case(cid):
-    """Return all cases by page"""
-    return CommonModel.get_case(cid).to_json()
+    """Return a case, or 304 if the client already have the last version"""
+    case = CommonModel.get_case(cid)
+    if case:
+        return conditional_response(case, case.to_json)
+    return {"message": "Case not found", 'toast_class': "danger-subtle"}, 404
 
 
 @case_blueprint.route("/search", methods=['GET'])
@@ -500,17 +508,44 @@ def history(cid):
 @login_required
 def get_taxonomies():
     """Get all taxonomies"""
-    return {"taxonomies": CommonModel.get_taxonomies()}, 200
+    return BundleModel.bundle_response("taxonomies", [])
 
 @case_blueprint.route("/get_tags", methods=['GET'])
 @login_required
 def get_tags():
     """Get all tags by taxonomies"""
-    data_dict = dict(request.args)
-    if "taxonomies" in data_dict:
-        taxos = json.loads(data_dict["taxonomies"])
-        return {"tags": CommonModel.get_tags(taxos)}, 200
-    return {"message": "'taxonomies' is missing", 'toast_class': "warning-subtle"}, 400
+    taxos = BundleModel.parse_bundle_args("tags", request.args)
+    if "message" in taxos:
+        return {"message": taxos["message"], 'toast_class': "warning-subtle"}, 400
+    return BundleModel.bundle_response("tags", taxos)
+
+
+@case_blueprint.route("/bundle/<version>/<kind>", methods=['GET'])
+@login_required
+def reference_bundle(version, kind):
+    """Taxonomies, galaxies, tags or clusters, cached by the browser until the version changes"""
+    names = BundleModel.parse_bundle_args(kind, request.args)
+    if "message" in names:
+        return {"message": names["message"], 'toast_class': "warning-subtle"}, 400
+    current_version = BundleModel.get_version()
+    if version != current_version:
+        return redirect(url_for("case.reference_bundle", version=current_version, kind=kind, **request.args))
+    return BundleModel.bundle_response(kind, names, immutable=True)
+
+
+@case_blueprint.app_context_processor
+def inject_bundle_url():
+    return {"reference_bundle_url": BundleModel.bundle_url}
+
+
+@case_blueprint.route("/typeahead", methods=['GET'])
+@login_required
+def typeahead():
+    """Search tags and clusters by name or synonym"""
+    search_args = TypeaheadModel.parse_search_args(request.args)
+    if "message" in search_args:
+        return {"message": search_args["message"], 'toast_class': "warning-subtle"}, 400
+    return {"results": TypeaheadModel.search(**search_args)}, 200
 
 
 @case_blueprint.route("/get_taxonomies_case/<cid>", methods=['GET'])
@@ -531,18 +566,17 @@ def get_taxonomies_case(cid):
 @login_required
 def get_galaxies():
     """Get all galaxies"""
-    return {"galaxies": CommonModel.get_galaxies()}, 200
+    return BundleModel.bundle_response("galaxies", [])
 
 
 @case_blueprint.route("/get_clusters", methods=['GET'])
 @login_required
 def get_clusters():
     """Get all clusters by galaxies"""
-    if "galaxies" in request.args:
-        galaxies = request.args.get("galaxies")
-        galaxies = json.loads(galaxies)
-        return {"clusters": CommonModel.get_clusters_galaxy(galaxies)}, 200
-    return {"message": "'galaxies' is missing", 'toast_class': "warning-subtle"}, 400
+    galaxies = BundleModel.parse_bundle_args("clusters", request.args)
+    if "message" in galaxies:
+        return {"message": galaxies["message"], 'toast_class': "warning-subtle"}, 400
+    return BundleModel.bundle_response("clusters", galaxies)
 
 
 @case_blueprint.route("/get_galaxies_case/<cid>", methods=['GET'])
@@ -710,6 +744,32 @@ def download_file(cid):
         return {"message": "Action not allowed", "toast_class": "warning-subtle"}, 401
     return {"message": "Case not found", "toast_class": "danger-subtle"}, 404
 
+@case_blueprint.route("/<cid>/graph", methods=['GET'])
+@login_required
+def case_graph(cid):
+    """Get the cases linked to the case"""
+    case = CommonModel.get_case(cid)
+    if case:
+        graph_args = GraphModel.verif_graph_args(request.args)
+        if "message" in graph_args:
+            graph_args["toast_class"] = "warning-subtle"
+            return graph_args, 400
+        return GraphModel.get_graph(case, graph_args["depth"]), 200
+    return {"message": "Case not found", "toast_class": "danger-subtle"}, 404
+
+@case_blueprint.route("/<cid>/similar", methods=['GET'])
+@login_required
+def similar_cases(cid):
+    """Get the cases most similar to the case"""
+    case = CommonModel.get_case(cid)
+    if case:
+        similar_args = CorrelationModel.parse_similar_args(request.args)
+        if "message" in similar_args:
+            similar_args["toast_class"] = "warning-subtle"
+            return similar_args, 400
+        return {"cases": CorrelationModel.get_similar_cases(case, similar_args["limit"])}, 200
+    return {"message": "Case not found", "toast_class": "danger-subtle"}, 404
+
 @case_blueprint.route("/<cid>/add_new_link", methods=['GET', 'POST'])
 @login_required
 @editor_required
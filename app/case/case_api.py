@@ -1,13 +1,20 @@
 import ast
 import json
-from flask import Blueprint, request
+from flask import Blueprint, Response, request, stream_with_context
 from . import case_core as CaseModel
+from . import export_core as ExportModel
 from . import common_core as CommonModel
 from . import task_core as TaskModel
+from . import typeahead_core as TypeaheadModel
+from . import bundle_core as BundleModel
+from . import graph_core as GraphModel
+from . import correlation_core as CorrelationModel
 from . import case_core_api as CaseModelApi
+from ..db_class.db import Case
 
 from flask_restx import Api, Resource
 from ..decorators import api_required, editor_required
+from ..utils.conditionalHelper import conditional_response
 
 api_case_blueprint = Blueprint('api_case', __name__)
 api = Api(api_case_blueprint,
@@ -25,9 +32,17 @@ api = Api(api_case_blueprint,
 @api.doc(description='Get all cases')
 class GetCases(Resource):
     method_decorators = [api_required]
+    @api.doc(params={
+        "limit": "Number of cases by page, enable the pagination",
+        "cursor": "next_cursor of the previous page",
+        "fields": "Comma separated list of fields to return",
+        "include": "Comma separated list of: tasks, notes, orgs"
+    })
     def get(self):
-        cases = CommonModel.get_all_cases()
-        return {"cases": [case.to_json() for case in cases]}, 200
+        page_dict = CaseModelApi.verif_page_args(request.args, CaseModelApi.CASE_FIELDS, CaseModelApi.CASE_INCLUDES)
+        if "message" in page_dict:
+            return page_dict, 400
+        return CaseModelApi.get_cases_page(Case.query.filter_by(completed=False), page_dict), 200
 
 @api.route('/<cid>')
 @api.doc(description='Get a case', params={'cid': 'id of a case'})
@@ -36,13 +51,14 @@ class GetCase(Resource):
     def get(self, cid):
         case = CommonModel.get_case(cid)
         if case:
-            case_json = case.to_json()
-            orgs = CommonModel.get_orgs_in_case(cid)
-            case_json["orgs"] = list()
-            for org in orgs:
-                case_json["orgs"].append({"id": org.id, "uuid": org.uuid, "name": org.name})
-            
-            return case_json, 200
+            def serialize():
+                case_json = case.to_json()
+                orgs = CommonModel.get_orgs_in_case(case.id)
+                case_json["orgs"] = list()
+                for org in orgs:
+                    case_json["orgs"].append({"id": org.id, "uuid": org.uuid, "name": org.name})
+                return case_json
+            return conditional_response(case, serialize)
         return {"message": "Case not found"}, 404
 
 @api.route('/create', methods=['POST'])
@@ -125,18 +141,64 @@ class ForkCase(Resource):
 @api.doc(description='Get all not completed cases')
 class GetCases_not_completed(Resource):
     method_decorators = [api_required]
+    @api.doc(params={
+        "limit": "Number of cases by page, enable the pagination",
+        "cursor": "next_cursor of the previous page",
+        "fields": "Comma separated list of fields to return",
+        "include": "Comma separated list of: tasks, notes, orgs"
+    })
     def get(self):
-        cases = CommonModel.get_case_by_completed(False)
-        return {"cases": [case.to_json() for case in cases]}, 200
+        page_dict = CaseModelApi.verif_page_args(request.args, CaseModelApi.CASE_FIELDS, CaseModelApi.CASE_INCLUDES)
+        if "message" in page_dict:
+            return page_dict, 400
+        return CaseModelApi.get_cases_page(Case.query.filter_by(completed=False), page_dict), 200
     
 @api.route('/completed')
 @api.doc(description='Get all completed cases')
 class GetCases_not_completed(Resource):
     method_decorators = [api_required]
+    @api.doc(params={
+        "limit": "Number of cases by page, enable the pagination",
+        "cursor": "next_cursor of the previous page",
+        "fields": "Comma separated list of fields to return",
+        "include": "Comma separated list of: tasks, notes, orgs"
+    })
     def get(self):
-        cases = CommonModel.get_case_by_completed(True)
-        return {"cases": [case.to_json() for case in cases]}, 200    
+        page_dict = CaseModelApi.verif_page_args(request.args, CaseModelApi.CASE_FIELDS, CaseModelApi.CASE_INCLUDES)
+        if "message" in page_dict:
+            return page_dict, 400
+        return CaseModelApi.get_cases_page(Case.query.filter_by(completed=True), page_dict), 200    
     
+@api.route('/export')
+@api.doc(description='Export cases as ndjson or as a gzip tar with attachments')
+class ExportCases(Resource):
+    method_decorators = [api_required]
+    @api.doc(params={
+        "format": "ndjson (default) or tar",
+        "completed": "true or false",
+        "date_from": "Date(%Y-%m-%d), creation date",
+        "date_to": "Date(%Y-%m-%d), creation date",
+        "org_id": "id of an org present in the cases",
+        "tags": "Comma separated list of tags"
+    })
+    def get(self):
+        user = CaseModelApi.get_user_api(request.headers)
+        filters = ExportModel.parse_export_args(request.args)
+        if "message" in filters:
+            return filters, 400
+        if not user.is_admin():
+            filters["org_id"] = user.org_id
+        query = ExportModel.build_export_query(**filters)
+
+        export_format = request.args.get("format", "ndjson")
+        if export_format == "ndjson":
+            return Response(stream_with_context(ExportModel.export_ndjson(query)), mimetype="application/x-ndjson",
+                            headers={'Content-Disposition': 'attachment; filename=cases.ndjson'})
+        elif export_format == "tar":
+            return Response(stream_with_context(ExportModel.export_tar(query)), mimetype="application/gzip",
+                            headers={'Content-Disposition': 'attachment; filename=cases.tar.gz'})
+        return {"message": "format need to be 'ndjson' or 'tar'"}, 400
+
 @api.route('/title', methods=["POST"])
 @api.doc(description='Get a case by title')
 class GetCaseTitle(Resource):
@@ -223,6 +285,38 @@ class RemoveOrgCase(Resource):
             return {"message": "Org not found"}, 404
         return {"message": "Permission denied"}, 403
     
+@api.route('/<cid>/graph', methods=['GET'])
+@api.doc(description='Get the cases linked to a case', params={
+    'cid': 'id of a case',
+    'depth': "Number of hops from the case, or 'all' for every connected case"
+})
+class CaseGraph(Resource):
+    method_decorators = [api_required]
+    def get(self, cid):
+        case = CommonModel.get_case(cid)
+        if case:
+            graph_args = GraphModel.verif_graph_args(request.args)
+            if "message" in graph_args:
+                return graph_args, 400
+            return GraphModel.get_graph(case, graph_args["depth"]), 200
+        return {"message": "Case not found"}, 404
+
+@api.route('/<cid>/similar', methods=['GET'])
+@api.doc(description='Get the cases sharing the most tags, clusters, custom tags and connector identifiers with a case', params={
+    'cid': 'id of a case',
+    'limit': 'Number of cases to return'
+})
+class SimilarCases(Resource):
+    method_decorators = [api_required]
+    def get(self, cid):
+        case = CommonModel.get_case(cid)
+        if case:
+            similar_args = CorrelationModel.parse_similar_args(request.args)
+            if "message" in similar_args:
+                return similar_args, 400
+            return {"cases": CorrelationModel.get_similar_cases(case, similar_args["limit"])}, 200
+        return {"message": "Case not found"}, 404
+
 @api.route('/<cid>/history', methods=['GET'])
 @api.doc(description='Get history of a case', params={'cid': 'id of a case'})
 class History(Resource):
@@ -333,7 +427,7 @@ class CheckTitle(Resource):
 class GetTaxonomies(Resource):
     method_decorators = [api_required]
     def get(self):
-        return {"taxonomies": CommonModel.get_taxonomies()}, 200
+        return BundleModel.bundle_response("taxonomies", [])
     
 @api.route('/get_tags', methods=['POST'])
 @api.doc(description='Get all tags by given taxonomies')
@@ -345,9 +439,28 @@ class GetTags(Resource):
     def post(self):
         if "taxonomies" in request.json:
             taxos = request.json["taxonomies"]
-            return {"tags": CommonModel.get_tags(taxos)}, 200
+            if not isinstance(taxos, list):
+                return {"message": "'taxonomies' need to be a list"}, 400
+            return BundleModel.bundle_response("tags", taxos)
         return {"message": "Please give 'taxonomies'"}, 400
     
+@api.route('/typeahead', methods=['GET'])
+@api.doc(description='Search tags and clusters by name or synonym')
+class Typeahead(Resource):
+    method_decorators = [api_required]
+    @api.doc(params={
+        'q': 'Required. Beginning or part of a name',
+        'limit': 'Number of results, 10 by default',
+        'type': 'tag or cluster, both by default',
+        'taxonomies': 'Comma separated list of taxonomies to search in',
+        'galaxies': 'Comma separated list of galaxies to search in'
+    })
+    def get(self):
+        search_args = TypeaheadModel.parse_search_args(request.args)
+        if "message" in search_args:
+            return search_args, 400
+        return {"results": TypeaheadModel.search(**search_args)}, 200
+    
 @api.route('/get_taxonomies_case/<cid>', methods=['GET'])
 @api.doc(description='Get all tags and taxonomies in a case')
 class GetTaxonomiesCase(Resource):
@@ -367,7 +480,7 @@ class GetTaxonomiesCase(Resource):
 class GetGalaxies(Resource):
     method_decorators = [api_required]
     def get(self):
-        return {"galaxies": CommonModel.get_galaxies()}, 200
+        return BundleModel.bundle_response("galaxies", [])
 
 @api.route('/get_galaxies_case/<cid>', methods=['GET'])
 @api.doc(description='Get all tags and galaxies in a case', params={'galaxies': 'List of galaxies'})
@@ -530,9 +643,21 @@ class GetConnectors(Resource):
 @api.doc(description='Get all tasks for a case', params={'cid': 'id of a case'})
 class GetTasks(Resource):
     method_decorators = [api_required]
+    @api.doc(params={
+        "limit": "Number of tasks by page, enable the pagination",
+        "cursor": "next_cursor of the previous page",
+        "fields": "Comma separated list of fields to return",
+        "include": "Comma separated list of: notes"
+    })
     def get(self, cid):
         case = CommonModel.get_case(cid)
         if case:
+            if any(arg in request.args for arg in ["limit", "cursor", "fields", "include"]):
+                page_dict = CaseModelApi.verif_page_args(request.args, CaseModelApi.TASK_FIELDS, CaseModelApi.TASK_INCLUDES)
+                if "message" in page_dict:
+                    return page_dict, 400
+                return CaseModelApi.get_tasks_page(case.tasks.filter_by(completed=False), page_dict), 200
+
             tasks = list()
             for task in case.tasks:
                 if not task.completed:
@@ -623,6 +748,26 @@ class MoveTaskDown(Resource):
         return {"message": "Case Not found"}, 404
 
 
+@api.route('/<cid>/reorder_tasks', methods=['POST'])
+@api.doc(description='Set the order of all the active tasks of a case', params={"cid": "id of a case"})
+@api.doc(params={"tasks": "Required. List of task id in the new order"})
+class ReorderTasks(Resource):
+    method_decorators = [editor_required, api_required]
+    def post(self, cid):
+        case = CommonModel.get_case(cid)
+        if case:
+            current_user = CaseModelApi.get_user_api(request.headers)
+            if CaseModel.get_present_in_case(cid, current_user) or current_user.is_admin():
+                if request.json and "tasks" in request.json:
+                    res = TaskModel.reorder_case_tasks(case, request.json["tasks"], current_user)
+                    if "message" in res:
+                        return res, 400
+                    return {"message": "Order changed"}, 200
+                return {"message": "Need to pass tasks"}, 400
+            return {"message": "Permission denied"}, 403
+        return {"message": "Case Not found"}, 404
+
+
 @api.route('/<cid>/all_notes')
 @api.doc(description='Get all notes of a case', params={'cid': 'id of a case'})
 class GetAllNotes(Resource):
@@ -17,34 +17,24 @@ from ..custom_tags import custom_tags_core as CustomModel
 
 from . import common_core as CommonModel
 from . import task_core as TaskModel
+from . import clone_core as CloneModel
+from . import cascade_core as CascadeModel
 
 
 def delete_case(cid, current_user):
     """Delete a case by is id"""
     case = CommonModel.get_case(cid)
     if case:
-        # Delete all tasks in the case
-        for task in case.tasks:
-            TaskModel.delete_task(task.id, current_user)
-
         history_path = os.path.join(CommonModel.HISTORY_DIR, str(case.uuid))
+        files = CascadeModel.delete_case(case, current_user)
+
+        # Files are only removed once the rows are gone
+        CascadeModel.unlink_files(TaskModel.FILE_FOLDER, files)
         if os.path.isfile(history_path):
             try:
                 os.remove(history_path)
             except:
                 return False
-
-        NotifModel.create_notification_all_orgs(f"Case: '{case.id}-{case.title}' was deleted", cid, html_icon="fa-solid fa-trash", current_user=current_user)
-
-        Case_Tags.query.filter_by(case_id=case.id).delete()
-        Case_Galaxy_Tags.query.filter_by(case_id=case.id).delete()
-        Case_Org.query.filter_by(case_id=case.id).delete()
-        Case_Connector_Instance.query.filter_by(case_id=case.id).delete()
-        Case_Custom_Tags.query.filter_by(case_id=case.id).delete()
-        Case_Link_Case.query.filter_by(case_id_1=case.id).delete()
-        Case_Link_Case.query.filter_by(case_id_2=case.id).delete()
-        db.session.delete(case)
-        db.session.commit()
         return True
     return False
 
@@ -53,19 +43,16 @@ def complete_case(cid, current_user):
     """Complete case by is id"""
     case = CommonModel.get_case(cid)
     if case is not None:
-        case.completed = not case.completed
-        if case.completed:
-            case.status_id = Status.query.filter_by(name="Finished").first().id
-            for task in case.tasks:
-                TaskModel.complete_task(task.id, current_user)
-            NotifModel.create_notification_all_orgs(f"Case: '{case.id}-{case.title}' is now completed", cid, html_icon="fa-solid fa-square-check", current_user=current_user)
+        if not case.completed:
+            nb_tasks = CascadeModel.complete_case(case, current_user)
+            CommonModel.save_history(case.uuid, current_user, f"Case completed, {nb_tasks} tasks completed")
         else:
+            case.completed = False
+            case.finish_date = None
             case.status_id = Status.query.filter_by(name="Created").first().id
             NotifModel.create_notification_all_orgs(f"Case: '{case.id}-{case.title}' is now revived", cid, html_icon="fa-solid fa-heart-circle-plus", current_user=current_user)
-
-        CommonModel.update_last_modif(cid)
-        db.session.commit()
-        CommonModel.save_history(case.uuid, current_user, "Case completed")
+            CommonModel.update_last_modif(cid)
+            CommonModel.save_history(case.uuid, current_user, "Case revived")
         return True
     return False
 
@@ -511,81 +498,9 @@ def fork_case_core(cid, case_title_fork, user):
         return {"message": "Error, title already exist"}
     case = CommonModel.get_case(cid)
 
-    case_json = case.to_json()
-    case_json["title"] = case_title_fork
-
-    if case.deadline:
-        case_json["deadline_date"] = datetime.datetime.strptime(case_json["deadline"].split(" ")[0], "%Y-%m-%d").date()
-        case_json["deadline_time"] = datetime.datetime.strptime(case_json["deadline"].split(" ")[1], "%H:%M").time()
-    else:
-        case_json["deadline_date"] = None
-        case_json["deadline_time"] = None
-
-    loc_tags = list()
-    for tag in case_json["tags"]:
-        loc_tags.append(tag["name"])
-    case_json["tags"] = loc_tags
-
-    loc_clusters = list()
-    for cluster in case_json["clusters"]:
-        loc_clusters.append(cluster["name"])
-    case_json["clusters"] = loc_clusters
-
-    loc_connectors = list()
-    loc_connectors_keep = list()
-    for connector in case_json["connectors"]:
-        loc_connectors_keep.append(connector)
-        loc_connectors.append(connector["name"])
-    case_json["connectors"] = loc_connectors
-
-    loc_identifiers_dict = dict()
-    for connector in loc_connectors_keep:
-        loc_identifier = CommonModel.get_case_connector_id(connector["id"], cid)
-        loc_identifiers_dict[connector["name"]] = None
-        if loc_identifier:
-            loc_identifiers_dict[connector["name"]] = loc_identifier.identifier
-    case_json["identifier"] = loc_identifiers_dict
-
-    new_case = create_case(case_json, user)
-
-    for task in case.tasks:
-        task_json = task.to_json()
-        if task.deadline:
-            task_json["deadline_date"] = datetime.datetime.strptime(task_json["deadline"].split(" ")[0], "%Y-%m-%d").date()
-            task_json["deadline_time"] = datetime.datetime.strptime(task_json["deadline"].split(" ")[1], "%H:%M").time()
-        else:
-            task_json["deadline_date"] = None
-            task_json["deadline_time"] = None
-
-
-        loc_tags = list()
-        for tag in task_json["tags"]:
-            loc_tags.append(tag["name"])
-        task_json["tags"] = loc_tags
-
-        loc_clusters = list()
-        for cluster in task_json["clusters"]:
-            loc_clusters.append(cluster["name"])
-        task_json["clusters"] = loc_clusters
-        
-
-        loc_connectors = list()
-        loc_connectors_keep = list()
-        for connector in task_json["connectors"]:
-            loc_connectors_keep.append(connector)
-            loc_connectors.append(connector["name"])
-        task_json["connectors"] = loc_connectors
-
-        loc_identifiers_dict = dict()
-        for connector in loc_connectors_keep:
-            loc_identifier = CommonModel.get_task_connector_id(connector["id"], task.id)
-            loc_identifiers_dict[connector["name"]] = None
-            if loc_identifier:
-                loc_identifiers_dict[connector["name"]] = loc_identifier.identifier
-        task_json["identifier"] = loc_identifiers_dict
-
-        TaskModel.create_task(task_json, new_case.id, user)
+    new_case = CloneModel.clone_case(case, case_title_fork, user)
 
+    CommonModel.save_history(new_case.uuid, user, "Case Created")
     CommonModel.save_history(case.uuid, user, f"Case forked, {new_case.id} - {new_case.title}")
     return new_case
 
@@ -596,126 +511,7 @@ def create_template_from_case(cid, case_title_template, current_user):
         return {"message": "Error, title already exist"}
     
     case = CommonModel.get_case(cid)
-    new_template = Case_Template(
-        uuid=str(uuid.uuid4()),
-        title=case_title_template,
-        description=case.description,
-        last_modif=datetime.datetime.now(tz=datetime.timezone.utc)
-    )
-    db.session.add(new_template)
-    db.session.commit()
-
-    ## Tags
-    for c_t in Case_Tags.query.filter_by(case_id=case.id).all():
-        case_tag = Case_Template_Tags(
-            case_id=new_template.id,
-            tag_id=c_t.tag_id
-        )
-        db.session.add(case_tag)
-        db.session.commit()
-
-    ## Clusters
-    for c_t in Case_Galaxy_Tags.query.filter_by(case_id=case.id).all():
-        case_cluster = Case_Template_Galaxy_Tags(
-            template_id=new_template.id,
-            cluster_id=c_t.cluster_id
-        )
-        db.session.add(case_cluster)
-        db.session.commit()
-
-    ## Connectors
-    for c_t in Case_Connector_Instance.query.filter_by(case_id=case.id).all():
-        case_connector = Case_Template_Connector_Instance(
-            template_id=new_template.id,
-            instance_id=c_t.instance_id
-        )
-        db.session.add(case_connector)
-        db.session.commit()
-
-    ## Custom Tags
-    for c_t in CommonModel.get_case_custom_tags(case.id):
-        case_template_custom_tags = Case_Template_Custom_Tags(
-            case_template_id=new_template.id,
-            custom_tag_id=c_t.custom_tag_id
-        )
-        db.session.add(case_template_custom_tags)
-        db.session.commit()
-
-    ## Tasks of the case will become task template
-    for task in case.tasks:
-        task_exist = Task_Template.query.filter_by(title=task.title).first()
-        if not task_exist:
-            task_template = Task_Template(
-                uuid=str(uuid.uuid4()),
-                title=task.title,
-                description=task.description,
-                url=task.url,
-                nb_notes=task.nb_notes,
-                last_modif=datetime.datetime.now(tz=datetime.timezone.utc)
-            )
-            db.session.add(task_template)
-            db.session.commit()
-
-            for t_note in task.notes:
-                note = Note_Template(
-                    uuid=str(uuid.uuid4()),
-                    note=t_note.note,
-                    template_id=task_template.id,
-                    template_order_id=task.nb_notes+1
-                )
-                db.session.add(note)
-                db.session.commit()
-
-            ## Tags
-            for t_t in Task_Tags.query.filter_by(task_id=task.id).all():
-                task_tag = Task_Template_Tags(
-                    task_id=task_template.id,
-                    tag_id=t_t.tag_id
-                )
-                db.session.add(task_tag)
-                db.session.commit()
-
-            ## Clusters
-            for t_t in Task_Galaxy_Tags.query.filter_by(task_id=task.id).all():
-                task_cluster = Task_Template_Galaxy_Tags(
-                    template_id=task_template.id,
-                    cluster_id=t_t.cluster_id
-                )
-                db.session.add(task_cluster)
-                db.session.commit()
-
-            ## Task Connectors
-            for t_c in Task_Connector_Instance.query.filter_by(task_id=task.id).all():
-                task_connector = Task_Template_Connector_Instance(
-                    template_id=task_template.id,
-                    instance_id=t_c.instance_id
-                )
-                db.session.add(task_connector)
-                db.session.commit()
-
-            for c_t in CommonModel.get_task_custom_tags(task.id):
-                task_template_custom_tags = Task_Template_Custom_Tags(
-                    task_template_id=task_template.id,
-                    custom_tag_id=c_t.custom_tag_id
-                )
-                db.session.add(task_template_custom_tags)
-                db.session.commit()
-
-            case_task_template = Case_Task_Template(
-                    case_id=new_template.id,
-                    task_id=task_template.id,
-                    case_order_id=task.case_order_id
-                )
-            db.session.add(case_task_template)
-            db.session.commit()
-        else:
-            case_task_template = Case_Task_Template(
-                    case_id=new_template.id,
-                    task_id=task_exist.id,
-                    case_order_id=task.case_order_id
-                )
-            db.session.add(case_task_template)
-            db.session.commit()
+    new_template = CloneModel.clone_case_to_template(case, case_title_template)
 
     CommonModel.save_history(case.uuid, current_user, f"Template created, {new_template.id} - {new_template.title}")
 
@@ -852,8 +648,24 @@ def get_instance_module_core(module, type_module, case_id, user_id):
     return []
 
 
+def save_case_identifier(case_id, instance_id, event_id, sync_start):
+    """Save the event of a case on an instance"""
+    case_instance = CommonModel.get_case_connector_id(instance_id, case_id)
+    if not case_instance:
+        db.session.add(Case_Connector_Instance(
+            case_id=case_id,
+            instance_id=instance_id,
+            identifier=event_id,
+            last_sync=sync_start
+        ))
+    else:
+        case_instance.identifier = event_id
+        case_instance.last_sync = sync_start
+
 def call_module_case(module, instances, case, user):
     """Run a module"""
+    # Taken before the case is read, an edit made during the push is sent again on the next one
+    sync_start = datetime.datetime.now(tz=datetime.timezone.utc)
     org = CommonModel.get_org(case.owner_org_id)
 
     tasks = list()
@@ -869,35 +681,39 @@ def call_module_case(module, instances, case, user):
     case["status"] = CommonModel.get_status(case["status_id"]).name
 
 
-    for instance in list(instances.keys()):
-        instance_key = instance
-        instance = CommonModel.get_instance_by_name(instance)
-        user_instance = CommonModel.get_user_instance_both(user.id, instance.id)
-        case_instance_id = CommonModel.get_case_connector_id(instance.id, case["id"])
+    connector_instances = CommonModel.get_connector_instances(instances.keys(), user.id, case_id=case["id"])
+    results, calls = dict(), dict()
+    for instance_key in list(instances.keys()):
+        if instance_key not in connector_instances:
+            results[instance_key] = {"message": "Instance not found"}
+            continue
+        instance, user_instance, case_instance_id = connector_instances[instance_key]
 
         instance = instance.to_json()
         if user_instance:
             instance["api_key"] = user_instance.api_key
         if instances[instance_key]:
             instance["identifier"] = instances[instance_key]
+            # Only what changed since the last push of this event need to be sent
+            if case_instance_id and case_instance_id.last_sync and str(case_instance_id.identifier) == str(instances[instance_key]):
+                instance["last_sync"] = case_instance_id.last_sync.strftime('%Y-%m-%d %H:%M')
+        calls[instance_key] = lambda instance=instance: MODULES[module].handler(instance, case, user)
+
+    instance_ids = {instance_key: loc[0].id for instance_key, loc in connector_instances.items()}
+    # An event made after the deadline is still saved, it would be created again on the next push otherwise
+    save = lambda instance_key, event_id: save_case_identifier(case["id"], instance_ids[instance_key], event_id, sync_start)
+    results.update(CommonModel.run_module_instances(calls, late=CommonModel.late_results(save)))
+
+    ## Identifiers of all the instances that succeeded are saved together
+    for instance_key, event_id in results.items():
+        if not isinstance(event_id, dict):
+            save(instance_key, event_id)
+    db.session.commit()
 
-        event_id = MODULES[module].handler(instance, case, user)
-        if isinstance(event_id, dict):
-            return event_id
-
-        if not case_instance_id:
-            cc_instance = Case_Connector_Instance(
-                case_id=case["id"],
-                instance_id=instance["id"],
-                identifier=event_id
-            )
-            db.session.add(cc_instance)
-            db.session.commit()
-        elif not case_instance_id.identifier == event_id:
-            case_instance_id.identifier = event_id
-            db.session.commit()
-    
-    CommonModel.save_history(case.uuid, user, f"Task Module {module} used on instances: {', '.join(list(instances.keys))}")
+    succeeded = [instance_key for instance_key, res in results.items() if not isinstance(res, dict)]
+    if succeeded:
+        CommonModel.save_history(case["uuid"], user, f"Case Module {module} used on instances: {', '.join(succeeded)}")
+    return CommonModel.module_errors(results)
 
 def get_all_notes(case):
     """Get all tasks' notes"""
@@ -956,6 +772,8 @@ def add_new_link(form_dict, cid, current_user):
             )
             db.session.add(case_link_case)
             db.session.commit()
+            # The link is shown on both cases, both get a new version
+            CommonModel.update_last_modif(case_link.id)
 
             CommonModel.save_history(case.uuid, current_user, f"Case linked to case '{case_link.id}- {case_link.title}' added")
             CommonModel.save_history(case_link.uuid, current_user, f"Case linked to case '{case.id}- {case.title}', from the other case")
@@ -978,6 +796,7 @@ def remove_case_link(case_id, case_link_id, current_user):
         case_2 = CommonModel.get_case(case_link_id)
 
         CommonModel.update_last_modif(case_id)
+        CommonModel.update_last_modif(case_link_id)
         db.session.commit()
         case = CommonModel.get_case(case_id)
         CommonModel.save_history(case.uuid, current_user, f"Case link '{case_2.id}- {case_2.title}' removed")
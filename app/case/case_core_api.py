@@ -1,5 +1,9 @@
-from ..db_class.db import Case, User
+import base64
+from .. import db
+from ..db_class.db import Case, Case_Org, Note, Org, Task, User, Tags, Case_Tags, Cluster, Galaxy, Case_Galaxy_Tags, \
+    Connector_Instance, Case_Connector_Instance, Custom_Tags, Case_Custom_Tags, Case_Link_Case
 from datetime import datetime
+from sqlalchemy import and_, or_, select
 from . import common_core as CommonModel
 from ..utils.utils import check_tag
 from ..utils.datadictHelper import edition_verification_tags_connectors, creation_verification_tags_connectors
@@ -137,3 +141,190 @@ def verif_edit_task(data_dict, task_id):
         data_dict["url"] = task.url
 
     return data_dict
+
+
+#####################
+# Cursor pagination #
+#####################
+
+CASE_FIELDS = ["id", "uuid", "title", "description", "creation_date", "last_modif", "deadline", "finish_date",
+               "status_id", "completed", "owner_org_id", "notif_deadline_id", "recurring_type", "recurring_date",
+               "nb_tasks", "notes", "hedgedoc_url"]
+TASK_FIELDS = ["id", "uuid", "title", "description", "url", "creation_date", "last_modif", "deadline", "finish_date",
+               "case_id", "status_id", "completed", "notif_deadline_id", "case_order_id", "nb_notes"]
+CASE_INCLUDES = ["tasks", "notes", "orgs"]
+TASK_INCLUDES = ["notes"]
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+def encode_cursor(obj):
+    """Return an opaque cursor pointing after obj"""
+    raw = f"{obj.last_modif.isoformat() if obj.last_modif else ''}|{obj.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    """Return (last_modif, id) from a cursor"""
+    last_modif, loc_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    if last_modif:
+        last_modif = datetime.fromisoformat(last_modif)
+    else:
+        last_modif = None
+    return last_modif, int(loc_id)
+
+
+def verif_page_args(args, allowed_fields, allowed_includes):
+    """Check the pagination, fields and include args of a request"""
+    page_dict = {"paginate": False, "limit": None, "cursor": None, "fields": None, "include": []}
+
+    if args.get("limit") or args.get("cursor"):
+        page_dict["paginate"] = True
+        limit = args.get("limit", DEFAULT_LIMIT)
+        if not str(limit).isdigit() or not int(limit) > 0:
+            return {"message": "limit need to be a positive integer"}
+        page_dict["limit"] = min(int(limit), MAX_LIMIT)
+
+    if args.get("cursor"):
+        try:
+            page_dict["cursor"] = decode_cursor(args.get("cursor"))
+        except Exception:
+            return {"message": "cursor not valid"}
+
+    if args.get("fields"):
+        fields = [field.strip() for field in args.get("fields").split(",") if field.strip()]
+        unknown = [field for field in fields if field not in allowed_fields]
+        if unknown:
+            return {"message": f"Unknown fields: {', '.join(unknown)}"}
+        page_dict["fields"] = fields
+
+    if args.get("include"):
+        include = [inc.strip() for inc in args.get("include").split(",") if inc.strip()]
+        unknown = [inc for inc in include if inc not in allowed_includes]
+        if unknown:
+            return {"message": f"Unknown include: {', '.join(unknown)}"}
+        page_dict["include"] = include
+    return page_dict
+
+
+def keyset_page(query, model, page_dict):
+    """Apply a keyset on (last_modif, id), newest first with the empty dates last, and return (objects, next_cursor)"""
+    query = query.order_by(model.last_modif.is_(None), model.last_modif.desc(), model.id.desc())
+    if page_dict["cursor"]:
+        last_modif, last_id = page_dict["cursor"]
+        if last_modif:
+            query = query.filter(or_(model.last_modif < last_modif,
+                                     and_(model.last_modif == last_modif, model.id < last_id),
+                                     model.last_modif.is_(None)))
+        else:
+            query = query.filter(model.last_modif.is_(None), model.id < last_id)
+    if not page_dict["paginate"]:
+        return query.all(), None
+
+    objects = query.limit(page_dict["limit"] + 1).all()
+    next_cursor = None
+    if len(objects) > page_dict["limit"]:
+        objects = objects[:page_dict["limit"]]
+        next_cursor = encode_cursor(objects[-1])
+    return objects, next_cursor
+
+
+def _format_value(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M')
+    return value
+
+def sparse_json(obj, fields):
+    """Return only the given scalar fields of an object"""
+    return {field: _format_value(getattr(obj, field)) for field in fields}
+
+
+def _task_notes(task_ids):
+    notes = dict()
+    for note in Note.query.filter(Note.task_id.in_(task_ids)).order_by(Note.task_order_id).all():
+        notes.setdefault(note.task_id, []).append({"id": note.id, "uuid": note.uuid, "note": note.note, "task_order_id": note.task_order_id})
+    return notes
+
+def serialize_tasks(tasks, page_dict):
+    """Serialize a page of tasks, loading includes with one query each"""
+    if page_dict["fields"]:
+        tasks_list = [sparse_json(task, page_dict["fields"]) for task in tasks]
+    else:
+        tasks_list = [task.to_json() for task in tasks]
+
+    if "notes" in page_dict["include"]:
+        notes = _task_notes([task.id for task in tasks])
+        for task, task_json in zip(tasks, tasks_list):
+            task_json["notes"] = notes.get(task.id, [])
+    return tasks_list
+
+def _cases_related(case_ids):
+    """Tags, clusters, connectors, custom tags and links of each case, one query each"""
+    related = {case_id: {"tags": [], "clusters": [], "connectors": [], "custom_tags": [], "link_to": []} for case_id in case_ids}
+    if not case_ids:
+        return related
+    for case_id, tag in db.session.execute(
+        select(Case_Tags.case_id, Tags).join(Tags, Tags.id==Case_Tags.tag_id).where(Case_Tags.case_id.in_(case_ids))
+    ).all():
+        related[case_id]["tags"].append(tag.to_json())
+    # Galaxies are loaded with their clusters so Cluster.to_json finds them in the session
+    for case_id, cluster, _ in db.session.execute(
+        select(Case_Galaxy_Tags.case_id, Cluster, Galaxy).join(Cluster, Cluster.id==Case_Galaxy_Tags.cluster_id)
+        .join(Galaxy, Galaxy.id==Cluster.galaxy_id).where(Case_Galaxy_Tags.case_id.in_(case_ids))
+    ).all():
+        related[case_id]["clusters"].append(cluster.to_json())
+    for case_id, instance in db.session.execute(
+        select(Case_Connector_Instance.case_id, Connector_Instance).join(Connector_Instance, Connector_Instance.id==Case_Connector_Instance.instance_id)
+        .where(Case_Connector_Instance.case_id.in_(case_ids))
+    ).all():
+        related[case_id]["connectors"].append(instance.to_json())
+    for case_id, custom_tag in db.session.execute(
+        select(Case_Custom_Tags.case_id, Custom_Tags).join(Custom_Tags, Custom_Tags.id==Case_Custom_Tags.custom_tag_id)
+        .where(Case_Custom_Tags.case_id.in_(case_ids))
+    ).all():
+        related[case_id]["custom_tags"].append(custom_tag.to_json())
+    for case_id, linked in db.session.execute(
+        select(Case_Link_Case.case_id_1, Case).join(Case, Case.id==Case_Link_Case.case_id_2).where(Case_Link_Case.case_id_1.in_(case_ids))
+    ).all():
+        related[case_id]["link_to"].append({"id": linked.id, "title": linked.title, "description": linked.description})
+    return related
+
+def serialize_cases(cases, page_dict):
+    """Serialize a page of cases, loading includes with one query each"""
+    case_ids = [case.id for case in cases]
+    if page_dict["fields"]:
+        cases_list = [sparse_json(case, page_dict["fields"]) for case in cases]
+    else:
+        related = _cases_related(case_ids)
+        cases_list = [case.to_json(related[case.id]) for case in cases]
+
+    if "tasks" in page_dict["include"] or "notes" in page_dict["include"]:
+        tasks = Task.query.filter(Task.case_id.in_(case_ids)).order_by(Task.case_order_id).all()
+        notes = dict()
+        if "notes" in page_dict["include"]:
+            notes = _task_notes([task.id for task in tasks])
+        tasks_by_case = dict()
+        for task in tasks:
+            task_json = sparse_json(task, TASK_FIELDS)
+            if "notes" in page_dict["include"]:
+                task_json["notes"] = notes.get(task.id, [])
+            tasks_by_case.setdefault(task.case_id, []).append(task_json)
+        for case, case_json in zip(cases, cases_list):
+            case_json["tasks"] = tasks_by_case.get(case.id, [])
+
+    if "orgs" in page_dict["include"]:
+        orgs_by_case = dict()
+        for case_id, org in db.session.query(Case_Org.case_id, Org).join(Org, Org.id==Case_Org.org_id).filter(Case_Org.case_id.in_(case_ids)).all():
+            orgs_by_case.setdefault(case_id, []).append({"id": org.id, "uuid": org.uuid, "name": org.name})
+        for case, case_json in zip(cases, cases_list):
+            case_json["orgs"] = orgs_by_case.get(case.id, [])
+    return cases_list
+
+def get_cases_page(query, page_dict):
+    """Return a page of cases with its next cursor"""
+    cases, next_cursor = keyset_page(query, Case, page_dict)
+    return {"cases": serialize_cases(cases, page_dict), "next_cursor": next_cursor}
+
+def get_tasks_page(query, page_dict):
+    """Return a page of tasks with its next cursor"""
+    tasks, next_cursor = keyset_page(query, Task, page_dict)
+    return {"tasks": serialize_tasks(tasks, page_dict), "next_cursor": next_cursor}
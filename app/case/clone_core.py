@@ -0,0 +1,217 @@
+import uuid
+import datetime
+
+from .. import db
+from ..db_class.db import *
+from sqlalchemy import insert, select
+
+
+# Association tables of each kind of object: (model, owner column, copied columns)
+LINKS = {
+    "case": [
+        (Case_Tags, "case_id", ["tag_id"]),
+        (Case_Galaxy_Tags, "case_id", ["cluster_id"]),
+        (Case_Connector_Instance, "case_id", ["instance_id", "identifier"]),
+        (Case_Custom_Tags, "case_id", ["custom_tag_id"])
+    ],
+    "case_template": [
+        (Case_Template_Tags, "case_id", ["tag_id"]),
+        (Case_Template_Galaxy_Tags, "template_id", ["cluster_id"]),
+        (Case_Template_Connector_Instance, "template_id", ["instance_id"]),
+        (Case_Template_Custom_Tags, "case_template_id", ["custom_tag_id"])
+    ],
+    "task": [
+        (Task_Tags, "task_id", ["tag_id"]),
+        (Task_Galaxy_Tags, "task_id", ["cluster_id"]),
+        (Task_Connector_Instance, "task_id", ["instance_id", "identifier"]),
+        (Task_Custom_Tags, "task_id", ["custom_tag_id"])
+    ],
+    "task_template": [
+        (Task_Template_Tags, "task_id", ["tag_id"]),
+        (Task_Template_Galaxy_Tags, "template_id", ["cluster_id"]),
+        (Task_Template_Connector_Instance, "template_id", ["instance_id"]),
+        (Task_Template_Custom_Tags, "task_template_id", ["custom_tag_id"])
+    ]
+}
+
+# Notes of each kind of task: (model, owner column, order column)
+NOTES = {
+    "task": (Note, "task_id", "task_order_id"),
+    "task_template": (Note_Template, "template_id", "template_order_id")
+}
+
+
+def _now():
+    return datetime.datetime.now(tz=datetime.timezone.utc)
+
+
+def copy_links(src_kind, dst_kind, id_map):
+    """Copy the association rows of src objects to dst objects, id_map is {src_id: dst_id}"""
+    if not id_map:
+        return
+    for (src_model, src_owner, src_columns), (dst_model, dst_owner, dst_columns) in zip(LINKS[src_kind], LINKS[dst_kind]):
+        columns = [column for column in src_columns if column in dst_columns]
+        rows = db.session.execute(
+            select(getattr(src_model, src_owner), *[getattr(src_model, column) for column in columns])
+                .where(getattr(src_model, src_owner).in_(id_map))
+        ).all()
+        if rows:
+            db.session.execute(insert(dst_model), [
+                {dst_owner: id_map[row[0]], **dict(zip(columns, row[1:]))} for row in rows
+            ])
+
+
+def copy_notes(src_kind, dst_kind, id_map):
+    """Copy the notes of src tasks to dst tasks, id_map is {src_id: dst_id}"""
+    if not id_map:
+        return
+    src_model, src_owner, src_order = NOTES[src_kind]
+    dst_model, dst_owner, dst_order = NOTES[dst_kind]
+    rows = db.session.execute(
+        select(getattr(src_model, src_owner), src_model.note, getattr(src_model, src_order))
+            .where(getattr(src_model, src_owner).in_(id_map))
+    ).all()
+    if rows:
+        db.session.execute(insert(dst_model), [
+            {dst_owner: id_map[owner], "uuid": str(uuid.uuid4()), "note": note, dst_order: order} for owner, note, order in rows
+        ])
+
+
+def clone_case(case, title, user):
+    """Fork a case with its tasks, notes and associations"""
+    tasks = Task.query.filter_by(case_id=case.id).order_by(Task.case_order_id).all()
+    new_case = Case(
+        title=title,
+        description=case.description,
+        uuid=str(uuid.uuid4()),
+        creation_date=_now(),
+        last_modif=_now(),
+        deadline=case.deadline,
+        status_id=1,
+        owner_org_id=user.org_id,
+        # Completed tasks are out of the order and not counted
+        nb_tasks=len([task for task in tasks if not task.completed])
+    )
+    db.session.add(new_case)
+    db.session.flush()
+    db.session.add(Case_Org(case_id=new_case.id, org_id=user.org_id))
+    copy_links("case", "case", {case.id: new_case.id})
+
+    new_tasks = [Task(
+        uuid=str(uuid.uuid4()),
+        title=task.title,
+        description=task.description,
+        url=task.url,
+        creation_date=_now(),
+        last_modif=_now(),
+        deadline=task.deadline,
+        case_id=new_case.id,
+        status_id=task.status_id if task.completed else 1,
+        completed=task.completed,
+        case_order_id=task.case_order_id,
+        nb_notes=task.nb_notes
+    ) for task in tasks]
+    db.session.add_all(new_tasks)
+    db.session.flush()
+
+    task_map = {task.id: new_task.id for task, new_task in zip(tasks, new_tasks)}
+    copy_links("task", "task", task_map)
+    copy_notes("task", "task", task_map)
+    db.session.commit()
+    return new_case
+
+
+def clone_case_to_template(case, title):
+    """Create a case template from a case, tasks become task templates"""
+    new_template = Case_Template(
+        uuid=str(uuid.uuid4()),
+        title=title,
+        description=case.description,
+        last_modif=_now()
+    )
+    db.session.add(new_template)
+    db.session.flush()
+    copy_links("case", "case_template", {case.id: new_template.id})
+
+    tasks = Task.query.filter_by(case_id=case.id).order_by(Task.case_order_id).all()
+    # A task template with the same title is reused instead of being created again
+    existing = {template.title: template.id for template in
+                Task_Template.query.filter(Task_Template.title.in_([task.title for task in tasks])).all()}
+
+    to_create = dict()
+    for task in tasks:
+        if task.title not in existing and task.title not in to_create:
+            to_create[task.title] = (task, Task_Template(
+                uuid=str(uuid.uuid4()),
+                title=task.title,
+                description=task.description,
+                url=task.url,
+                nb_notes=task.nb_notes,
+                last_modif=_now()
+            ))
+    db.session.add_all([template for _, template in to_create.values()])
+    db.session.flush()
+
+    task_map = {task.id: template.id for task, template in to_create.values()}
+    existing.update({title: template.id for title, (_, template) in to_create.items()})
+    copy_links("task", "task_template", task_map)
+    copy_notes("task", "task_template", task_map)
+
+    # A template has no completed task, the completed ones come after the others
+    case_task_rows = dict()
+    for task in sorted(tasks, key=lambda task: task.completed):
+        case_task_rows.setdefault(existing[task.title], len(case_task_rows) + 1)
+    if case_task_rows:
+        db.session.execute(insert(Case_Task_Template), [
+            {"case_id": new_template.id, "task_id": task_id, "case_order_id": order} for task_id, order in case_task_rows.items()
+        ])
+    db.session.commit()
+    return new_template
+
+
+def clone_template_to_case(template, title, user):
+    """Create a case from a case template, task templates become tasks"""
+    case_tasks = Case_Task_Template.query.filter_by(case_id=template.id).order_by(Case_Task_Template.case_order_id).all()
+    # Templates made from a case before the orders were renumbered can hold -1, they go last
+    case_tasks.sort(key=lambda case_task: case_task.case_order_id < 1)
+    task_templates = {t.id: t for t in Task_Template.query.filter(Task_Template.id.in_([c_t.task_id for c_t in case_tasks])).all()}
+
+    new_case = Case(
+        title=title,
+        description=template.description,
+        uuid=str(uuid.uuid4()),
+        creation_date=_now(),
+        last_modif=_now(),
+        status_id=1,
+        owner_org_id=user.org_id,
+        nb_tasks=len(case_tasks)
+    )
+    db.session.add(new_case)
+    db.session.flush()
+    db.session.add(Case_Org(case_id=new_case.id, org_id=user.org_id))
+    copy_links("case_template", "case", {template.id: new_case.id})
+
+    new_tasks = list()
+    for order, case_task in enumerate(case_tasks, start=1):
+        task_template = task_templates[case_task.task_id]
+        new_tasks.append((task_template, Task(
+            uuid=str(uuid.uuid4()),
+            title=task_template.title,
+            description=task_template.description,
+            url=task_template.url,
+            creation_date=_now(),
+            last_modif=_now(),
+            case_id=new_case.id,
+            status_id=1,
+            case_order_id=order,
+            nb_notes=task_template.nb_notes
+        )))
+    db.session.add_all([task for _, task in new_tasks])
+    db.session.flush()
+
+    # A task template can only be once in a case template, the map is one to one
+    task_map = {task_template.id: task.id for task_template, task in new_tasks}
+    copy_links("task_template", "task", task_map)
+    copy_notes("task_template", "task", task_map)
+    db.session.commit()
+    return new_case
@@ -2,14 +2,17 @@ import os
 import shutil
 import datetime
 import subprocess
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
-from flask import flash, send_file
+from flask import flash, send_file, current_app
 from .. import db
 from ..db_class.db import *
 from ..utils.utils import isUUID, create_specific_dir
-from sqlalchemy import desc, func
+from sqlalchemy import desc, func, and_
 from ..utils import utils
+from ..utils import tagHelper as TagHelper
 from app.utils.utils import MODULES_CONFIG
 from ..custom_tags import custom_tags_core as CustomModel
 
@@ -280,6 +283,95 @@ def get_task_connector_id(instance_id, task_id):
     """Return an instance of Task_Connector_Instance depending of an instance id and a task id"""
     return Task_Connector_Instance.query.filter_by(task_id=task_id, instance_id=instance_id).first()
 
+def get_connector_instances(names, user_id, case_id=None, task_id=None):
+    """Return {name: (instance, user instance, case or task connector)} of the instances in one query"""
+    if task_id is None:
+        link = Case_Connector_Instance
+        link_filter = and_(link.instance_id==Connector_Instance.id, link.case_id==case_id)
+    else:
+        link = Task_Connector_Instance
+        link_filter = and_(link.instance_id==Connector_Instance.id, link.task_id==task_id)
+    rows = db.session.query(Connector_Instance, User_Connector_Instance, link)\
+        .outerjoin(User_Connector_Instance, and_(User_Connector_Instance.instance_id==Connector_Instance.id,
+                                                 User_Connector_Instance.user_id==user_id))\
+        .outerjoin(link, link_filter)\
+        .where(Connector_Instance.name.in_(list(names)))\
+        .order_by(Connector_Instance.id, User_Connector_Instance.id, link.id).all()
+    instances = dict()
+    for instance, user_instance, connector in rows:
+        # Same behaviour as get_instance_by_name and the first() of the other getters
+        instances.setdefault(instance.name, (instance, user_instance, connector))
+    return instances
+
+def get_module_executor():
+    """Bounded pool of the app running modules on connector instances"""
+    if "module_executor" not in current_app.extensions:
+        current_app.extensions["module_executor"] = ThreadPoolExecutor(
+            max_workers=current_app.config.get("MODULE_WORKERS", 8), thread_name_prefix="module")
+    return current_app.extensions["module_executor"]
+
+def _module_result(future):
+    try:
+        return future.result()
+    except Exception as e:
+        return {"message": f"{type(e).__name__}: {e}"}
+
+def run_module_instances(calls, late=None):
+    """Run {instance name: function} concurrently, return {instance name: result}
+
+    The deadline of an instance starts with its call, a call over its deadline is an error for the
+    request but keeps running and its result is given to late(instance name, result) when it comes.
+    A call still waiting for a worker after the deadline is dropped.
+    """
+    timeout = current_app.config.get("MODULE_INSTANCE_TIMEOUT", 60)
+    executor = get_module_executor()
+    started = dict()
+
+    def timed(name, function):
+        started[name] = time.monotonic()
+        return function()
+
+    submitted = time.monotonic()
+    pending = {name: executor.submit(timed, name, function) for name, function in calls.items()}
+    results = dict()
+    while pending:
+        now = time.monotonic()
+        deadlines = list()
+        for name, future in list(pending.items()):
+            if future.done():
+                results[name] = _module_result(future)
+            elif name in started and now >= started[name] + timeout:
+                results[name] = {"message": "No answer before the deadline"}
+                if late:
+                    future.add_done_callback(lambda future, name=name: late(name, _module_result(future)))
+            elif name not in started and now >= submitted + timeout and future.cancel():
+                results[name] = {"message": "No free worker before the deadline"}
+            else:
+                deadlines.append(started[name] + timeout if name in started else submitted + timeout)
+                continue
+            del pending[name]
+        if pending:
+            wait(pending.values(), timeout=max(min(deadlines) - now, 0.01), return_when=FIRST_COMPLETED)
+    return results
+
+def late_results(save):
+    """Callback of run_module_instances saving a late success with save(instance name, result) in a new app context"""
+    app = current_app._get_current_object()
+    def record(name, result):
+        if isinstance(result, dict):
+            return
+        with app.app_context():
+            save(name, result)
+            db.session.commit()
+    return record
+
+def module_errors(results):
+    """Message listing the instances in error, None if all succeeded"""
+    errors = {name: res["message"] for name, res in results.items() if isinstance(res, dict)}
+    if errors:
+        return {"message": "; ".join(f"{name}: {message}" for name, message in errors.items()), "instances": errors}
+    return None
+
 def get_task_note(note_id):
     return Note.query.get(note_id)
 
@@ -400,16 +492,16 @@ def check_cluster_db(cluster):
 
 def check_tag(tag_list):
     """Check if a list of tags exist"""
-    for tag in tag_list:
-        if not utils.check_tag(tag):
-            return tag
+    invalid = TagHelper.find_invalid(tags=tag_list)
+    if invalid:
+        return invalid["tags"][0]
     return True
 
 def check_cluster(cluster_list):
     """Check if a list of clusters exist"""
-    for cluster in cluster_list:
-        if not check_cluster_db(cluster):
-            return cluster
+    invalid = TagHelper.find_invalid(clusters=cluster_list)
+    if invalid:
+        return invalid["clusters"][0]
     return True
 
 def check_connector(connector_list):
@@ -421,9 +513,9 @@ def check_connector(connector_list):
 
 def check_custom_tags(tags_list):
     """Check if a list of custom tags exist"""
-    for tag in tags_list:
-        if not CustomModel.get_custom_tag_by_name(tag):
-            return tag
+    invalid = TagHelper.find_invalid(custom_tags=tags_list)
+    if invalid:
+        return invalid["custom_tags"][0]
     return True
 
 
@@ -0,0 +1,123 @@
+import math
+from collections import defaultdict
+
+from .. import db
+from ..db_class.db import *
+from sqlalchemy import select
+from ..utils import cacheHelper as CacheHelper
+
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# Candidates come from the features held by less cases than this, common ones still count in the score
+MAX_POSTING = 1000
+
+KINDS = ["tags", "clusters", "custom_tags", "connectors"]
+# The names of the features are in the reference data
+CHANGES = CacheHelper.REFERENCE + CacheHelper.CASE_LINKS
+
+
+class CorrelationIndex:
+    """Inverted index feature -> case ids, a feature is a tag, cluster, custom tag or connector identifier"""
+    def __init__(self, rows, signature=None):
+        self.signature = signature
+        self.postings = defaultdict(set)
+        self.features = defaultdict(set)
+        self.names = dict()
+        for case_id, feature, name in rows:
+            self.postings[feature].add(case_id)
+            self.features[case_id].add(feature)
+            self.names[feature] = name
+
+        # Rare features weigh more, a feature of every case weighs almost nothing
+        nb_cases = len(self.features) or 1
+        self.weights = {feature: math.log(1 + nb_cases / len(case_ids)) for feature, case_ids in self.postings.items()}
+        self.totals = {case_id: sum(self.weights[feature] for feature in features) for case_id, features in self.features.items()}
+
+    def similar(self, case_id, limit=DEFAULT_LIMIT):
+        """[(case id, score, shared features)] best first, score is the weighted Jaccard of the features"""
+        features = self.features.get(case_id)
+        if not features:
+            return []
+        rare = [feature for feature in features if len(self.postings[feature]) <= MAX_POSTING]
+        if not rare:
+            # Only common features, the least common one gives the candidates
+            rare = [min(features, key=lambda feature: len(self.postings[feature]))]
+        common = [feature for feature in features if feature not in rare]
+
+        shared = defaultdict(list)
+        for feature in rare:
+            for other in self.postings[feature]:
+                shared[other].append(feature)
+        shared.pop(case_id, None)
+        # Common features don't bring candidates but still count for the ones found
+        for other, other_features in shared.items():
+            other_features.extend(feature for feature in common if other in self.postings[feature])
+
+        total = self.totals[case_id]
+        scores = list()
+        for other, other_features in shared.items():
+            intersection = sum(self.weights[feature] for feature in other_features)
+            scores.append((intersection / (total + self.totals[other] - intersection), other, other_features))
+        scores.sort(key=lambda loc: (-loc[0], loc[1]))
+        return [(other, score, other_features) for score, other, other_features in scores[:limit]]
+
+
+def build_index(signature=None):
+    rows = list()
+    for case_id, tag_id, name in db.session.execute(
+        select(Case_Tags.case_id, Tags.id, Tags.name).join(Tags, Tags.id==Case_Tags.tag_id)
+    ).all():
+        rows.append((case_id, ("tags", tag_id), name))
+    for case_id, cluster_id, name in db.session.execute(
+        select(Case_Galaxy_Tags.case_id, Cluster.id, Cluster.name).join(Cluster, Cluster.id==Case_Galaxy_Tags.cluster_id)
+    ).all():
+        rows.append((case_id, ("clusters", cluster_id), name))
+    for case_id, custom_tag_id, name in db.session.execute(
+        select(Case_Custom_Tags.case_id, Custom_Tags.id, Custom_Tags.name).join(Custom_Tags, Custom_Tags.id==Case_Custom_Tags.custom_tag_id)
+    ).all():
+        rows.append((case_id, ("custom_tags", custom_tag_id), name))
+    # Cases sent to the same event of an instance
+    for case_id, instance_id, identifier, name in db.session.execute(
+        select(Case_Connector_Instance.case_id, Connector_Instance.id, Case_Connector_Instance.identifier, Connector_Instance.name)
+        .join(Connector_Instance, Connector_Instance.id==Case_Connector_Instance.instance_id)
+        .where(Case_Connector_Instance.identifier.is_not(None))
+    ).all():
+        rows.append((case_id, ("connectors", instance_id, identifier), f"{name}: {identifier}"))
+    return CorrelationIndex(rows, signature)
+
+
+def get_index():
+    """Return the index of the app, rebuilt when a case got or lost a feature"""
+    return CacheHelper.cached("correlation", CHANGES, build_index)
+
+
+def parse_similar_args(args):
+    limit = args.get("limit", DEFAULT_LIMIT)
+    if not str(limit).isdigit() or not 0 < int(limit) <= MAX_LIMIT:
+        return {"message": f"limit need to be between 1 and {MAX_LIMIT}"}
+    return {"limit": int(limit)}
+
+
+def get_similar_cases(case, limit=DEFAULT_LIMIT):
+    """Most similar cases with their score and what they share with case"""
+    index = get_index()
+    similar = index.similar(case.id, limit)
+    cases = {loc.id: loc for loc in Case.query.where(Case.id.in_([case_id for case_id, _, _ in similar])).all()}
+    out = list()
+    for case_id, score, features in similar:
+        # A deleted case can still be in the index until its links are removed
+        if case_id not in cases:
+            continue
+        shared = {kind: [] for kind in KINDS}
+        for feature in sorted(features, key=lambda feature: -index.weights[feature]):
+            shared[feature[0]].append(index.names[feature])
+        out.append({
+            "id": case_id,
+            "uuid": cases[case_id].uuid,
+            "title": cases[case_id].title,
+            "completed": cases[case_id].completed,
+            "score": round(score, 4),
+            "shared": shared
+        })
+    return out
@@ -0,0 +1,197 @@
+import io
+import os
+import json
+import tarfile
+import datetime
+
+from .. import db
+from ..db_class.db import *
+from sqlalchemy import select
+
+from . import task_core as TaskModel
+
+
+EXPORT_BATCH_SIZE = 100
+
+
+def build_export_query(completed=None, date_from=None, date_to=None, org_id=None, tags=None):
+    """Build the query selecting the cases to export"""
+    query = Case.query
+    if completed is not None:
+        query = query.filter(Case.completed==completed)
+    if date_from:
+        query = query.filter(Case.creation_date >= date_from)
+    if date_to:
+        query = query.filter(Case.creation_date < date_to + datetime.timedelta(days=1))
+    if org_id:
+        query = query.filter(Case.id.in_(select(Case_Org.case_id).where(Case_Org.org_id==org_id)))
+    if tags:
+        query = query.filter(Case.id.in_(
+            select(Case_Tags.case_id).join(Tags, Tags.id==Case_Tags.tag_id).where(Tags.name.in_(tags))
+        ))
+    return query
+
+
+def parse_export_args(args):
+    """Convert request args or cli args to export filters"""
+    filters = {"completed": None, "date_from": None, "date_to": None, "org_id": None, "tags": []}
+
+    completed = args.get("completed")
+    if completed is not None and completed != "":
+        if str(completed).lower() not in ["true", "false"]:
+            return {"message": "completed need to be 'true' or 'false'"}
+        filters["completed"] = str(completed).lower() == "true"
+
+    for key in ["date_from", "date_to"]:
+        if args.get(key):
+            try:
+                filters[key] = datetime.datetime.strptime(args.get(key), "%Y-%m-%d")
+            except ValueError:
+                return {"message": f"{key} bad format, %Y-%m-%d"}
+
+    if args.get("org_id"):
+        if not str(args.get("org_id")).isdigit():
+            return {"message": "org_id need to be an id"}
+        filters["org_id"] = int(args.get("org_id"))
+
+    tags = args.get("tags")
+    if tags:
+        if isinstance(tags, str):
+            tags = [tag.strip() for tag in tags.split(",") if tag.strip()]
+        filters["tags"] = list(tags)
+    return filters
+
+
+def _group(rows):
+    """Group (key, value) rows in a dict of list"""
+    grouped = dict()
+    for key, value in rows:
+        grouped.setdefault(key, []).append(value)
+    return grouped
+
+
+def _format_date(date, date_format='%Y-%m-%d %H:%M'):
+    if date:
+        return date.strftime(date_format)
+    return date
+
+
+def _load_batch(cases, with_files=False):
+    """Serialize a batch of cases with one query per association"""
+    case_ids = [case.id for case in cases]
+
+    case_tags = _group(db.session.execute(
+        select(Case_Tags.case_id, Tags.name).join(Tags, Tags.id==Case_Tags.tag_id).where(Case_Tags.case_id.in_(case_ids))
+    ).all())
+    case_clusters = _group(db.session.execute(
+        select(Case_Galaxy_Tags.case_id, Cluster).join(Cluster, Cluster.id==Case_Galaxy_Tags.cluster_id).where(Case_Galaxy_Tags.case_id.in_(case_ids))
+    ).all())
+
+    tasks = Task.query.filter(Task.case_id.in_(case_ids)).order_by(Task.case_id, Task.case_order_id).all()
+    task_ids = [task.id for task in tasks]
+
+    task_tags = _group(db.session.execute(
+        select(Task_Tags.task_id, Tags.name).join(Tags, Tags.id==Task_Tags.tag_id).where(Task_Tags.task_id.in_(task_ids))
+    ).all())
+    task_clusters = _group(db.session.execute(
+        select(Task_Galaxy_Tags.task_id, Cluster).join(Cluster, Cluster.id==Task_Galaxy_Tags.cluster_id).where(Task_Galaxy_Tags.task_id.in_(task_ids))
+    ).all())
+    task_notes = _group(db.session.execute(
+        select(Note.task_id, Note).where(Note.task_id.in_(task_ids)).order_by(Note.task_order_id)
+    ).all())
+    task_files = dict()
+    if with_files:
+        task_files = _group(db.session.execute(
+            select(File.task_id, File).where(File.task_id.in_(task_ids))
+        ).all())
+
+    tasks_by_case = dict()
+    for task in tasks:
+        json_task = {
+            "uuid": task.uuid,
+            "title": task.title,
+            "description": task.description,
+            "url": task.url,
+            "notes": [{"uuid": note.uuid, "note": note.note, "task_uuid": task.uuid} for note in task_notes.get(task.id, [])],
+            "deadline": _format_date(task.deadline),
+            "tags": task_tags.get(task.id, []),
+            "clusters": [cluster.download() for cluster in task_clusters.get(task.id, [])]
+        }
+        if with_files:
+            json_task["files"] = [{"name": file.name, "uuid": file.uuid} for file in task_files.get(task.id, [])]
+        tasks_by_case.setdefault(task.case_id, []).append(json_task)
+
+    for case in cases:
+        json_case = {
+            "uuid": case.uuid,
+            "title": case.title,
+            "description": case.description,
+            "recurring_type": case.recurring_type,
+            "notes": case.notes,
+            "deadline": _format_date(case.deadline),
+            "recurring_date": _format_date(case.recurring_date, '%Y-%m-%d'),
+            "tags": case_tags.get(case.id, []),
+            "clusters": [cluster.download() for cluster in case_clusters.get(case.id, [])],
+            "tasks": tasks_by_case.get(case.id, [])
+        }
+        yield json_case
+
+
+def iter_export_cases(query, batch_size=EXPORT_BATCH_SIZE, with_files=False):
+    """Yield cases of the query one by one, loading them by batch"""
+    last_id = 0
+    while True:
+        cases = query.filter(Case.id > last_id).order_by(Case.id).limit(batch_size).all()
+        if not cases:
+            break
+        last_id = cases[-1].id
+        # The identity map only keeps weak references, previous batches are released
+        yield from _load_batch(cases, with_files)
+
+
+def export_ndjson(query, batch_size=EXPORT_BATCH_SIZE):
+    """Yield cases as newline delimited json"""
+    for case in iter_export_cases(query, batch_size):
+        yield json.dumps(case) + "\n"
+
+
+class _ChunkWriter(io.RawIOBase):
+    """File object keeping written bytes until they are consumed"""
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _add_tar_member(tar, name, fileobj, size):
+    info = tarfile.TarInfo(name=name)
+    info.size = size
+    info.mtime = int(datetime.datetime.now().timestamp())
+    tar.addfile(info, fileobj)
+
+
+def export_tar(query, batch_size=EXPORT_BATCH_SIZE):
+    """Yield a gzip tar with a json per case and the attachments of its tasks"""
+    writer = _ChunkWriter()
+    with tarfile.open(fileobj=writer, mode="w|gz") as tar:
+        for case in iter_export_cases(query, batch_size, with_files=True):
+            case_data = json.dumps(case, indent=4).encode()
+            _add_tar_member(tar, f"cases/{case['uuid']}.json", io.BytesIO(case_data), len(case_data))
+            for task in case["tasks"]:
+                for file in task["files"]:
+                    file_path = os.path.join(TaskModel.FILE_FOLDER, file["uuid"])
+                    if os.path.isfile(file_path):
+                        with open(file_path, "rb") as read_file:
+                            _add_tar_member(tar, f"files/{file['uuid']}", read_file, os.path.getsize(file_path))
+            yield writer.pop()
+    yield writer.pop()
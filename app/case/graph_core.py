@@ -0,0 +1,72 @@
+from .. import db
+from ..db_class.db import Case, Case_Link_Case
+from sqlalchemy import select, literal, func
+
+
+DEFAULT_DEPTH = 1
+MAX_DEPTH = 10
+# Nodes returned at most, with a depth the closest ones are kept
+MAX_NODES = 2000
+
+
+def verif_graph_args(args):
+    """Depth is a number of hops up to MAX_DEPTH, or 'all' for the whole connected component"""
+    depth = args.get("depth", DEFAULT_DEPTH)
+    if depth == "all":
+        return {"depth": None}
+    try:
+        depth = int(depth)
+    except (TypeError, ValueError):
+        return {"message": "depth must be a number or 'all'"}
+    if depth < 1 or depth > MAX_DEPTH:
+        return {"message": f"depth must be between 1 and {MAX_DEPTH}"}
+    return {"depth": depth}
+
+
+def reachable(case_id, depth=None):
+    """{case id: hops} of the cases linked to case_id within depth hops, in one recursive query
+
+    Links are stored in both directions, following case_id_1 -> case_id_2 reaches everything.
+    """
+    if depth is None:
+        # Without depth the union of ids stops on cycles by itself
+        reach = select(literal(case_id).label("case_id")).cte("reach", recursive=True)
+        reach = reach.union(
+            select(Case_Link_Case.case_id_2).join(reach, Case_Link_Case.case_id_1==reach.c.case_id)
+        )
+        query = select(reach.c.case_id, literal(None))
+    else:
+        reach = select(literal(case_id).label("case_id"), literal(0).label("depth")).cte("reach", recursive=True)
+        reach = reach.union(
+            select(Case_Link_Case.case_id_2, reach.c.depth + 1)
+            .join(reach, Case_Link_Case.case_id_1==reach.c.case_id)
+            .where(reach.c.depth < depth)
+        )
+        query = select(reach.c.case_id, func.min(reach.c.depth).label("depth")).group_by(reach.c.case_id).order_by("depth")
+    return dict(db.session.execute(query.limit(MAX_NODES + 1)).all())
+
+
+def get_graph(case, depth=DEFAULT_DEPTH):
+    """Nodes and edges around a case, edges are [case id, case id] pairs given once"""
+    hops = reachable(case.id, depth)
+    truncated = len(hops) > MAX_NODES
+    if truncated:
+        hops = dict(list(hops.items())[:MAX_NODES])
+    hops[case.id] = 0
+
+    ids = list(hops)
+    nodes = [
+        {"id": case_id, "uuid": uuid, "title": title, "status_id": status_id, "completed": completed, "depth": hops[case_id]}
+        for case_id, uuid, title, status_id, completed in db.session.execute(
+            select(Case.id, Case.uuid, Case.title, Case.status_id, Case.completed).where(Case.id.in_(ids)).order_by(Case.id)
+        ).all()
+    ]
+    edges = [
+        [case_id_1, case_id_2] for case_id_1, case_id_2 in db.session.execute(
+            select(Case_Link_Case.case_id_1, Case_Link_Case.case_id_2).distinct()
+            .where(Case_Link_Case.case_id_1.in_(ids), Case_Link_Case.case_id_2.in_(ids),
+                   Case_Link_Case.case_id_1 < Case_Link_Case.case_id_2)
+            .order_by(Case_Link_Case.case_id_1, Case_Link_Case.case_id_2)
+        ).all()
+    ]
+    return {"case_id": case.id, "depth": depth, "nodes": nodes, "edges": edges, "truncated": truncated}
@@ -0,0 +1,79 @@
+from .. import db
+from ..db_class.db import *
+from sqlalchemy import update, func, case as sql_case
+
+
+# Ordered lists: (model, scope column, key column, extra scope conditions)
+ORDERED = {
+    "task": (Task, "case_id", "id", lambda: [Task.completed==False]),
+    "task_template": (Case_Task_Template, "case_id", "task_id", lambda: [])
+}
+
+
+def _scope(kind, scope_id):
+    model, scope_column, _, extra = ORDERED[kind]
+    return model, [getattr(model, scope_column)==scope_id, *extra()]
+
+
+def _values(model, **values):
+    """Bulk updates skip the orm events, bump the version of versioned rows here"""
+    if hasattr(model, "version"):
+        values["version"] = func.coalesce(model.version, 0) + 1
+    return values
+
+
+def close_gap(kind, scope_id, old_order):
+    """Shift down every element placed after old_order, in one statement"""
+    model, conditions = _scope(kind, scope_id)
+    db.session.execute(
+        update(model).where(*conditions, model.case_order_id > old_order)
+                     .values(**_values(model, case_order_id=model.case_order_id - 1))
+                     .execution_options(synchronize_session="fetch")
+    )
+
+
+def move(kind, scope_id, row, new_order):
+    """Move a row to new_order, shifting the elements in between"""
+    model, conditions = _scope(kind, scope_id)
+    old_order = row.case_order_id
+    if new_order == old_order:
+        return
+    if new_order < old_order:
+        stmt = update(model).where(*conditions, model.case_order_id >= new_order, model.case_order_id < old_order) \
+                            .values(**_values(model, case_order_id=model.case_order_id + 1))
+    else:
+        stmt = update(model).where(*conditions, model.case_order_id > old_order, model.case_order_id <= new_order) \
+                            .values(**_values(model, case_order_id=model.case_order_id - 1))
+    db.session.execute(stmt.execution_options(synchronize_session="fetch"))
+    row.case_order_id = new_order
+
+
+def move_up_down(kind, scope_id, row, up_down):
+    """Swap a row with its neighbour, up_down is 'true' to move up"""
+    new_order = row.case_order_id - 1 if up_down == "true" else row.case_order_id + 1
+    model, conditions = _scope(kind, scope_id)
+    if not db.session.query(model.id).filter(*conditions, model.case_order_id==new_order).first():
+        return
+    move(kind, scope_id, row, new_order)
+
+
+def reorder(kind, scope_id, keys):
+    """Set the order of a whole list in one statement, keys is the new sequence"""
+    model, conditions = _scope(kind, scope_id)
+    key_column = getattr(model, ORDERED[kind][2])
+
+    if not isinstance(keys, list) or not all(str(key).isdigit() for key in keys):
+        return {"message": "Need to pass a list of id"}
+    keys = [int(key) for key in keys]
+    present = {row[0] for row in db.session.query(key_column).filter(*conditions).all()}
+    if len(keys) != len(set(keys)) or set(keys) != present:
+        return {"message": "The list need to contain each task exactly once"}
+    if not keys:
+        return {}
+
+    db.session.execute(
+        update(model).where(*conditions, key_column.in_(keys))
+                     .values(**_values(model, case_order_id=sql_case({key: index for index, key in enumerate(keys, 1)}, value=key_column)))
+                     .execution_options(synchronize_session="fetch")
+    )
+    return {}
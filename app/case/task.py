@@ -529,6 +529,24 @@ def change_order(cid, tid):
     return {"message": "Case Not found", 'toast_class': "danger-subtle"}, 404
 
 
+@task_blueprint.route("/<cid>/reorder_tasks", methods=['POST'])
+@login_required
+@editor_required
+def reorder_tasks(cid):
+    """Set the order of all the active tasks of a case"""
+    case = CommonModel.get_case(cid)
+    if case:
+        if CaseModel.get_present_in_case(cid, current_user) or current_user.is_admin():
+            if "tasks" in request.json:
+                res = TaskModel.reorder_case_tasks(case, request.json["tasks"], current_user)
+                if "message" in res:
+                    return {"message": res["message"], 'toast_class': "danger-subtle"}, 400
+                return {"message": "Order changed", 'toast_class': "success-subtle"}, 200
+            return {"message": "Need to pass tasks", 'toast_class': "danger-subtle"}, 400
+        return {"message": "Permission denied", 'toast_class': "danger-subtle"}, 403
+    return {"message": "Case Not found", 'toast_class': "danger-subtle"}, 404
+
+
 @task_blueprint.route("/get_task_modules", methods=['GET'])
 @login_required
 def get_task_modules():
@@ -6,6 +6,7 @@ from . import case_core_api as CaseModelApi
 
 from flask_restx import Api, Resource
 from ..decorators import api_required, editor_required
+from ..utils.conditionalHelper import conditional_response
 
 api_task_blueprint = Blueprint('api_task', __name__)
 api = Api(api_task_blueprint,
@@ -27,10 +28,13 @@ class GetTask(Resource):
     def get(self, tid):
         task = CommonModel.get_task(tid)
         if task:
-            loc = dict()
-            loc["users_assign"], loc["is_current_user_assign"] = TaskModel.get_users_assign_task(task.id, CaseModelApi.get_user_api(request.headers))
-            loc["task"] = task.to_json()
-            return loc, 200
+            user = CaseModelApi.get_user_api(request.headers)
+            def serialize():
+                loc = dict()
+                loc["users_assign"], loc["is_current_user_assign"] = TaskModel.get_users_assign_task(task.id, user)
+                loc["task"] = task.to_json()
+                return loc
+            return conditional_response(task, serialize, user.id)
         return {"message": "Task not found"}, 404
     
 
@@ -12,6 +12,7 @@ from werkzeug.utils import secure_filename
 from ..notification import notification_core as NotifModel
 
 from . import common_core as CommonModel
+from . import order_core as OrderModel
 from ..custom_tags import custom_tags_core as CustomModel
 
 from app.utils.utils import MODULES, MODULES_CONFIG
@@ -21,10 +22,8 @@ UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads")
 FILE_FOLDER = os.path.join(UPLOAD_FOLDER, "files")
 
 def reorder_tasks(case, task_order_id):
-    for task_in_case in case.tasks:
-        if task_in_case.case_order_id > task_order_id:
-            task_in_case.case_order_id -= 1
-            db.session.commit()
+    """Close the gap left by a task removed from the active list"""
+    OrderModel.close_gap("task", case.id, task_order_id)
     case.nb_tasks -= 1
     db.session.commit()
 
@@ -74,11 +73,14 @@ def complete_task(tid, current_user):
         task_users = Task_User.query.where(Task_User.task_id==task.id).all()
         if task.completed:
             task.status_id = Status.query.filter_by(name="Finished").first().id
+            task.finish_date = datetime.datetime.now(tz=datetime.timezone.utc)
+            old_order = task.case_order_id
             task.case_order_id = -1
-            reorder_tasks(case, task.case_order_id)
+            reorder_tasks(case, old_order)
             message = f"Task '{task.id}-{task.title}' of case '{case.id}-{case.title}' completed"
         else:
             task.status_id = Status.query.filter_by(name="Created").first().id
+            task.finish_date = None
             case.nb_tasks += 1
             task.case_order_id = case.nb_tasks
             message = f"Task '{task.id}-{task.title}' of case '{case.id}-{case.title}' revived"
@@ -385,6 +387,7 @@ def delete_note(tid, note_id):
         if note.task_id == int(tid):
             Note.query.filter_by(id=note_id).delete()
             db.session.commit()
+            CommonModel.update_last_modif_task(tid)
             return True
     return False
 
@@ -617,21 +620,23 @@ def sort_tasks_by_filter(case, user, filter, taxonomies=[], galaxies=[], tags=[]
 
 def change_order(case, task, up_down):
     """Change the order of tasks"""
-    for task_in_case in case.tasks:
-        # A task move up, case_order_id decrease by one
-        if up_down == "true":
-            if task_in_case.case_order_id == task.case_order_id - 1:
-                task_in_case.case_order_id += 1
-                task.case_order_id -= 1
-                break
-        else:
-            if task_in_case.case_order_id == task.case_order_id + 1:
-                task_in_case.case_order_id -= 1
-                task.case_order_id += 1
-                break
+    # A task move up, case_order_id decrease by one
+    OrderModel.move_up_down("task", case.id, task, up_down)
     db.session.commit()
 
 
+def reorder_case_tasks(case, tasks_id, current_user):
+    """Set the order of the active tasks of a case"""
+    res = OrderModel.reorder("task", case.id, tasks_id)
+    if "message" in res:
+        db.session.rollback()
+        return res
+    CommonModel.update_last_modif(case.id)
+    db.session.commit()
+    CommonModel.save_history(case.uuid, current_user, "Tasks reordered")
+    return res
+
+
 def get_task_modules():
     """Return modules for task only"""
     loc_list = {}
@@ -660,6 +665,18 @@ def get_instance_module_core(module, type_module, task_id, user_id):
     return []
 
 
+def save_task_identifier(task_id, instance_id, event_id):
+    """Save the event of a task on an instance"""
+    task_instance = CommonModel.get_task_connector_id(instance_id, task_id)
+    if not task_instance:
+        db.session.add(Task_Connector_Instance(
+            task_id=task_id,
+            instance_id=instance_id,
+            identifier=event_id
+        ))
+    elif not task_instance.identifier == event_id:
+        task_instance.identifier = event_id
+
 def call_module_task(module, instances, case, task, user):
     """Run a module"""
     org = CommonModel.get_org(case.owner_org_id)
@@ -672,11 +689,13 @@ def call_module_task(module, instances, case, task, user):
     task = task.to_json()
     task["status"] = CommonModel.get_status(task["status_id"]).name
 
-    for instance in list(instances.keys()):
-        instance_key = instance
-        instance = CommonModel.get_instance_by_name(instance)
-        user_instance = CommonModel.get_user_instance_both(user.id, instance.id)
-        task_instance_id = CommonModel.get_task_connector_id(instance.id, task["id"])
+    connector_instances = CommonModel.get_connector_instances(instances.keys(), user.id, task_id=task["id"])
+    results, calls = dict(), dict()
+    for instance_key in list(instances.keys()):
+        if instance_key not in connector_instances:
+            results[instance_key] = {"message": "Instance not found"}
+            continue
+        instance, user_instance, task_instance_id = connector_instances[instance_key]
 
         instance = instance.to_json()
         if user_instance:
@@ -685,24 +704,23 @@ def call_module_task(module, instances, case, task, user):
             instance["identifier"] = instances[instance_key]
 
         ## Handler
-        event_id = MODULES[module].handler(instance, case, task, user)
-        if isinstance(event_id, dict):
-            return event_id
-
-        if not task_instance_id:
-            tc_instance = Task_Connector_Instance(
-                task_id=task["id"],
-                instance_id=instance["id"],
-                identifier=event_id
-            )
-            db.session.add(tc_instance)
-            db.session.commit()
+        calls[instance_key] = lambda instance=instance: MODULES[module].handler(instance, case, task, user)
 
-        elif not task_instance_id.identifier == event_id:
-            task_instance_id.identifier = event_id
-            db.session.commit()
+    instance_ids = {instance_key: loc[0].id for instance_key, loc in connector_instances.items()}
+    # An event made after the deadline is still saved, it would be created again on the next push otherwise
+    save = lambda instance_key, event_id: save_task_identifier(task["id"], instance_ids[instance_key], event_id)
+    results.update(CommonModel.run_module_instances(calls, late=CommonModel.late_results(save)))
+
+    ## Identifiers of all the instances that succeeded are saved together
+    for instance_key, event_id in results.items():
+        if not isinstance(event_id, dict):
+            save(instance_key, event_id)
+    db.session.commit()
 
-    CommonModel.save_history(case.uuid, user, f"Task Module {module} used on instances: {', '.join(list(instances.keys))}")
+    succeeded = [instance_key for instance_key, res in results.items() if not isinstance(res, dict)]
+    if succeeded:
+        CommonModel.save_history(case["uuid"], user, f"Task Module {module} used on instances: {', '.join(succeeded)}")
+    return CommonModel.module_errors(results)
 
 
 def call_module_task_no_instance(module, task, case, current_user, user_id):
@@ -0,0 +1,159 @@
+import re
+import json
+import bisect
+from collections import defaultdict
+
+from .. import db
+from ..db_class.db import *
+from sqlalchemy import select, or_
+from ..utils import cacheHelper as CacheHelper
+
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# Maximum number of prefix keys scanned for one search
+MAX_SCAN = 20000
+TRIGRAM_THRESHOLD = 0.5
+
+# Rank of a key, lower is better
+NAME, NAME_TOKEN, SYNONYM, SYNONYM_TOKEN = range(4)
+
+
+def normalize(term):
+    return term.strip().lower()
+
+def tokens(term):
+    return [token for token in re.split(r"[^a-z0-9]+", term) if token]
+
+def trigrams(term):
+    term = f"  {term} "
+    return {term[i:i+3] for i in range(len(term) - 2)}
+
+
+def get_synonyms(meta):
+    """Synonyms of a cluster, stored in its json meta"""
+    if not meta:
+        return []
+    try:
+        synonyms = json.loads(meta).get("synonyms", [])
+    except (ValueError, AttributeError):
+        return []
+    return [synonym for synonym in synonyms if isinstance(synonym, str)]
+
+
+class TypeaheadIndex:
+    """Sorted prefix keys and trigram postings over tag names, cluster names and synonyms"""
+    def __init__(self, entries, signature=None):
+        self.entries = entries
+        self.signature = signature
+        keys = list()
+        self.trigrams = defaultdict(set)
+        for index, entry in enumerate(entries):
+            terms = [(normalize(entry["name"]), NAME, None)]
+            terms += [(normalize(synonym), SYNONYM, synonym) for synonym in entry.pop("synonyms", [])]
+            for term, rank, synonym in terms:
+                keys.append((term, rank, index, synonym))
+                for token in tokens(term):
+                    if token != term:
+                        keys.append((token, rank + 1, index, synonym))
+                for trigram in trigrams(term):
+                    self.trigrams[trigram].add(index)
+        keys.sort(key=lambda key: key[0])
+        self.keys = keys
+        self.terms = [key[0] for key in keys]
+
+    def _allowed(self, entry, types, taxonomies, galaxies):
+        if types and entry["type"] not in types:
+            return False
+        if entry["type"] == "tag" and taxonomies:
+            return entry["scope"] in taxonomies
+        if entry["type"] == "cluster" and galaxies:
+            return entry["scope"] in galaxies
+        return True
+
+    def search(self, query, limit=DEFAULT_LIMIT, types=None, taxonomies=None, galaxies=None):
+        """Return the best matches for query, names or words starting with it, otherwise similar names"""
+        query = normalize(query)
+        if not query:
+            return []
+        best = dict()
+        start = bisect.bisect_left(self.terms, query)
+        for term, rank, index, synonym in self.keys[start:start + MAX_SCAN]:
+            if not term.startswith(query):
+                break
+            score = (0 if term == query else 1, rank)
+            if index not in best or score < best[index][0]:
+                best[index] = (score, synonym)
+
+        # Similar names are only proposed when nothing starts with the query
+        if not best and len(query) >= 3:
+            query_trigrams = trigrams(query)
+            common = defaultdict(int)
+            for trigram in query_trigrams:
+                for index in self.trigrams.get(trigram, ()):
+                    common[index] += 1
+            for index, nb in common.items():
+                similarity = nb / len(query_trigrams)
+                if index not in best and similarity >= TRIGRAM_THRESHOLD:
+                    best[index] = ((2, -similarity), None)
+
+        matches = [(score, len(self.entries[index]["name"]), self.entries[index]["name"], index, synonym)
+                   for index, (score, synonym) in best.items()
+                   if self._allowed(self.entries[index], types, taxonomies, galaxies)]
+        matches.sort(key=lambda match: match[:3])
+
+        out = list()
+        for _, _, _, index, synonym in matches[:limit]:
+            entry = dict(self.entries[index])
+            if synonym:
+                entry["synonym"] = synonym
+            out.append(entry)
+        return out
+
+
+def build_index(signature=None):
+    """Load not excluded tags and clusters in a new index"""
+    entries = list()
+    tags = db.session.execute(
+        select(Tags.id, Tags.name, Tags.color, Taxonomy.name)
+            .join(Taxonomy, Taxonomy.id==Tags.taxonomy_id)
+            .where(Taxonomy.exclude.isnot(True), or_(Tags.exclude.is_(None), Tags.exclude==False))
+    ).all()
+    for tag_id, name, color, taxonomy in tags:
+        entries.append({"type": "tag", "id": tag_id, "name": name, "color": color, "scope": taxonomy})
+
+    clusters = db.session.execute(
+        select(Cluster.id, Cluster.name, Cluster.tag, Cluster.meta, Galaxy.name, Galaxy.icon)
+            .join(Galaxy, Galaxy.id==Cluster.galaxy_id)
+            .where(Galaxy.exclude.isnot(True), or_(Cluster.exclude.is_(None), Cluster.exclude==False))
+    ).all()
+    for cluster_id, name, tag, meta, galaxy, icon in clusters:
+        entries.append({"type": "cluster", "id": cluster_id, "name": name, "tag": tag, "scope": galaxy,
+                        "icon": icon, "synonyms": get_synonyms(meta)})
+    return TypeaheadIndex(entries, signature)
+
+
+def get_index():
+    """Return the index of the app, rebuilt when the reference data changed"""
+    return CacheHelper.cached("typeahead", CacheHelper.REFERENCE, build_index)
+
+
+def parse_search_args(args):
+    """Convert request args to search parameters"""
+    limit = args.get("limit", DEFAULT_LIMIT)
+    if not str(limit).isdigit() or not 0 < int(limit) <= MAX_LIMIT:
+        return {"message": f"limit need to be between 1 and {MAX_LIMIT}"}
+    types = [loc for loc in args.get("type", "").split(",") if loc]
+    if any(loc not in ["tag", "cluster"] for loc in types):
+        return {"message": "type need to be 'tag' or 'cluster'"}
+    return {
+        "query": args.get("q", ""),
+        "limit": int(limit),
+        "types": types,
+        "taxonomies": [loc for loc in args.get("taxonomies", "").split(",") if loc],
+        "galaxies": [loc for loc in args.get("galaxies", "").split(",") if loc]
+    }
+
+
+def search(query, limit=DEFAULT_LIMIT, types=None, taxonomies=None, galaxies=None):
+    return get_index().search(query, limit, types, taxonomies, galaxies)
@@ -1,6 +1,9 @@
 from .. import db, login_manager
 from werkzeug.security import check_password_hash, generate_password_hash
 from flask_login import  UserMixin, AnonymousUserMixin
+from sqlalchemy import event, insert, update
+from sqlalchemy.orm import Session
+import uuid
 
 
 class User(UserMixin, db.Model):
@@ -77,8 +80,10 @@ class Case(db.Model):
     nb_tasks = db.Column(db.Integer, index=True)
     notes = db.Column(db.String, nullable=True)
     hedgedoc_url = db.Column(db.String, nullable=True)
+    version = db.Column(db.Integer, default=0)
 
-    def to_json(self):
+    def to_json(self, related=None):
+        """related: tags, clusters, connectors, custom_tags and link_to already loaded for a list of cases"""
         json_dict = {
             "id": self.id,
             "uuid": self.uuid,
@@ -110,6 +115,10 @@ class Case(db.Model):
         else:
             json_dict["recurring_date"] = self.recurring_date
 
+        if related is not None:
+            json_dict.update(related)
+            return json_dict
+
         json_dict["tags"] = [tag.to_json() for tag in Tags.query.join(Case_Tags, Case_Tags.tag_id==Tags.id).filter_by(case_id=self.id).all()]
         json_dict["clusters"] = [cluster.to_json() for cluster in Cluster.query.join(Case_Galaxy_Tags, Case_Galaxy_Tags.case_id==self.id)\
                                                     .where(Cluster.id==Case_Galaxy_Tags.cluster_id).all()]
@@ -168,6 +177,7 @@ class Task(db.Model):
     case_order_id = db.Column(db.Integer, index=True)
     files = db.relationship('File', backref='task', lazy='dynamic', cascade="all, delete-orphan")
     nb_notes = db.Column(db.Integer, index=True)
+    version = db.Column(db.Integer, default=0)
 
     def to_json(self):
         json_dict = {
@@ -313,8 +323,8 @@ class Status(db.Model):
 
 class Task_User(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    task_id = db.Column(db.Integer)
-    user_id = db.Column(db.Integer)
+    task_id = db.Column(db.Integer, index=True)
+    user_id = db.Column(db.Integer, index=True)
 
 class Case_Org(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -378,6 +388,7 @@ class Case_Template(db.Model):
     title = db.Column(db.String(64), index=True)
     description = db.Column(db.String, nullable=True)
     last_modif = db.Column(db.DateTime, index=True)
+    version = db.Column(db.Integer, default=0)
 
     def to_json(self):
         json_dict =  {
@@ -422,6 +433,7 @@ class Task_Template(db.Model):
     notes = db.relationship('Note_Template', backref='task_template', lazy='dynamic', cascade="all, delete-orphan")
     nb_notes = db.Column(db.Integer, index=True)
     last_modif = db.Column(db.DateTime, index=True)
+    version = db.Column(db.Integer, default=0)
 
     def to_json(self):
         json_dict =  {
@@ -700,6 +712,7 @@ class Case_Connector_Instance(db.Model):
     case_id = db.Column(db.Integer, index=True)
     instance_id = db.Column(db.Integer, index=True)
     identifier = db.Column(db.String)
+    last_sync = db.Column(db.DateTime, nullable=True)
 
 class Task_Connector_Instance(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -783,8 +796,74 @@ class Case_Link_Case(db.Model):
     case_id_1 = db.Column(db.Integer, index=True)
     case_id_2 = db.Column(db.Integer, index=True)
 
+class Stats_Daily(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    day = db.Column(db.Date, index=True)
+    kind = db.Column(db.String(10), index=True)
+    org_id = db.Column(db.Integer, index=True, nullable=True)
+    user_id = db.Column(db.Integer, index=True, nullable=True)
+    opened = db.Column(db.Integer, default=0)
+    closed = db.Column(db.Integer, default=0)
+    open = db.Column(db.Integer, default=0)
+    overdue = db.Column(db.Integer, default=0)
+    close_hours = db.Column(db.Float, default=0)
+    close_buckets = db.Column(db.String)
+
+class Stats_Rollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    day = db.Column(db.Date, index=True, unique=True)
+    rolled_at = db.Column(db.DateTime)
+
+class Change_Counter(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    name = db.Column(db.String(32), index=True, unique=True)
+    # New for each database, a recreated counter never gives back an old signature
+    uuid = db.Column(db.String(36))
+    value = db.Column(db.Integer, default=0)
+
 login_manager.anonymous_user = AnonymousUser
 
+
+@event.listens_for(Case, "before_update")
+@event.listens_for(Task, "before_update")
+@event.listens_for(Case_Template, "before_update")
+@event.listens_for(Task_Template, "before_update")
+def bump_version(mapper, connection, target):
+    """Increase the version used to build the ETag of an object"""
+    target.version = (target.version or 0) + 1
+
+
+# Tables of each change counter, the caches built from them are rebuilt when the counter moves
+CHANGE_GROUPS = {
+    "reference": [Taxonomy, Tags, Galaxy, Cluster, Custom_Tags],
+    "case_links": [Case_Tags, Case_Galaxy_Tags, Case_Custom_Tags, Case_Connector_Instance, Connector_Instance]
+}
+
+def bump_changes(connection, tables):
+    """Increase the counters of the groups holding one of the written tables"""
+    for name, models in CHANGE_GROUPS.items():
+        if not any(model.__tablename__ in tables for model in models):
+            continue
+        counter = Change_Counter.__table__
+        result = connection.execute(update(counter).where(counter.c.name==name).values(value=counter.c.value + 1))
+        if not result.rowcount:
+            connection.execute(insert(counter).values(name=name, uuid=str(uuid.uuid4()), value=1))
+
+@event.listens_for(Session, "after_flush")
+def count_flushed_changes(session, flush_context):
+    tables = {obj.__tablename__ for obj in [*session.new, *session.dirty, *session.deleted]}
+    bump_changes(session.connection(), tables)
+
+@event.listens_for(Session, "do_orm_execute")
+def count_bulk_changes(orm_execute_state):
+    """Bulk insert, update and delete statements don't go through the flush"""
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        bump_changes(orm_execute_state.session.connection(), {orm_execute_state.statement.table.name})
+
+@event.listens_for(Change_Counter.__table__, "after_create")
+def create_counters(target, connection, **kw):
+    connection.execute(insert(target), [{"name": name, "uuid": str(uuid.uuid4()), "value": 0} for name in CHANGE_GROUPS])
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
\ No newline at end of file
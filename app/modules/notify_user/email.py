@@ -1,5 +1,13 @@
 import conf.config_module as Config
 import smtplib
+import json
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import defaultdict
+from flask import current_app
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
@@ -7,44 +15,278 @@ from email.mime.text import MIMEText
 module_config = {
     "case_task": "task"
 }
+module_path = os.path.join(os.getcwd(), "app", "modules", "notify_user")
+SPOOL_FOLDER = os.path.join(module_path, "mail_spool")
 
-def handler(task, case, current_user, user):
-    """
-    task: id, uuid, title, description, url, notes, creation_date, last_modif, case_id, status_id, status,
-                   completed, deadline, finish_date, tags, clusters, connectors
-    
-    user: id, first_name, last_name, email, role_id, password_hash, api_key, org_id
-    """
-    
+SUBJECT = 'flowintel notification'
+MAX_ATTEMPTS = 5
+# Seconds before the first retry, doubled at each attempt
+BACKOFF = 30
+# Seconds between two looks at the spool when nothing is queued
+POLL_INTERVAL = 5
+# Seconds an unused SMTP session is kept open
+SESSION_IDLE = 60
+# Seconds after which a message claimed by a process stopped before sending it is given back
+CLAIM_TIMEOUT = 600
 
-    # Destinataire et contenu de l'email
-    recipient_email = user.email
-    subject = 'flowintel notification'
-    body = f'{current_user.first_name} {current_user.last_name} notify you on task {task.title} \n (http://{Config.ORIGIN_URL}/case/{task.case_id})'
+logger = logging.getLogger("flowintel.email")
+
+
+class Spool:
+    """Outbound messages, one json file each, moved to processing/ while sent and to failed/ when given up"""
+    def __init__(self, path=SPOOL_FOLDER):
+        self.path = path
+        self.failed_path = os.path.join(path, "failed")
+        self.processing_path = os.path.join(path, "processing")
+        os.makedirs(self.failed_path, exist_ok=True)
+        os.makedirs(self.processing_path, exist_ok=True)
+
+    def put(self, recipient, subject, body):
+        now = time.time()
+        message = {"recipient": recipient, "subject": subject, "body": body,
+                   "created": now, "attempts": 0, "next_try": now}
+        name = f"{time.time_ns()}-{uuid.uuid4()}.json"
+        self.write(os.path.join(self.path, name), message)
+
+    def write(self, path, message):
+        # Written aside then renamed, the worker never reads a partial file
+        tmp = os.path.join(self.path, f".{os.path.basename(path)}.tmp")
+        with open(tmp, "w") as write_file:
+            json.dump(message, write_file)
+        os.replace(tmp, path)
+
+    def load(self):
+        """Return [(path, message)] oldest first"""
+        messages = list()
+        for name in sorted(os.listdir(self.path)):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.path, name)
+            try:
+                with open(path) as read_file:
+                    messages.append((path, json.load(read_file)))
+            except (OSError, ValueError):
+                continue
+        return messages
 
-    # Création du message
+    def claim(self, path):
+        """Move a message to processing/, return (claimed path, message) or None if another worker took it"""
+        claimed = os.path.join(self.processing_path, os.path.basename(path))
+        try:
+            # The time of the claim, see recover
+            os.utime(path)
+            os.rename(path, claimed)
+            with open(claimed) as read_file:
+                return claimed, json.load(read_file)
+        except FileNotFoundError:
+            return None
+
+    def release(self, path, message):
+        """Put back a claimed message with its new state"""
+        self.write(os.path.join(self.path, os.path.basename(path)), message)
+        self.remove(path)
+
+    def recover(self):
+        """Put back the messages claimed by a process stopped before sending them"""
+        for name in os.listdir(self.processing_path):
+            claimed = os.path.join(self.processing_path, name)
+            try:
+                if time.time() - os.path.getmtime(claimed) > CLAIM_TIMEOUT:
+                    os.rename(claimed, os.path.join(self.path, name))
+            except FileNotFoundError:
+                continue
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Already sent
+            pass
+
+    def fail(self, path):
+        os.replace(path, os.path.join(self.failed_path, os.path.basename(path)))
+
+
+def digest(messages):
+    """Subject and body of the mail sent for the messages of one recipient"""
+    if len(messages) == 1:
+        return messages[0]["subject"], messages[0]["body"]
+    body = "\n\n".join(message["body"] for message in messages)
+    return f"{SUBJECT}s ({len(messages)})", body
+
+
+def build_mail(recipient, subject, body):
     message = MIMEMultipart()
     message['From'] = Config.SENDER_EMAIL
-    message['To'] = recipient_email
+    message['To'] = recipient
     message['Subject'] = subject
-
-    # Ajout du corps du message
     message.attach(MIMEText(body, 'plain'))
+    return message.as_string()
+
+
+class MailWorker:
+    """Drain the spool in a thread over one authenticated SMTP session"""
+    def __init__(self, spool, window=None):
+        self.spool = spool
+        # Messages of a recipient are held that long to be sent as one digest
+        self.window = Config.SMTP_DIGEST_WINDOW if window is None else window
+        self.smtp = None
+        self.last_used = 0
+        self.wakeup = threading.Event()
+        self.stopped = False
+        self.thread = None
 
-    # Connexion au serveur SMTP
-    server = smtplib.SMTP(Config.SMTP_SERVER, Config.SMTP_PORT)
-    server.starttls()
-    server.login(Config.SENDER_EMAIL, Config.SENDER_PASSOWRD)
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="mail-delivery", daemon=True)
+        self.thread.start()
 
-    # Envoi de l'email
-    server.sendmail(Config.SENDER_EMAIL, recipient_email, message.as_string())
+    def notify(self):
+        self.wakeup.set()
 
-    # Fermeture de la connexion SMTP
-    server.quit()
+    def stop(self):
+        self.stopped = True
+        self.wakeup.set()
+        if self.thread:
+            self.thread.join()
+        self.close()
 
-    print("L'email a été envoyé avec succès.")
+    def _run(self):
+        while not self.stopped:
+            try:
+                self.drain()
+            except Exception as e:
+                logger.warning(f"Mail spool error: {e}")
+            if self.smtp and time.monotonic() - self.last_used > SESSION_IDLE:
+                self.close()
+            self.wakeup.wait(POLL_INTERVAL)
+            self.wakeup.clear()
+
+    def session(self):
+        """Open SMTP session, a new one is made if the server closed it"""
+        if self.smtp is not None:
+            try:
+                self.smtp.noop()
+            except smtplib.SMTPException:
+                self.smtp = None
+        if self.smtp is None:
+            smtp = smtplib.SMTP(Config.SMTP_SERVER, Config.SMTP_PORT, timeout=Config.SMTP_TIMEOUT)
+            try:
+                if Config.SMTP_STARTTLS:
+                    smtp.starttls()
+                if Config.SENDER_PASSOWRD:
+                    smtp.login(Config.SENDER_EMAIL, Config.SENDER_PASSOWRD)
+            except:
+                smtp.close()
+                raise
+            self.smtp = smtp
+        self.last_used = time.monotonic()
+        return self.smtp
+
+    def close(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                self.smtp.close()
+            self.smtp = None
+
+    def drain(self, now=None):
+        """Send the due digests, return the number of mails sent"""
+        now = time.time() if now is None else now
+        self.spool.recover()
+        recipients = defaultdict(list)
+        for path, message in self.spool.load():
+            if message["next_try"] <= now:
+                recipients[message["recipient"]].append((path, message))
+
+        sent = 0
+        for recipient, messages in recipients.items():
+            # The window starts with the oldest notification of the recipient
+            if now - messages[0][1]["created"] < self.window:
+                continue
+            # Other processes drain the same spool, only the messages claimed here are sent
+            claimed = list()
+            for path, _ in messages:
+                loc = self.spool.claim(path)
+                if loc is None:
+                    continue
+                if loc[1]["next_try"] > now:
+                    # Retried by another process since it was listed
+                    self.spool.release(*loc)
+                else:
+                    claimed.append(loc)
+            if not claimed:
+                continue
+
+            subject, body = digest([message for _, message in claimed])
+            try:
+                self.session().sendmail(Config.SENDER_EMAIL, recipient, build_mail(recipient, subject, body))
+            except (smtplib.SMTPException, OSError) as e:
+                logger.warning(f"Mail to {recipient} failed: {e}")
+                # Refused recipients or content will never succeed, the session is still usable
+                refused = isinstance(e, (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError))
+                permanent = isinstance(e, smtplib.SMTPRecipientsRefused) or \
+                    (isinstance(e, smtplib.SMTPDataError) and e.smtp_code >= 500)
+                if not refused:
+                    self.close()
+                self.retry(claimed, now, permanent)
+                continue
+            for path, _ in claimed:
+                self.spool.remove(path)
+            sent += 1
+        return sent
+
+    def retry(self, messages, now, permanent=False):
+        for path, message in messages:
+            message["attempts"] += 1
+            if permanent or message["attempts"] >= MAX_ATTEMPTS:
+                self.spool.fail(path)
+            else:
+                message["next_try"] = now + BACKOFF * 2 ** (message["attempts"] - 1)
+                self.spool.release(path, message)
+
+
+def get_worker():
+    """Worker of the app, started on first use
+
+    It's kept in the app and not in the module, a reload of the module doesn't start a second one.
+    """
+    with current_app.extensions.setdefault("mail_worker_lock", threading.Lock()):
+        if "mail_worker" not in current_app.extensions:
+            worker = MailWorker(Spool(SPOOL_FOLDER))
+            worker.start()
+            current_app.extensions["mail_worker"] = worker
+        return current_app.extensions["mail_worker"]
+
+
+def drain_spool():
+    """Send the due mails once, for the messages left by a process stopped before its worker sent them"""
+    if not Config.SMTP_SERVER or not Config.SENDER_EMAIL:
+        return 0
+    worker = MailWorker(Spool(SPOOL_FOLDER))
+    try:
+        return worker.drain()
+    finally:
+        worker.close()
+
+
+def handler(task, case, current_user, user):
+    """
+    task: id, uuid, title, description, url, notes, creation_date, last_modif, case_id, status_id, status,
+                   completed, deadline, finish_date, tags, clusters, connectors
+
+    user: id, first_name, last_name, email, role_id, password_hash, api_key, org_id
+    """
+    if not Config.SMTP_SERVER or not Config.SENDER_EMAIL:
+        return {"message": "Email is not configured"}
+
+    body = f'{current_user.first_name} {current_user.last_name} notify you on task {task.title} \n (http://{Config.ORIGIN_URL}/case/{task.case_id})'
 
+    # Sent by the worker, the request doesn't wait for the SMTP server
+    worker = get_worker()
+    worker.spool.put(user.email, SUBJECT, body)
+    worker.notify()
 
 
 def introspection():
-    return module_config
\ No newline at end of file
+    return module_config
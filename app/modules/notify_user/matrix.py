@@ -1,9 +1,12 @@
 import json
 import aiohttp
 import conf.config_module as Config
-from nio import AsyncClient, AsyncClientConfig, SyncResponse
+from flask import current_app
+from nio import AsyncClient, AsyncClientConfig
 from nio.responses import LoginError
 import asyncio
+import threading
+import logging
 import os
 
 
@@ -12,6 +15,16 @@ module_config = {
 }
 module_path = os.path.join(os.getcwd(), "app", "modules", "notify_user")
 
+# Seconds notifications are gathered before being sent in one message per room
+COALESCE_DELAY = 2
+# Notifications sent in one message
+MAX_BATCH = 20
+MAX_ATTEMPTS = 3
+# Milliseconds a sync waits for new events
+SYNC_TIMEOUT = 30000
+
+logger = logging.getLogger("flowintel.matrix")
+
 def write_device_id(device_id, access_token):
     with open(os.path.join(module_path, "matrix_session.txt"), "w") as write_file:
         write_file.write(device_id)
@@ -29,15 +42,16 @@ def read_device_id():
 
 STORE_FOLDER = os.path.join(module_path, "matrix_store")
 
-    
-async def matrix(task, case, current_user, user):
+
+async def connect():
+    """Log the bot in and do the first sync, the client is then kept for every message"""
     if not os.path.isdir(STORE_FOLDER):
         os.mkdir(STORE_FOLDER)
 
     client_config = AsyncClientConfig(
         max_limit_exceeded=0,
         max_timeouts=0,
-        encryption_enabled = True, 
+        encryption_enabled = True,
         store_sync_tokens=True
     )
 
@@ -66,8 +80,8 @@ async def matrix(task, case, current_user, user):
                     client.user_id = r['user_id']
         else:
             res = await client.login(password=Config.MATRIX_PASSWORD, device_name="flowintel")
-
-            # print(res)
+            if isinstance(res, LoginError):
+                raise ConnectionError(res.message)
             if not device_id:
                 client.device_id = res.device_id
                 write_device_id(res.device_id, res.access_token)
@@ -78,63 +92,166 @@ async def matrix(task, case, current_user, user):
         if client_config.encryption_enabled:
             client.load_store()
 
-        resp = await client.sync(timeout=65536, full_state=False)  #Ignore prior messages
+        await client.sync(timeout=SYNC_TIMEOUT, full_state=False)  #Ignore prior messages
+    except:
+        await client.close()
+        raise
+    return client
 
-        # if isinstance(resp, SyncResponse):
-        #     print(
-        #         f"Connected to {client.homeserver} as {client.user_id} ({client.device_id})"
-        #     )
-        #     if client_config.encryption_enabled:
-        #         key = client.olm.account.identity_keys['ed25519']
-        #         print(
-        #             f"This bot's public fingerprint (\"Session key\") for one-sided verification is: "
-        #             f"{' '.join([key[i:i+4] for i in range(0, len(key), 4)])}")
 
-        mentions = {}
-        if user.matrix_id:
-            user_matrix = user.matrix_id.split(":")[0]
+def coalesce(notifications):
+    """One message per room of the notifications [(room_id, body, mentions)], identical bodies are sent once"""
+    rooms = dict()
+    for room_id, body, mentions in notifications:
+        room = rooms.setdefault(room_id, {"bodies": [], "user_ids": []})
+        if body not in room["bodies"]:
+            room["bodies"].append(body)
+        for user_id in mentions.get("user_ids", []):
+            if user_id not in room["user_ids"]:
+                room["user_ids"].append(user_id)
+    messages = list()
+    for room_id, room in rooms.items():
+        content = {"msgtype": "m.text", "body": "\n".join(room["bodies"]), "m.mentions": {}}
+        if room["user_ids"]:
+            content["m.mentions"]["user_ids"] = room["user_ids"]
+        messages.append((room_id, content))
+    return messages
+
+
+class MatrixService:
+    """Event loop in a thread owning one synced client, notifications are queued and sent in batches"""
+    def __init__(self, deliver=None, delay=COALESCE_DELAY):
+        self.delay = delay
+        # deliver(room_id, content) replaces the client, for tests
+        self.deliver = deliver
+        self.client = None
+        self.sent = 0
+        self.failed = 0
+        self.loop = asyncio.new_event_loop()
+        self.queue = None
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="matrix-delivery", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.queue = asyncio.Queue()
+        self.worker = self.loop.create_task(self._work())
+        self.ready.set()
+        self.loop.run_forever()
+
+    def send(self, room_id, body, mentions=None):
+        """Queue a notification, called from any thread"""
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, (room_id, body, mentions or {}))
+
+    async def _batch(self):
+        """Wait for a notification then gather the ones arriving during delay"""
+        batch = [await self.queue.get()]
+        deadline = self.loop.time() + self.delay
+        while len(batch) < MAX_BATCH:
+            timeout = deadline - self.loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _room_send(self, room_id, content):
+        if self.deliver:
+            return await self.deliver(room_id, content)
+        if self.client is None:
+            self.client = await connect()
+            self.sync_task = self.loop.create_task(self._sync())
+        await self.client.room_send(room_id, message_type="m.room.message", content=content, ignore_unverified_devices=True)
+
+    async def _sync(self):
+        """Keep the device list and the room keys of the client up to date"""
+        try:
+            await self.client.sync_forever(timeout=SYNC_TIMEOUT, full_state=False)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Matrix sync stopped: {e}")
+
+    async def _reset(self):
+        """Drop the client, the next message will log in again"""
+        if self.client is not None:
+            self.sync_task.cancel()
+            await self.client.close()
+            self.client = None
+
+    async def _work(self):
+        while True:
+            batch = await self._batch()
+            for room_id, content in coalesce(batch):
+                for attempt in range(1, MAX_ATTEMPTS + 1):
+                    try:
+                        await self._room_send(room_id, content)
+                        self.sent += 1
+                        break
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        logger.warning(f"Matrix delivery failed ({attempt}/{MAX_ATTEMPTS}): {e}")
+                        await self._reset()
+                        if attempt == MAX_ATTEMPTS:
+                            self.failed += 1
+                        else:
+                            await asyncio.sleep(2 ** attempt)
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def stop(self):
+        """Stop the loop, queued notifications are lost"""
+        async def _stop():
+            self.worker.cancel()
+            await asyncio.gather(self.worker, return_exceptions=True)
+            await self._reset()
+            self.loop.stop()
+        asyncio.run_coroutine_threadsafe(_stop(), self.loop)
+        self.thread.join()
+        self.loop.close()
+
+
+def get_service():
+    """Service of the app, started on first use
+
+    It's kept in the app and not in the module, a reload of the module doesn't start a second sync on the device.
+    """
+    with current_app.extensions.setdefault("matrix_service_lock", threading.Lock()):
+        if "matrix_service" not in current_app.extensions:
+            current_app.extensions["matrix_service"] = MatrixService()
+        return current_app.extensions["matrix_service"]
 
-            mentions["user_ids"] = [user.matrix_id]
-        else:
-            user_matrix = f"{user.first_name} {user.last_name}"
-        # Message to send
-        message = f"{user_matrix}, your attention is required on Task '{task.title}' for the Case '{case.title}' (http://{Config.ORIGIN_URL}/case/{task.case_id})"
-
-
-        # Send message in specific room
-        await client.room_send(
-            Config.MATRIX_ROOM_ID,
-            message_type="m.room.message",
-            content={
-                "msgtype": "m.text", 
-                "body": message, 
-                "m.mentions": mentions
-            }, 
-            ignore_unverified_devices=True
-        )
-
-        # print("Message envoyé avec succès!")
-
-    except Exception as e:
-        print(f"Une erreur s'est produite : {e}")
-
-    finally:
-        # Deconnect client
-        await client.close()
-        
 
 def handler(task, case, current_user, user):
     """
     task: id, uuid, title, description, url, notes, creation_date, last_modif, case_id, status_id, status,
                    completed, deadline, finish_date, tags, clusters, connectors
-    
+
     current_user: id, first_name, last_name, email, role_id, password_hash, api_key, org_id
 
     user: id, first_name, last_name, email, role_id, password_hash, api_key, org_id
     """
-    
-    asyncio.run(matrix(task, case, current_user, user))
-    
+    if not Config.MATRIX_SERVER or not Config.MATRIX_ROOM_ID:
+        return {"message": "Matrix is not configured"}
+
+    mentions = {}
+    if user.matrix_id:
+        user_matrix = user.matrix_id.split(":")[0]
+        mentions["user_ids"] = [user.matrix_id]
+    else:
+        user_matrix = f"{user.first_name} {user.last_name}"
+    # Message to send
+    message = f"{user_matrix}, your attention is required on Task '{task.title}' for the Case '{case.title}' (http://{Config.ORIGIN_URL}/case/{task.case_id})"
+
+    # Sent by the service, the request doesn't wait for the homeserver
+    get_service().send(Config.MATRIX_ROOM_ID, message, mentions)
+
 
 def introspection():
-    return module_config
\ No newline at end of file
+    return module_config
@@ -1,26 +1,66 @@
-from pymisp import MISPEvent, MISPObject, PyMISP
+from pymisp import MISPEvent, MISPObject, PyMISP, PyMISPError
 import uuid
 import conf.config_module as Config
+from app.utils.connector_clients import registry, client_key
+
+# Object templates, events created before the rename of the templates use the legacy names
+CASE_OBJECT = "flowintel-case"
+TASK_OBJECT = "flowintel-task"
+NOTE_OBJECT = "flowintel-task-note"
+LEGACY_NAMES = {CASE_OBJECT: "flowintel-cm-case", TASK_OBJECT: "flowintel-cm-task", NOTE_OBJECT: "flowintel-cm-task-note"}
+# Attribute identifying each kind of object
+UUID_RELATIONS = {CASE_OBJECT: "case-uuid", TASK_OBJECT: "task-uuid", NOTE_OBJECT: "note-uuid"}
+
+CASE_REPORT = "Case notes"
+TASK_REPORT = "Tasks notes"
+REPORT_NAMES = {CASE_REPORT: CASE_REPORT, "Case's notes": CASE_REPORT, TASK_REPORT: TASK_REPORT, "Tasks' notes": TASK_REPORT}
+
+def get_client(instance):
+    """Warm client of the instance, a new one checks the connection to MISP"""
+    verify = Config.CONNECTOR_VERIFY_TLS
+    key = client_key("misp", instance, verify)
+    misp = registry.acquire(key, lambda: PyMISP(instance["url"], instance["api_key"], ssl=verify, timeout=Config.CONNECTOR_TIMEOUT))
+    return key, misp
 
 module_config = {
     "connector": "misp",
     "case_task": "case"
 }
 
-def common_edit(case_task, attribute):
-    if attribute.object_relation == 'title' and not attribute.value == case_task["title"]:
-        attribute.value = case_task["title"]
-    elif attribute.object_relation == 'description' and not attribute.value == case_task["description"]:
-        attribute.value = case_task["description"]
-    elif attribute.object_relation == 'deadline' and not attribute.value == case_task["deadline"]:
-        attribute.value = case_task["deadline"]
-    elif attribute.object_relation == 'finish-date' and not attribute.value == case_task["finish_date"]:
-        attribute.value = case_task["finish_date"]
-    elif attribute.object_relation == 'status' and not attribute.value == case_task["status"]:
-        attribute.value = case_task["status"]
-    elif attribute.object_relation == 'origin-url' and not attribute.value == Config.ORIGIN_URL:
-        attribute.value = Config.ORIGIN_URL
-    return attribute
+def common_values(case_task):
+    return {
+        "title": case_task["title"],
+        "description": case_task["description"],
+        "deadline": case_task["deadline"],
+        "finish-date": case_task["finish_date"],
+        "status": case_task["status"],
+        "origin-url": Config.ORIGIN_URL
+    }
+
+def case_values(case):
+    values = common_values(case)
+    values.update({
+        "case-owner-org-name": case["org_name"],
+        "case-owner-org-uuid": case["org_uuid"],
+        "recurring-type": case["recurring_type"],
+        "notes": case["notes"]
+    })
+    return values
+
+def task_values(task):
+    values = common_values(task)
+    values["url"] = task["url"]
+    return values
+
+def update_attributes(misp_object, values):
+    """Set the attributes of an object to values, return True if one of them changed"""
+    modified = False
+    for attribute in misp_object.attributes:
+        relation = attribute.object_relation
+        if relation in values and values[relation] is not None and not attribute.value == values[relation]:
+            attribute.value = values[relation]
+            modified = True
+    return modified
 
 def common_create(case_task, case_uuid, misp_object):
     title = misp_object.add_attribute('title', value=case_task["title"])
@@ -36,7 +76,7 @@ def common_create(case_task, case_uuid, misp_object):
     return misp_object
 
 def create_case(case):
-    misp_object = MISPObject("flowintel-cm-case", standalone=False)
+    misp_object = MISPObject(CASE_OBJECT, standalone=False)
     misp_object = common_create(case, case["uuid"], misp_object)
     
     misp_object.add_attribute('case-owner-org-name', value=case["org_name"])
@@ -46,7 +86,7 @@ def create_case(case):
     return misp_object
 
 def create_task(task, case_uuid):
-    misp_object = MISPObject("flowintel-cm-task", standalone=False)
+    misp_object = MISPObject(TASK_OBJECT, standalone=False)
     misp_object = common_create(task, case_uuid, misp_object)
 
     misp_object.add_attribute('task-uuid', value=task["uuid"])
@@ -54,7 +94,7 @@ def create_task(task, case_uuid):
     return misp_object
 
 def create_task_note(note):
-    misp_object = MISPObject("flowintel-cm-task-note", standalone=False)
+    misp_object = MISPObject(NOTE_OBJECT, standalone=False)
 
     misp_object.add_attribute('note', value=note["note"])
     misp_object.add_attribute('task-uuid', value=note["task_uuid"])
@@ -80,9 +120,115 @@ def event_report_note_task(case):
     return loc_notes
 
 
+def changed(case_task, last_sync):
+    """True if the case or task was modified since the last push, last_modif has the same format as last_sync"""
+    return not last_sync or case_task["last_modif"] >= last_sync
+
+def index_event(event):
+    """uuid -> object for the case, tasks and notes of an event, built in one pass"""
+    names = {name: name for name in UUID_RELATIONS}
+    names.update({legacy: name for name, legacy in LEGACY_NAMES.items()})
+    index = {name: dict() for name in UUID_RELATIONS}
+    for misp_object in event.objects:
+        name = names.get(misp_object.name)
+        if not name:
+            continue
+        for attribute in misp_object.attributes:
+            if attribute.object_relation == UUID_RELATIONS[name]:
+                index[name][attribute.value] = misp_object
+                break
+    return index
+
+def index_reports(event):
+    reports = dict()
+    for report in event.EventReport:
+        name = REPORT_NAMES.get(report.get("name"))
+        if name and name not in reports:
+            reports[name] = report
+    return reports
+
+
+def check(result, errors):
+    if isinstance(result, dict) and 'errors' in result:
+        errors.append(result['errors'])
+
+def push_object(misp, event_id, index, key, values, create, errors):
+    """Add the object if it's not in the event, update it only if one of its values changed"""
+    misp_object = index.get(key)
+    if misp_object is None:
+        check(misp.add_object(event_id, create()), errors)
+    elif update_attributes(misp_object, values):
+        check(misp.update_object(misp_object), errors)
+
+def push_report(misp, event_id, report, name, content, errors):
+    if report:
+        if not report.get("content") == content:
+            report["content"] = content
+            check(misp.update_event_report(report), errors)
+    elif content:
+        event_report = {
+            "uuid": str(uuid.uuid4()),
+            "event_id": event_id,
+            "name": name,
+            "content": content
+        }
+        check(misp.add_event_report(event_id, event_report), errors)
+
+
+def sync_event(misp, event, case, last_sync):
+    """Send only the objects and reports of what changed since last_sync"""
+    event_id = event.get("id")
+    index = index_event(event)
+    errors = list()
+
+    case_changed = changed(case, last_sync)
+    if case_changed:
+        push_object(misp, event_id, index[CASE_OBJECT], case["uuid"], case_values(case), lambda: create_case(case), errors)
+
+    tasks_changed = False
+    for task in case["tasks"]:
+        if not changed(task, last_sync):
+            continue
+        tasks_changed = True
+        push_object(misp, event_id, index[TASK_OBJECT], task["uuid"], task_values(task),
+                    lambda: create_task(task, case["uuid"]), errors)
+        for note in task["notes"]:
+            push_object(misp, event_id, index[NOTE_OBJECT], note["uuid"], {"note": note["note"]},
+                        lambda: create_task_note(note), errors)
+
+    reports = index_reports(event)
+    if case_changed:
+        push_report(misp, event_id, reports.get(CASE_REPORT), CASE_REPORT, event_report_note(case), errors)
+    if tasks_changed:
+        push_report(misp, event_id, reports.get(TASK_REPORT), TASK_REPORT, event_report_note_task(case), errors)
+    return errors
+
+
+def create_event(misp, case):
+    """New event with the case, all its tasks and notes"""
+    event = MISPEvent()
+    event.uuid = str(uuid.uuid4())
+    event.info = f"Case: {case['title']}"  # Required
+
+    event.add_object(create_case(case))
+    for task in case["tasks"]:
+        event.add_object(create_task(task, case["uuid"]))
+        for note in task["notes"]:
+            event.add_object(create_task_note(note))
+
+    event = misp.add_event(event, pythonify=True)
+    if 'errors' in event:
+        return event, [event['errors']]
+
+    errors = list()
+    push_report(misp, event.get("id"), None, CASE_REPORT, event_report_note(case), errors)
+    push_report(misp, event.get("id"), None, TASK_REPORT, event_report_note_task(case), errors)
+    return event, errors
+
+
 def handler(instance, case, user):
     """
-    instance: name, url, description, uuid, connector_id, type, api_key, identifier
+    instance: name, url, description, uuid, connector_id, type, api_key, identifier, last_sync
 
     case: id, uuid, title, description, creation_date, last_modif, status_id, status, completed, owner_org_id
           org_name, org_uuid, recurring_type, deadline, finish_date, tasks, clusters, connectors
@@ -92,187 +238,35 @@ def handler(instance, case, user):
 
     user: id, first_name, last_name, email, role_id, password_hash, api_key, org_id
     """
+    identifier = instance.get("identifier")
+    last_sync = instance.get("last_sync")
+    ## Nothing changed since the last push of this event
+    if identifier and last_sync and not changed(case, last_sync) and not any(changed(task, last_sync) for task in case["tasks"]):
+        return identifier
+
     try:
-        misp = PyMISP(instance["url"], instance["api_key"], ssl=False, timeout=20)
+        key, misp = get_client(instance)
     except:
         return {"message": "Error connecting to MISP"}
-    flag = False
-    if "identifier" in instance and instance["identifier"]:
-        event = misp.get_event(instance["identifier"], pythonify=True)
-        if 'errors' in event:
-            flag = True
+
+    healthy = False
+    try:
+        event = None
+        if identifier:
+            event = misp.get_event(identifier, pythonify=True)
+        ## Case have no id for this connector or the event doesn't exist anymore
+        if event is None or 'errors' in event:
+            event, errors = create_event(misp, case)
         else:
-            misp_objects = event.get_objects_by_name("flowintel-cm-case")
-            current_case_object = None
-            for i in range(0, len(misp_objects)):
-                for attribute in misp_objects[i].attributes:
-                    if attribute.object_relation == 'case-uuid':
-                        if attribute.value == case["uuid"]:
-                            current_case_object = i
-                            break
-            ## Case exist in the event
-            if not current_case_object == None:
-                for attribute in misp_objects[current_case_object].attributes:
-                    attribute = common_edit(case, attribute)
-                    if attribute.object_relation == 'case-owner-org-name' and not attribute.value == case["org_name"]:
-                        attribute.value = case["org_name"]
-                    elif attribute.object_relation == 'case-owner-org-uuid' and not attribute.value == case["org_uuid"]:
-                        attribute.value = case["org_uuid"]
-                    elif attribute.object_relation == 'recurring-type' and not attribute.value == case["recurring_type"]:
-                        attribute.value = case["recurring_type"]
-                    elif attribute.object_relation == 'notes' and not attribute.value == case["notes"]:
-                        attribute.value = case["notes"]
-                    
-
-                misp_objects = event.get_objects_by_name("flowintel-cm-task")
-                for task in case["tasks"]:
-                    current_object = None
-                    for i in range(0, len(misp_objects)):
-                        for attribute in misp_objects[i].attributes:
-                            if attribute.object_relation == 'task-uuid':
-                                if attribute.value == task["uuid"]:
-                                    current_object = i
-                                    break
-                    ## Task exist in the event
-                    if not current_object == None:
-                        for attribute in misp_objects[current_object].attributes:
-                            attribute = common_edit(task, attribute)
-                            if attribute.object_relation == 'url' and not attribute.value == task["url"]:
-                                attribute.value = task["url"]
-
-                        ## Task's notes
-                        misp_objects_note = event.get_objects_by_name("flowintel-cm-task-note")
-                        for note in task["notes"]:
-                            current_note = None
-                            for i in range(0, len(misp_objects_note)):
-                                for attr in misp_objects_note[i].attributes:
-                                    if attr.object_relation == 'note-uuid':
-                                        if attr.value == note["uuid"]:
-                                            current_note = i
-                                            break
-                            ## Note exist in the event
-                            if not current_note == None:
-                                for attr in misp_objects_note[current_note].attributes:
-                                    if attr.object_relation == "note" and not attribute.value == note["note"]:
-                                        attr.value = note["note"]
-                            ## Note doesn't exist in the event
-                            else:
-                                misp_note_object = create_task_note(note)
-                                event.add_object(misp_note_object)
-                        
-                    ## Task doesn't exist in the event
-                    else:
-                        misp_object = create_task(task, case["uuid"])
-                        event.add_object(misp_object)
-
-                        ## Task's notes
-                        for note in task["notes"]:
-                            misp_object = create_task_note(note)
-                            event.add_object(misp_object)
-
-                if event.EventReport:
-                    ## Case's notes
-                    loc_notes = event_report_note(case)
-                    loc_event_report_case = event.EventReport[0]
-
-                    if loc_event_report_case:
-                        loc_event_report_case["content"] = loc_notes
-                        misp.update_event_report(loc_event_report_case, event.get("id"))
-                    else:
-                        if loc_notes:
-                            event_report = {
-                                "uuid": str(uuid.uuid4()),
-                                "event_id": event.get("id"),
-                                "name": "Case's notes",
-                                "content": loc_notes
-                            }   
-                            misp.add_event_report(event.get("id"), event_report)
-
-                    ## Tasks' notes
-                    if len(event.EventReport) >= 2:
-                        loc_notes = event_report_note_task(case)
-                        loc_event_report_case = event.EventReport[1]
-
-                        if loc_event_report_case:
-                            loc_event_report_case["content"] = loc_notes
-                            misp.update_event_report(loc_event_report_case, event.get("id"))
-                        else:
-                            if loc_notes:
-                                event_report = {
-                                    "uuid": str(uuid.uuid4()),
-                                    "event_id": event.get("id"),
-                                    "name": "Tasks' notes",
-                                    "content": loc_notes
-                                }   
-                                misp.add_event_report(event.get("id"), event_report)
-                
-                event = misp.update_event(event, pythonify=True)
-
-            ## Case doesn't exist in the event
-            else:
-                misp_object = create_case(case)
-                event.add_object(misp_object)
-
-                for task in case["tasks"]:
-                    misp_object = create_task(task, case["uuid"])
-                    event.add_object(misp_object)
-
-                    for note in task["notes"]:
-                        misp_object = create_task_note(note)
-                        event.add_object(misp_object)
-
-                event = misp.update_event(event, pythonify=True)
-
-    ## Case have no id for this connector or the event doesn't exist anymore  
-    else: 
-        flag = True
-
-    ## Event doesn't exist
-    if flag:
-        event = MISPEvent()
-        event.uuid = str(uuid.uuid4())
-        event.info = f"Case: {case['title']}"  # Required
-
-        misp_object = create_case(case)
-        event.add_object(misp_object)
-
-        # Task
-        for task in case["tasks"]:
-            misp_object = create_task(task, case["uuid"])
-            event.add_object(misp_object)
-
-            ## Task's notes
-            for note in task["notes"]:
-                misp_object = create_task_note(note)
-                event.add_object(misp_object)
-
-        event = misp.add_event(event, pythonify=True)
-
-
-        ## Get all notes from task to create an event report
-        ## Case's notes event report
-        loc_notes = event_report_note(case)
-        if loc_notes:
-            event_report = {
-                "uuid": str(uuid.uuid4()),
-                "event_id": event.get("id"),
-                "name": "Case notes",
-                "content": loc_notes
-            }   
-            misp.add_event_report(event.get("id"), event_report)
-
-        ## Tasks' notes event report
-        loc_notes = event_report_note_task(case)
-
-        if loc_notes:
-            event_report = {
-                "uuid": str(uuid.uuid4()),
-                "event_id": event.get("id"),
-                "name": "Tasks notes",
-                "content": loc_notes
-            }   
-            misp.add_event_report(event.get("id"), event_report)
-    
+            errors = sync_event(misp, event, case, last_sync)
+        healthy = True
+    except PyMISPError as e:
+        return {"message": f"Error while sending the case to MISP: {e}"}
+    finally:
+        registry.release(key, misp, healthy)
+
+    if errors:
+        return {"message": f"Error while sending the case to MISP: {errors[0]}"}
     return event.get("id")
 
 def introspection():
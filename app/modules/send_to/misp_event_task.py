@@ -1,12 +1,30 @@
-from pymisp import MISPEvent, MISPObject, PyMISP
+from pymisp import MISPEvent, MISPObject, PyMISP, PyMISPError
 import uuid
 import conf.config_module as Config
+from app.utils.connector_clients import registry, client_key
+
+# Object templates, events created before the rename of the templates use the legacy names
+CASE_OBJECT = "flowintel-case"
+TASK_OBJECT = "flowintel-task"
+NOTE_OBJECT = "flowintel-task-note"
+LEGACY_NAMES = {CASE_OBJECT: "flowintel-cm-case", TASK_OBJECT: "flowintel-cm-task", NOTE_OBJECT: "flowintel-cm-task-note"}
+
+def get_client(instance):
+    """Warm client of the instance, a new one checks the connection to MISP"""
+    verify = Config.CONNECTOR_VERIFY_TLS
+    key = client_key("misp", instance, verify)
+    misp = registry.acquire(key, lambda: PyMISP(instance["url"], instance["api_key"], ssl=verify, timeout=Config.CONNECTOR_TIMEOUT))
+    return key, misp
 
 module_config = {
     "connector": "misp",
     "case_task": "task"
 }
 
+def get_objects(event, name):
+    """Objects of a template in the event, under its current or legacy name"""
+    return event.get_objects_by_name(name) + event.get_objects_by_name(LEGACY_NAMES[name])
+
 def task_edit(task, attribute):
     if attribute.object_relation == 'title' and not attribute.value == task["title"]:
         attribute.value = task["title"]
@@ -26,7 +44,7 @@ def task_edit(task, attribute):
 
 
 def create_task(task, case_uuid):
-    misp_object = MISPObject("flowintel-cm-task", standalone=False)
+    misp_object = MISPObject(TASK_OBJECT, standalone=False)
 
     title = misp_object.add_attribute('title', value=task["title"])
     for tag in task["tags"]:
@@ -43,7 +61,7 @@ def create_task(task, case_uuid):
     return misp_object
 
 def create_task_note(note):
-    misp_object = MISPObject("flowintel-cm-task-note", standalone=False)
+    misp_object = MISPObject(NOTE_OBJECT, standalone=False)
 
     misp_object.add_attribute('note', value=note["note"])
     misp_object.add_attribute('task-uuid', value=note["task_uuid"])
@@ -63,29 +81,15 @@ def event_report_note_task(task):
     return loc_notes
 
 
-def handler(instance, case, task, user):
-    """
-    instance: name, url, description, uuid, connector_id, type, api_key, identifier
-
-    case: id, uuid, title, description, creation_date, last_modif, status_id, status, completed, owner_org_id
-          org_name, org_uuid, recurring_type, deadline, finish_date, tasks, clusters, connectors
-
-    task: id, uuid, title, description, url, notes, creation_date, last_modif, case_id, status_id, status,
-                   completed, deadline, finish_date, tags, clusters, connectors
-
-    user: id, first_name, last_name, email, role_id, password_hash, api_key, org_id
-    """
-    try:
-        misp = PyMISP(instance["url"], instance["api_key"], ssl=False, timeout=20)
-    except:
-        return {"message": "Error connecting to MISP"}
+def push_task(misp, instance, case, task):
+    """Update the event of the instance with the task, create the event if needed"""
     flag = False
     if "identifier" in instance and instance["identifier"]:
         event = misp.get_event(instance["identifier"], pythonify=True)
         if 'errors' in event:
             flag = True
         else:                    
-            misp_objects = event.get_objects_by_name("flowintel-cm-task")
+            misp_objects = get_objects(event, TASK_OBJECT)
             current_object = None
             for i in range(0, len(misp_objects)):
                 for attribute in misp_objects[i].attributes:
@@ -100,7 +104,7 @@ def handler(instance, case, task, user):
                     
 
                 ## Task's notes
-                misp_objects_note = event.get_objects_by_name("flowintel-cm-task-note")
+                misp_objects_note = get_objects(event, NOTE_OBJECT)
                 for note in task["notes"]:
                     current_note = None
                     for i in range(0, len(misp_objects_note)):
@@ -189,5 +193,32 @@ def handler(instance, case, task, user):
     
     return event.get("id")
 
+def handler(instance, case, task, user):
+    """
+    instance: name, url, description, uuid, connector_id, type, api_key, identifier
+
+    case: id, uuid, title, description, creation_date, last_modif, status_id, status, completed, owner_org_id
+          org_name, org_uuid, recurring_type, deadline, finish_date, tasks, clusters, connectors
+
+    task: id, uuid, title, description, url, notes, creation_date, last_modif, case_id, status_id, status,
+                   completed, deadline, finish_date, tags, clusters, connectors
+
+    user: id, first_name, last_name, email, role_id, password_hash, api_key, org_id
+    """
+    try:
+        key, misp = get_client(instance)
+    except:
+        return {"message": "Error connecting to MISP"}
+
+    healthy = False
+    try:
+        event_id = push_task(misp, instance, case, task)
+        healthy = True
+    except PyMISPError as e:
+        return {"message": f"Error while sending the task to MISP: {e}"}
+    finally:
+        registry.release(key, misp, healthy)
+    return event_id
+
 def introspection():
     return module_config
@@ -29,6 +29,17 @@ def my_assignment_sort_by_ongoing():
 
 
 
+@my_assignment_blueprint.route("/tasks", methods=['GET'])
+@login_required
+def my_assignment_tasks():
+    """Page of assigned tasks with their case, sorted on a key and paginated with a cursor"""
+    assignment_dict = AssignModel.verif_assignment_args(request.args)
+    if "message" in assignment_dict:
+        assignment_dict["toast_class"] = "warning-subtle"
+        return assignment_dict, 400
+    return AssignModel.get_assigned_tasks(current_user, assignment_dict), 200
+
+
 @my_assignment_blueprint.route("/sort_by_finished", methods=['GET'])
 @login_required
 def my_assignment_sort_by_finished():
@@ -44,6 +55,8 @@ def my_assignment_ongoing_sort_by_filter():
     """Sort Task by living one"""
     data_dict = dict(request.args)
     if "filter" in data_dict:
+        if data_dict["filter"] not in AssignModel.SORT_KEYS:
+            return {"message": "Unknown filter", "toast_class": "warning-subtle"}, 400
         page = request.args.get('page', 1, type=int)
         tasks_list = AssignModel.my_assignment_sort_by_filter(user=current_user, completed=False, filter=data_dict["filter"], page=page)
         return {"tasks": TaskModel.get_task_info(tasks_list, current_user), "nb_pages": tasks_list.pages}
@@ -56,6 +69,8 @@ def my_assignment_finished_sort_by_filter():
     """Sort Task by finished one"""
     data_dict = dict(request.args)
     if "filter" in data_dict:
+        if data_dict["filter"] not in AssignModel.SORT_KEYS:
+            return {"message": "Unknown filter", "toast_class": "warning-subtle"}, 400
         page = request.args.get('page', 1, type=int)
         tasks_list = AssignModel.my_assignment_sort_by_filter(user=current_user, completed=False, filter=data_dict["filter"], page=page)
         return {"tasks": TaskModel.get_task_info(tasks_list, current_user), "nb_pages": tasks_list.pages}
@@ -32,4 +32,26 @@ class MyAssignment(Resource):
             tasks_list = AssignModel.my_assignment_sort_by_status(user=user, completed=False, page=page)
             return {"tasks": TaskModel.get_task_info(tasks_list, user), "nb_pages": tasks_list.pages}
         return {"message": "Need to pass a user id"}, 400
-    
\ No newline at end of file
+
+@api.route('/tasks')
+@api.doc(description='Get a page of assigned tasks with their case, status, assignees, tags and counts', params={
+    "user_id": "Tasks assigned to this user, the user of the key by default",
+    "completed": "true for the finished tasks, false by default",
+    "sort": f"One of: {', '.join(AssignModel.SORT_KEYS)}",
+    "order": "asc or desc, desc by default",
+    "limit": "Number of tasks by page",
+    "cursor": "next_cursor of the previous page"
+})
+class MyAssignmentTasks(Resource):
+    method_decorators = [api_required]
+    def get(self):
+        if "user_id" in request.args:
+            user = AssignModel.get_user(request.args.get("user_id"))
+            if not user:
+                return {"message": "User not found"}, 404
+        else:
+            user = CaseModelApi.get_user_api(request.headers)
+        assignment_dict = AssignModel.verif_assignment_args(request.args)
+        if "message" in assignment_dict:
+            return assignment_dict, 400
+        return AssignModel.get_assigned_tasks(user, assignment_dict), 200
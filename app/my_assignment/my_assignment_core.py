@@ -1,5 +1,23 @@
-from ..db_class.db import Task, Task_User, User
-from sqlalchemy import desc
+import json
+import base64
+from datetime import datetime
+from .. import db
+from ..db_class.db import Task, Task_User, User, Case, Status, File, Tags, Task_Tags, Cluster, Galaxy, Task_Galaxy_Tags, Custom_Tags, Task_Custom_Tags
+from sqlalchemy import select, func, desc, or_, and_
+
+# Sort keys allowed in a query, with the column they order on
+SORT_KEYS = {
+    "last_modif": Task.last_modif,
+    "creation_date": Task.creation_date,
+    "deadline": Task.deadline,
+    "title": Task.title,
+    "status_id": Task.status_id,
+    "case_title": Case.title
+}
+DATE_KEYS = ["last_modif", "creation_date", "deadline"]
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
 
 def get_user(uid):
     return User.query.get(uid)
@@ -11,8 +29,152 @@ def my_assignment_sort_by_status(user, completed, page):
 
 
 def my_assignment_sort_by_filter(user, completed, filter, page):
+    """filter is a key of SORT_KEYS"""
     return Task.query.join(Task_User, Task_User.task_id==Task.id)\
+                     .join(Case, Case.id==Task.case_id)\
                      .where(Task_User.user_id==user.id, Task.completed==completed)\
-                     .order_by(desc(filter))\
+                     .order_by(desc(SORT_KEYS[filter]))\
                      .paginate(page=page, per_page=20, max_per_page=50)
 
+
+def encode_cursor(sort, value, task_id):
+    """Opaque cursor pointing after the task with this sort value"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([sort, value, task_id]).encode()).decode()
+
+def decode_cursor(cursor, sort):
+    """(sort value, task id) from a cursor made for the same sort key"""
+    cursor_sort, value, task_id = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    if cursor_sort != sort:
+        raise ValueError("cursor made for another sort")
+    if value is not None and sort in DATE_KEYS:
+        value = datetime.fromisoformat(value)
+    return value, int(task_id)
+
+
+def verif_assignment_args(args):
+    """Check the status, sort key, order, limit and cursor of a query on assigned tasks"""
+    assignment_dict = {"completed": False, "sort": "last_modif", "order": "desc", "limit": DEFAULT_LIMIT, "cursor": None}
+
+    completed = args.get("completed", "false")
+    if completed not in ["true", "false"]:
+        return {"message": "completed need to be true or false"}
+    assignment_dict["completed"] = completed == "true"
+
+    sort = args.get("sort", "last_modif")
+    if sort not in SORT_KEYS:
+        return {"message": f"sort need to be one of: {', '.join(SORT_KEYS)}"}
+    assignment_dict["sort"] = sort
+
+    order = args.get("order", "desc")
+    if order not in ["asc", "desc"]:
+        return {"message": "order need to be asc or desc"}
+    assignment_dict["order"] = order
+
+    limit = args.get("limit", DEFAULT_LIMIT)
+    if not str(limit).isdigit() or not int(limit) > 0:
+        return {"message": "limit need to be a positive integer"}
+    assignment_dict["limit"] = min(int(limit), MAX_LIMIT)
+
+    if args.get("cursor"):
+        try:
+            assignment_dict["cursor"] = decode_cursor(args.get("cursor"), sort)
+        except Exception:
+            return {"message": "cursor not valid"}
+    return assignment_dict
+
+
+def _keyset(query, column, order, cursor):
+    """Order on (column, id) with the empty values last, and start after cursor"""
+    if order == "asc":
+        query = query.order_by(column.is_(None), column, Task.id)
+    else:
+        query = query.order_by(column.is_(None), column.desc(), Task.id.desc())
+    if cursor:
+        value, last_id = cursor
+        after_id = Task.id > last_id if order == "asc" else Task.id < last_id
+        if value is None:
+            query = query.where(column.is_(None), after_id)
+        else:
+            after = column > value if order == "asc" else column < value
+            query = query.where(or_(after, and_(column == value, after_id), column.is_(None)))
+    return query
+
+
+def _format_date(value):
+    return value.strftime('%Y-%m-%d %H:%M') if value else None
+
+
+def get_assigned_tasks(user, assignment_dict):
+    """A page of the tasks assigned to user with their case, status, assignees, tags and counts
+
+    The page is one query, everything else is loaded for the whole page with one query each.
+    """
+    column = SORT_KEYS[assignment_dict["sort"]]
+    query = select(Task, Case.title, Status.name, Status.bootstrap_style)\
+        .join(Task_User, and_(Task_User.task_id==Task.id, Task_User.user_id==user.id))\
+        .join(Case, Case.id==Task.case_id)\
+        .outerjoin(Status, Status.id==Task.status_id)\
+        .where(Task.completed==assignment_dict["completed"])
+    query = _keyset(query, column, assignment_dict["order"], assignment_dict["cursor"])
+    rows = db.session.execute(query.limit(assignment_dict["limit"] + 1)).all()
+
+    next_cursor = None
+    if len(rows) > assignment_dict["limit"]:
+        rows = rows[:assignment_dict["limit"]]
+        last = rows[-1]
+        value = last[1] if assignment_dict["sort"] == "case_title" else getattr(last[0], assignment_dict["sort"])
+        next_cursor = encode_cursor(assignment_dict["sort"], value, last[0].id)
+
+    task_ids = [row[0].id for row in rows]
+    users, tags, clusters, custom_tags = dict(), dict(), dict(), dict()
+    if task_ids:
+        for task_id, task_user in db.session.execute(
+            select(Task_User.task_id, User).join(User, User.id==Task_User.user_id).where(Task_User.task_id.in_(task_ids)).order_by(User.id)
+        ).all():
+            users.setdefault(task_id, []).append(task_user.to_json())
+        for task_id, tag in db.session.execute(
+            select(Task_Tags.task_id, Tags).join(Tags, Tags.id==Task_Tags.tag_id).where(Task_Tags.task_id.in_(task_ids))
+        ).all():
+            tags.setdefault(task_id, []).append(tag.to_json())
+        # Galaxies are loaded with their clusters so Cluster.to_json finds them in the session
+        cluster_rows = db.session.execute(
+            select(Task_Galaxy_Tags.task_id, Cluster, Galaxy).join(Cluster, Cluster.id==Task_Galaxy_Tags.cluster_id)
+            .join(Galaxy, Galaxy.id==Cluster.galaxy_id).where(Task_Galaxy_Tags.task_id.in_(task_ids))
+        ).all()
+        for task_id, cluster, _ in cluster_rows:
+            clusters.setdefault(task_id, []).append(cluster.to_json())
+        for task_id, custom_tag in db.session.execute(
+            select(Task_Custom_Tags.task_id, Custom_Tags).join(Custom_Tags, Custom_Tags.id==Task_Custom_Tags.custom_tag_id).where(Task_Custom_Tags.task_id.in_(task_ids))
+        ).all():
+            custom_tags.setdefault(task_id, []).append(custom_tag.to_json())
+        nb_files = dict(db.session.execute(
+            select(File.task_id, func.count()).where(File.task_id.in_(task_ids)).group_by(File.task_id)
+        ).all())
+
+    tasks = list()
+    for task, case_title, status_name, status_style in rows:
+        tasks.append({
+            "id": task.id,
+            "uuid": task.uuid,
+            "title": task.title,
+            "description": task.description,
+            "case_id": task.case_id,
+            "case_title": case_title,
+            "status_id": task.status_id,
+            "status": {"name": status_name, "bootstrap_style": status_style},
+            "completed": task.completed,
+            "creation_date": _format_date(task.creation_date),
+            "last_modif": _format_date(task.last_modif),
+            "deadline": _format_date(task.deadline),
+            "finish_date": _format_date(task.finish_date),
+            "nb_notes": task.nb_notes or 0,
+            "nb_files": nb_files.get(task.id, 0),
+            "users": users.get(task.id, []),
+            "is_current_user_assigned": True,
+            "tags": tags.get(task.id, []),
+            "clusters": clusters.get(task.id, []),
+            "custom_tags": custom_tags.get(task.id, [])
+        })
+    return {"tasks": tasks, "next_cursor": next_cursor, "sort": assignment_dict["sort"], "order": assignment_dict["order"]}
@@ -51,23 +51,26 @@ def create_notification_org(message, case_id, org_id, html_icon, current_user):
 
     return True
 
-def create_notification_all_orgs(message, case_id, html_icon, current_user):
-    case_org = Case_Org.query.where(case_id==case_id).all()
-    for c_o in case_org:
-        org = Org.query.get(c_o.org_id)
-        for user in org.users:
-            if not user == current_user:
-                notif = Notification(
-                    message=message,
-                    is_read=False,
-                    user_id=user.id,
-                    case_id=str(case_id),
-                    creation_date=datetime.datetime.now(tz=datetime.timezone.utc),
-                    html_icon=html_icon
-                )
-                db.session.add(notif)
-                db.session.commit()
+def get_case_users_id(case_id):
+    """Id of the users of every org present in a case"""
+    return [user_id for (user_id,) in db.session.query(User.id).join(Case_Org, Case_Org.org_id==User.org_id)
+                                                        .filter(Case_Org.case_id==case_id).distinct().all()]
+
+def add_notifications(users_message, case_id, html_icon):
+    """Add a notification per user, users_message is {user_id: message}. Commit is left to the caller"""
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    db.session.add_all([Notification(
+        message=message,
+        is_read=False,
+        user_id=user_id,
+        case_id=case_id,
+        creation_date=now,
+        html_icon=html_icon
+    ) for user_id, message in users_message.items()])
 
+def create_notification_all_orgs(message, case_id, html_icon, current_user):
+    add_notifications({user_id: message for user_id in get_case_users_id(case_id) if user_id != current_user.id}, case_id, html_icon)
+    db.session.commit()
     return True
 
 def create_notification_user(message, case_id, user_id, html_icon):
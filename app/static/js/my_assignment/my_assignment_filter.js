@@ -3,65 +3,54 @@ export default {
 	props: {
 		tasks_list: Object
 	},
-	emits: ['tasks_list', 'current_filter'],
+	emits: ['filter'],
 	setup(props, {emit}) {
 		let show_ongoing = true
-		let current_filter = ""
+		let current_filter = "last_modif"
 		let asc_desc = true
 
-		async function filter_ongoing(ongoing){
-			show_ongoing = ongoing
+		function emit_filter(){
+			emit('filter', {
+				completed: !show_ongoing,
+				sort: current_filter,
+				order: asc_desc ? "desc" : "asc"
+			})
+		}
 
-			if(show_ongoing){
-				const res = await fetch('/my_assignment/sort_by_ongoing?page=1')
-				let loc = await res.json()
-				emit('tasks_list', loc)
-			}else{
-				const res = await fetch('/my_assignment/sort_by_finished?page=1')
-				let loc = await res.json()
-				emit('tasks_list', loc)
-			}
+		function filter_ongoing(ongoing){
+			show_ongoing = ongoing
+			emit_filter()
 		}
 
 		function sort_by_title(){
 			current_filter = "title"
-			asc_desc_filter()
+			emit_filter()
 		}
 
 		function sort_by_last_modif(){
 			current_filter = "last_modif"
-			asc_desc_filter()
+			emit_filter()
 		}
 
 		function sort_by_deadline(){
 			current_filter = "deadline"
-			asc_desc_filter()
+			emit_filter()
 		}
 
 		function sort_by_status(){
 			current_filter = "status_id"
-			asc_desc_filter()
+			emit_filter()
+		}
+
+		function sort_by_case(){
+			current_filter = "case_title"
+			emit_filter()
 		}
 
-		async function asc_desc_filter(change=false){
-			emit("current_filter", current_filter)
+		function asc_desc_filter(change=false){
 			if(change)
 				asc_desc = !asc_desc
-
-			let res
-			if (current_filter){
-				if(show_ongoing)
-					res = await fetch('/my_assignment/tasks/ongoing?page=1&filter=' + current_filter)
-				else
-					res = await fetch('/my_assignment/tasks/finished?page=1&filter=' + current_filter)
-				let loc = await res.json()
-				if(asc_desc)
-					emit('tasks_list', loc)
-				else
-				loc["tasks"] = loc["tasks"].reverse()
-					emit('tasks_list', loc)
-			}
-			
+			emit_filter()
 		}
 
 		
@@ -71,6 +60,7 @@ export default {
 			sort_by_title,
 			sort_by_deadline,
 			sort_by_status,
+			sort_by_case,
 			asc_desc_filter
 		}
 	},
@@ -109,6 +99,10 @@ export default {
 						<input class="form-check-input" type="radio" name="radioOther" id="radioOtherStatus" @click="sort_by_status()">
 						<label class="form-check-label" for="radioOtherStatus">Status</label>
 					</div>
+					<div class="form-check">
+						<input class="form-check-input" type="radio" name="radioOther" id="radioOtherCase" @click="sort_by_case()">
+						<label class="form-check-label" for="radioOtherCase">Case</label>
+					</div>
 				</div>
 
 				<div style="display:flex">
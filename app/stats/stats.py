@@ -0,0 +1,53 @@
+from flask import Blueprint, render_template, request
+from flask_login import login_required, current_user
+from . import stats_core as StatsModel
+
+stats_blueprint = Blueprint(
+    'stats',
+    __name__,
+    template_folder='templates',
+    static_folder='static'
+)
+
+
+@stats_blueprint.route("/", methods=['GET'])
+@login_required
+def stats():
+    """Statistics dashboard"""
+    return render_template("stats/stats.html")
+
+
+@stats_blueprint.route("/summary", methods=['GET'])
+@login_required
+def summary():
+    """Daily series and totals of cases or tasks"""
+    filters = StatsModel.parse_stats_args(request.args, current_user)
+    if "message" in filters:
+        code = filters.pop("code", 400)
+        filters["toast_class"] = "warning-subtle"
+        return filters, code
+    return StatsModel.get_summary(filters), 200
+
+
+@stats_blueprint.route("/orgs", methods=['GET'])
+@login_required
+def orgs():
+    """Totals per org"""
+    filters = StatsModel.parse_stats_args(request.args, current_user)
+    if "message" in filters:
+        code = filters.pop("code", 400)
+        filters["toast_class"] = "warning-subtle"
+        return filters, code
+    return StatsModel.get_breakdown(filters), 200
+
+
+@stats_blueprint.route("/assignees", methods=['GET'])
+@login_required
+def assignees():
+    """Tasks per assignee"""
+    filters = StatsModel.parse_stats_args({**request.args, "kind": "task"}, current_user)
+    if "message" in filters:
+        code = filters.pop("code", 400)
+        filters["toast_class"] = "warning-subtle"
+        return filters, code
+    return StatsModel.get_breakdown(filters, per_user=True), 200
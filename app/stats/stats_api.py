@@ -0,0 +1,58 @@
+from flask import Blueprint, request
+from . import stats_core as StatsModel
+from ..case import case_core_api as CaseModelApi
+
+from flask_restx import Api, Resource
+from ..decorators import api_required
+
+api_stats_blueprint = Blueprint('api_stats', __name__)
+api = Api(api_stats_blueprint,
+        title='flowintel API', 
+        description='API to manage a case management instance.', 
+        version='0.1', 
+        default='GenericAPI', 
+        default_label='Generic flowintel API', 
+        doc='/doc'
+    )
+
+STATS_PARAMS = {
+    "kind": "case or task",
+    "start": "First day, YYYY-MM-DD, 30 days before end by default",
+    "end": "Last day, YYYY-MM-DD, today by default",
+    "org_id": "Only this org, users who aren't admin only see their org",
+    "user_id": "Only the tasks of this assignee"
+}
+
+
+@api.route('/summary')
+@api.doc(description='Daily opened, closed, open and overdue counts and time to close of cases or tasks', params=STATS_PARAMS)
+class StatsSummary(Resource):
+    method_decorators = [api_required]
+    def get(self):
+        filters = StatsModel.parse_stats_args(request.args, CaseModelApi.get_user_api(request.headers))
+        if "message" in filters:
+            code = filters.pop("code", 400)
+            return filters, code
+        return StatsModel.get_summary(filters), 200
+
+@api.route('/orgs')
+@api.doc(description='Totals of cases or tasks per org', params=STATS_PARAMS)
+class StatsOrgs(Resource):
+    method_decorators = [api_required]
+    def get(self):
+        filters = StatsModel.parse_stats_args(request.args, CaseModelApi.get_user_api(request.headers))
+        if "message" in filters:
+            code = filters.pop("code", 400)
+            return filters, code
+        return StatsModel.get_breakdown(filters), 200
+
+@api.route('/assignees')
+@api.doc(description='Totals of tasks per assignee', params=STATS_PARAMS)
+class StatsAssignees(Resource):
+    method_decorators = [api_required]
+    def get(self):
+        filters = StatsModel.parse_stats_args({**request.args, "kind": "task"}, CaseModelApi.get_user_api(request.headers))
+        if "message" in filters:
+            code = filters.pop("code", 400)
+            return filters, code
+        return StatsModel.get_breakdown(filters, per_user=True), 200
@@ -0,0 +1,390 @@
+import json
+import datetime
+from collections import defaultdict
+
+from .. import db
+from ..db_class.db import *
+from sqlalchemy import select, func, delete, or_, case as case_when
+from sqlalchemy.exc import IntegrityError
+
+
+KINDS = ["case", "task"]
+DEFAULT_RANGE = 30
+# Days a query can cover at most
+MAX_RANGE = 3660
+# Upper bound in hours of each time to close bucket, a last bucket takes everything above
+HOURS_BUCKETS = [1, 2, 4, 8, 12, 24, 48, 72, 120, 168, 336, 720, 1440, 2160, 4320, 8760]
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def _sources(kind=None):
+    """(kind, model, group columns, joins) of each rollup, tasks are counted per org and per assignee"""
+    sources = [
+        ("case", Case, [Case.owner_org_id], []),
+        ("task", Task, [Case.owner_org_id], [(Case, Case.id==Task.case_id)]),
+        ("task", Task, [User.org_id, Task_User.user_id], [(Task_User, Task_User.task_id==Task.id), (User, User.id==Task_User.user_id)])
+    ]
+    return [source for source in sources if kind is None or source[0] == kind]
+
+
+def _select(source, *columns):
+    _, model, groups, joins = source
+    query = select(*groups, *columns).select_from(model)
+    for target, on in joins:
+        query = query.join(target, on)
+    return query
+
+
+def _closed_at(model):
+    """Completion time, rows completed before finish_date was recorded fall back on their last modification"""
+    return case_when((model.completed==True, func.coalesce(model.finish_date, model.last_modif)), else_=None)
+
+
+def _overdue_from(model):
+    """A row is overdue from its deadline, or from its creation when created with a past deadline"""
+    return case_when((model.deadline > model.creation_date, model.deadline), else_=model.creation_date)
+
+
+def _as_date(value):
+    """Sqlite gives dates as strings"""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+def _today():
+    """Days are UTC days, like the dates stored"""
+    return datetime.datetime.now(tz=datetime.timezone.utc).date()
+
+
+def _bucket(hours):
+    for index, bound in enumerate(HOURS_BUCKETS):
+        if hours <= bound:
+            return index
+    return len(HOURS_BUCKETS)
+
+
+def rollup(start, end, kind=None):
+    """Stats_Daily rows of the days from start to end, not added to the session
+
+    Open and overdue counts at the start come from one aggregate per source,
+    the following days are running sums of what opened, closed or became
+    overdue each day.
+    """
+    start_dt = datetime.datetime.combine(start, datetime.time())
+    end_dt = datetime.datetime.combine(end + ONE_DAY, datetime.time())
+    rows = list()
+    for source in _sources(kind):
+        source_kind, model, groups, _ = source
+        size = len(groups)
+        closed_at = _closed_at(model)
+        overdue_from = _overdue_from(model)
+        base = dict()
+        days = defaultdict(lambda: defaultdict(lambda: {"opened": 0, "closed": 0, "overdue_in": 0, "overdue_out": 0, "hours": 0.0, "buckets": [0] * (len(HOURS_BUCKETS) + 1)}))
+
+        for row in db.session.execute(
+            _select(source, func.count(), func.sum(case_when((model.deadline < start_dt, 1), else_=0)))
+            .where(model.creation_date < start_dt, or_(closed_at.is_(None), closed_at >= start_dt))
+            .group_by(*groups)
+        ).all():
+            base[tuple(row[:size])] = [row[size], row[size + 1] or 0]
+
+        for row in db.session.execute(
+            _select(source, func.date(model.creation_date), func.count())
+            .where(model.creation_date >= start_dt, model.creation_date < end_dt)
+            .group_by(*groups, func.date(model.creation_date))
+        ).all():
+            days[tuple(row[:size])][_as_date(row[size])]["opened"] = row[size + 1]
+
+        # Still open at the end of the day it became overdue
+        for row in db.session.execute(
+            _select(source, func.date(overdue_from), func.count())
+            .where(model.deadline.is_not(None), overdue_from >= start_dt, overdue_from < end_dt,
+                   or_(closed_at.is_(None), func.date(closed_at) > func.date(overdue_from)))
+            .group_by(*groups, func.date(overdue_from))
+        ).all():
+            days[tuple(row[:size])][_as_date(row[size])]["overdue_in"] = row[size + 1]
+
+        # Time to close needs each row, only the ones closed in the range are read
+        for row in db.session.execute(
+            _select(source, model.creation_date, model.deadline, closed_at)
+            .where(closed_at >= start_dt, closed_at < end_dt)
+        ).all():
+            creation_date, deadline, finished = row[size:]
+            finished = finished if isinstance(finished, datetime.datetime) else datetime.datetime.fromisoformat(str(finished))
+            loc = days[tuple(row[:size])][finished.date()]
+            loc["closed"] += 1
+            hours = max((finished.replace(tzinfo=None) - creation_date.replace(tzinfo=None)).total_seconds() / 3600, 0)
+            loc["hours"] += hours
+            loc["buckets"][_bucket(hours)] += 1
+            if deadline and max(deadline, creation_date).date() < finished.date():
+                loc["overdue_out"] += 1
+
+        for group in set(base) | set(days):
+            open_count, overdue_count = base.get(group, [0, 0])
+            org_id, user_id = group if size == 2 else (group[0], None)
+            day = start
+            while day <= end:
+                loc = days[group].get(day)
+                if loc:
+                    open_count += loc["opened"] - loc["closed"]
+                    overdue_count += loc["overdue_in"] - loc["overdue_out"]
+                if loc or open_count or overdue_count:
+                    rows.append(Stats_Daily(
+                        day=day, kind=source_kind, org_id=org_id, user_id=user_id,
+                        opened=loc["opened"] if loc else 0,
+                        closed=loc["closed"] if loc else 0,
+                        open=open_count,
+                        overdue=overdue_count,
+                        close_hours=loc["hours"] if loc else 0,
+                        close_buckets=json.dumps(loc["buckets"]) if loc and loc["closed"] else None
+                    ))
+                day += ONE_DAY
+    return rows
+
+
+def first_day():
+    """Creation day of the oldest case or task"""
+    first = db.session.execute(select(
+        select(func.min(Case.creation_date)).scalar_subquery(),
+        select(func.min(Task.creation_date)).scalar_subquery()
+    )).one()
+    first = [_as_date(loc) for loc in first if loc is not None]
+    return min(first) if first else None
+
+
+def rollup_missing(start=None, end=None):
+    """Roll up and store the days before today not rolled up yet, returns the number of days stored
+
+    A stored day is not computed again, it keeps what the cases and tasks were that day.
+    """
+    yesterday = _today() - ONE_DAY
+    end = min(end or yesterday, yesterday)
+    first = first_day()
+    if first is None:
+        return 0
+    start = max(start or first, first)
+    if start > end:
+        return 0
+
+    done = set(_as_date(day) for day in db.session.scalars(select(Stats_Rollup.day).where(Stats_Rollup.day.between(start, end))))
+    ranges = list()
+    day = start
+    while day <= end:
+        if day not in done:
+            if ranges and ranges[-1][1] == day - ONE_DAY:
+                ranges[-1][1] = day
+            else:
+                ranges.append([day, day])
+        day += ONE_DAY
+    if not ranges:
+        return 0
+
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    nb_days = 0
+    for range_start, range_end in ranges:
+        db.session.execute(delete(Stats_Daily).where(Stats_Daily.day.between(range_start, range_end)))
+        db.session.add_all(rollup(range_start, range_end))
+        nb_days += (range_end - range_start).days + 1
+        db.session.add_all([Stats_Rollup(day=range_start + ONE_DAY * offset, rolled_at=now) for offset in range((range_end - range_start).days + 1)])
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another worker rolled up the same days
+        db.session.rollback()
+        return 0
+    return nb_days
+
+
+def parse_stats_args(args, user):
+    """Check the kind, dates and ids of a statistics query, users who aren't admin only see their org"""
+    kind = args.get("kind", "case")
+    if kind not in KINDS:
+        return {"message": f"kind must be one of {', '.join(KINDS)}"}
+    today = _today()
+    try:
+        end = datetime.date.fromisoformat(args["end"]) if args.get("end") else today
+        start = datetime.date.fromisoformat(args["start"]) if args.get("start") else end - ONE_DAY * (DEFAULT_RANGE - 1)
+    except ValueError:
+        return {"message": "start and end must be dates as YYYY-MM-DD"}
+    if start > end:
+        return {"message": "start must be before end"}
+    if end > today:
+        return {"message": "end can't be in the future"}
+    if (end - start).days >= MAX_RANGE:
+        return {"message": f"A query can cover {MAX_RANGE} days at most"}
+
+    filters = {"kind": kind, "start": start, "end": end, "org_id": None, "user_id": None}
+    for key in ["org_id", "user_id"]:
+        if args.get(key):
+            if not str(args[key]).isdigit():
+                return {"message": f"{key} must be an id"}
+            filters[key] = int(args[key])
+    if filters["user_id"] and kind != "task":
+        return {"message": "Statistics per user are about tasks"}
+    if not user.is_admin():
+        if filters["org_id"] and filters["org_id"] != user.org_id:
+            return {"message": "Permission denied", "code": 403}
+        filters["org_id"] = user.org_id
+    return filters
+
+
+def _where(filters, per_user=False):
+    """Conditions on the stored rollups of a query, org totals or rows per assignee"""
+    where = [Stats_Daily.kind==filters["kind"], Stats_Daily.day.between(filters["start"], filters["end"])]
+    if per_user or filters["user_id"] is not None:
+        where.append(Stats_Daily.user_id.is_not(None))
+    else:
+        where.append(Stats_Daily.user_id.is_(None))
+    if filters["org_id"] is not None:
+        where.append(Stats_Daily.org_id==filters["org_id"])
+    if filters["user_id"] is not None:
+        where.append(Stats_Daily.user_id==filters["user_id"])
+    return where
+
+
+def _live_rows(filters, per_user=False):
+    """Rows of today, computed as they change all day"""
+    per_user = per_user or filters["user_id"] is not None
+    rows = list()
+    for row in rollup(_today(), _today(), filters["kind"]):
+        if (row.user_id is not None) != per_user:
+            continue
+        if filters["org_id"] is not None and row.org_id != filters["org_id"]:
+            continue
+        if filters["user_id"] is not None and row.user_id != filters["user_id"]:
+            continue
+        rows.append(row)
+    return rows
+
+
+def _add_buckets(buckets, close_buckets):
+    for index, count in enumerate(json.loads(close_buckets)):
+        buckets[index] += count
+
+
+def median_hours(buckets):
+    """Median time to close, interpolated in its bucket"""
+    total = sum(buckets)
+    if not total:
+        return None
+    seen = 0
+    for index, count in enumerate(buckets):
+        if count and seen + count >= total / 2:
+            if index == len(HOURS_BUCKETS):
+                return float(HOURS_BUCKETS[-1])
+            low = HOURS_BUCKETS[index - 1] if index else 0
+            return round(low + (HOURS_BUCKETS[index] - low) * (total / 2 - seen) / count, 1)
+        seen += count
+
+
+def _new_totals():
+    return {"opened": 0, "closed": 0, "open": 0, "overdue": 0, "hours": 0.0, "buckets": [0] * (len(HOURS_BUCKETS) + 1)}
+
+
+def _add_row(totals, row):
+    for key in ["opened", "closed", "open", "overdue"]:
+        totals[key] += getattr(row, key) or 0
+    totals["hours"] += row.close_hours or 0
+    if row.close_buckets:
+        _add_buckets(totals["buckets"], row.close_buckets)
+
+
+def _result(totals):
+    """Totals of a range, open and overdue are the counts at the end of the range"""
+    return {
+        "opened": totals["opened"],
+        "closed": totals["closed"],
+        "open": totals["open"],
+        "overdue": totals["overdue"],
+        "median_hours": median_hours(totals["buckets"]),
+        "mean_hours": round(totals["hours"] / totals["closed"], 1) if totals["closed"] else None
+    }
+
+
+def get_summary(filters):
+    """Daily series and totals of cases or tasks, for every org, an org or an assignee
+
+    Past days are sums over the rollups, only today is computed from cases and tasks.
+    """
+    start, end, today = filters["start"], filters["end"], _today()
+    days = dict()
+    day = start
+    while day <= end:
+        days[day] = {"opened": 0, "closed": 0, "open": 0, "overdue": 0}
+        day += ONE_DAY
+    totals = _new_totals()
+
+    if start < today:
+        rollup_missing(start, end)
+        where = _where(filters)
+        for day, opened, closed, open_count, overdue, close_hours in db.session.execute(
+            select(Stats_Daily.day, func.sum(Stats_Daily.opened), func.sum(Stats_Daily.closed), func.sum(Stats_Daily.open),
+                   func.sum(Stats_Daily.overdue), func.sum(Stats_Daily.close_hours))
+            .where(*where).group_by(Stats_Daily.day)
+        ).all():
+            days[_as_date(day)] = {"opened": opened or 0, "closed": closed or 0, "open": open_count or 0, "overdue": overdue or 0}
+            totals["hours"] += close_hours or 0
+        for close_buckets in db.session.scalars(select(Stats_Daily.close_buckets).where(*where, Stats_Daily.close_buckets.is_not(None))):
+            _add_buckets(totals["buckets"], close_buckets)
+    if end >= today:
+        for row in _live_rows(filters):
+            for key in days[today]:
+                days[today][key] += getattr(row, key) or 0
+            totals["hours"] += row.close_hours or 0
+            if row.close_buckets:
+                _add_buckets(totals["buckets"], row.close_buckets)
+
+    totals["opened"] = sum(loc["opened"] for loc in days.values())
+    totals["closed"] = sum(loc["closed"] for loc in days.values())
+    totals["open"] = days[end]["open"]
+    totals["overdue"] = days[end]["overdue"]
+    summary = _result(totals)
+    summary["days"] = [{"day": day.isoformat(), **loc} for day, loc in days.items()]
+    summary.update({key: value.isoformat() if isinstance(value, datetime.date) else value for key, value in filters.items()})
+    return summary
+
+
+def get_breakdown(filters, per_user=False):
+    """Totals of the range per org, or per assignee for tasks"""
+    start, end, today = filters["start"], filters["end"], _today()
+    column = Stats_Daily.user_id if per_user else Stats_Daily.org_id
+    groups = defaultdict(_new_totals)
+
+    if start < today:
+        rollup_missing(start, end)
+        where = _where(filters, per_user)
+        for group_id, opened, closed, close_hours in db.session.execute(
+            select(column, func.sum(Stats_Daily.opened), func.sum(Stats_Daily.closed), func.sum(Stats_Daily.close_hours))
+            .where(*where).group_by(column)
+        ).all():
+            groups[group_id].update({"opened": opened or 0, "closed": closed or 0, "hours": close_hours or 0})
+        if end < today:
+            for group_id, open_count, overdue in db.session.execute(
+                select(column, func.sum(Stats_Daily.open), func.sum(Stats_Daily.overdue))
+                .where(*where, Stats_Daily.day==end).group_by(column)
+            ).all():
+                groups[group_id].update({"open": open_count or 0, "overdue": overdue or 0})
+        for group_id, close_buckets in db.session.execute(
+            select(column, Stats_Daily.close_buckets).where(*where, Stats_Daily.close_buckets.is_not(None))
+        ).all():
+            _add_buckets(groups[group_id]["buckets"], close_buckets)
+    if end >= today:
+        for row in _live_rows(filters, per_user):
+            _add_row(groups[row.user_id if per_user else row.org_id], row)
+
+    if per_user:
+        names = {user.id: f"{user.first_name} {user.last_name}" for user in User.query.where(User.id.in_(list(groups))).all()}
+    else:
+        names = {org.id: org.name for org in Org.query.where(Org.id.in_([org_id for org_id in groups if org_id is not None])).all()}
+    out = list()
+    for group_id, totals in groups.items():
+        loc = _result(totals)
+        loc.update({"id": group_id, "name": names.get(group_id)})
+        out.append(loc)
+    out.sort(key=lambda loc: (-loc["open"], -loc["closed"], loc["id"] or 0))
+    key = "users" if per_user else "orgs"
+    return {key: out, "kind": filters["kind"], "start": start.isoformat(), "end": end.isoformat()}
@@ -6,6 +6,7 @@ from .. import db
 from . import common_template_core as CommonModel
 from sqlalchemy import and_, desc
 from ..custom_tags import custom_tags_core as CustomModel
+from ..case import order_core as OrderModel
 
 
 def build_task_query(page, tags=None, taxonomies=None, galaxies=None, clusters=None, title_filter=None):
@@ -241,7 +242,8 @@ def delete_task_template(tid):
     to_deleted = Case_Task_Template.query.filter_by(task_id=tid).all()
     for to_do in to_deleted:
         db.session.delete(to_do)
-        db.session.commit()
+        OrderModel.close_gap("task_template", to_do.case_id, to_do.case_order_id)
+    db.session.commit()
     Task_Template_Tags.query.filter_by(task_id=tid).delete()
     Task_Template_Galaxy_Tags.query.filter_by(template_id=tid).delete()
     Task_Template_Connector_Instance.query.filter_by(template_id=tid).delete()
@@ -324,19 +326,18 @@ def delete_note(tid, note_id):
     return False
 
 def change_order(case, task, up_down):
-    case_task_template = Case_Task_Template.query.filter_by(case_id=case.id).all()
     task_template = Case_Task_Template.query.filter_by(case_id=case.id, task_id=task.id).first()
-    for task_db in case_task_template:
-        # A task move up, case_order_id decrease by one
-        if up_down == "true":
-            if task_db.case_order_id == task_template.case_order_id - 1:
-                task_db.case_order_id += 1
-                task_template.case_order_id -= 1
-                break
-        else:
-            if task_db.case_order_id == task_template.case_order_id + 1:
-                task_db.case_order_id -= 1
-                task_template.case_order_id += 1
-                break
+    # A task move up, case_order_id decrease by one
+    OrderModel.move_up_down("task_template", case.id, task_template, up_down)
+    db.session.commit()
+
 
+def reorder_case_template_tasks(case, tasks_id):
+    """Set the order of the task templates of a case template"""
+    res = OrderModel.reorder("task_template", case.id, tasks_id)
+    if "message" in res:
+        db.session.rollback()
+        return res
     db.session.commit()
+    CommonModel.update_last_modif(case.id)
+    return res
@@ -381,3 +381,20 @@ class MoveTaskDown(Resource):
                 return {"message": "Order changed"}, 200
             return {"message": "Task Not found"}, 404
         return {"message": "Case Not found"}, 404
+
+
+@api.route('/case/<cid>/reorder_tasks', methods=["POST"])
+@api.doc(description='Set the order of all the tasks of a case template', params={"cid": "id of a case template"})
+@api.doc(params={"tasks": "Required. List of task template id in the new order"})
+class ReorderTasks(Resource):
+    method_decorators = [api_required]
+    def post(self, cid):
+        case = CommonModel.get_case_template(cid)
+        if case:
+            if request.json and "tasks" in request.json:
+                res = TaskModel.reorder_case_template_tasks(case, request.json["tasks"])
+                if "message" in res:
+                    return res, 400
+                return {"message": "Order changed"}, 200
+            return {"message": "Need to pass tasks"}, 400
+        return {"message": "Case Not found"}, 404
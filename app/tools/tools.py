@@ -6,8 +6,9 @@ from . import task_template_core as TaskModel
 from ..custom_tags import custom_tags_core as CustomModel
 from ..decorators import editor_required
 from .form import TaskTemplateForm, CaseTemplateForm, TaskTemplateEditForm, CaseTemplateEditForm
-from ..utils.utils import form_to_dict, MODULES_CONFIG, get_modules_list
+from ..utils.utils import form_to_dict, MODULES_CONFIG, MODULES
 from ..utils.formHelper import prepare_tags_connectors
+from ..utils.conditionalHelper import conditional_response
 
 tools_blueprint = Blueprint(
     'tools',
@@ -206,7 +207,7 @@ def get_template(cid):
     """Get a case template"""
     template = CommonModel.get_case_template(cid)
     if template:
-        return {"template": template.to_json()}
+        return conditional_response(template, lambda: {"template": template.to_json()})
     return {"message": "Template not found"}
 
 
@@ -217,7 +218,7 @@ def get_task_template(tid):
     """Get a task template"""
     template = CommonModel.get_task_template(tid)
     if template:
-        return {"template": template.to_json()}
+        return conditional_response(template, lambda: {"template": template.to_json()})
     return {"message": "Template not found"}
 
 
@@ -492,6 +493,22 @@ def change_order(cid, tid):
     return {"message": "Case Not found", 'toast_class': "danger-subtle"}, 404
 
 
+@tools_blueprint.route("/template/<cid>/reorder_tasks", methods=['POST'])
+@login_required
+@editor_required
+def reorder_tasks(cid):
+    """Set the order of all the tasks of a case template"""
+    case = CommonModel.get_case_template(cid)
+    if case:
+        if "tasks" in request.json:
+            res = TaskModel.reorder_case_template_tasks(case, request.json["tasks"])
+            if "message" in res:
+                return {"message": res["message"], 'toast_class': "danger-subtle"}, 400
+            return {"message": "Order changed", 'toast_class': "success-subtle"}, 200
+        return {"message": "Need to pass tasks", 'toast_class': "danger-subtle"}, 400
+    return {"message": "Case Not found", 'toast_class': "danger-subtle"}, 404
+
+
 @tools_blueprint.route("/template/get_custom_tags_case/<cid>", methods=['GET'])
 @login_required
 def get_custom_tags_case(cid):
@@ -552,5 +569,5 @@ def get_modules():
 @tools_blueprint.route("/reload_module")
 @login_required
 def reload():
-    get_modules_list()
+    MODULES.reload()
     return {"message": "Modules reloaded", "toast_class": "success-subtle"}, 200
\ No newline at end of file
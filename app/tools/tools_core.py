@@ -5,7 +5,8 @@ import json
 from .. import db
 import datetime
 from ..utils import utils
-from ..case import case_core, task_core, common_core
+from ..utils import tagHelper as TagHelper
+from ..case import case_core, task_core, common_core, clone_core, order_core
 from sqlalchemy import and_, desc
 from . import common_template_core as CommonModel
 from . import task_template_core as TaskModel
@@ -298,6 +299,7 @@ def delete_case_template(cid):
 def remove_task_case(cid, tid):
     template = Case_Task_Template.query.filter_by(case_id=cid, task_id=tid).first()
     db.session.delete(template)
+    order_core.close_gap("task_template", template.case_id, template.case_order_id)
     db.session.commit()
     CommonModel.update_last_modif(cid)
     return True
@@ -309,129 +311,7 @@ def create_case_from_template(cid, case_title_fork, user):
         return {"message": "Error, title already exist"}
     
     case_template = CommonModel.get_case_template(cid)
-    case_tasks = CommonModel.get_all_tasks_by_case(cid)
-
-    case = Case(
-        title=case_title_fork,
-        description=case_template.description,
-        uuid=str(uuid.uuid4()),
-        creation_date=datetime.datetime.now(tz=datetime.timezone.utc),
-        last_modif=datetime.datetime.now(tz=datetime.timezone.utc),
-        status_id=1,
-        owner_org_id=user.org_id,
-        nb_tasks=len(case_tasks)
-    )
-    db.session.add(case)
-    db.session.commit()
-
-    ## Case Tags
-    for c_t in Case_Template_Tags.query.filter_by(case_id=case_template.id).all():
-        case_tag = Case_Tags(
-            case_id=case.id,
-            tag_id=c_t.tag_id
-        )
-        db.session.add(case_tag)
-        db.session.commit()
-
-    ## Case Clusters
-    for c_t in Case_Template_Galaxy_Tags.query.filter_by(template_id=case_template.id).all():
-        case_cluster = Case_Galaxy_Tags(
-            case_id=case.id,
-            cluster_id=c_t.cluster_id
-        )
-        db.session.add(case_cluster)
-        db.session.commit()
-
-    ## Case Connectors
-    for c_t in Case_Template_Connector_Instance.query.filter_by(template_id=case_template.id).all():
-        case_connector = Case_Connector_Instance(
-            case_id=case.id,
-            instance_id=c_t.instance_id
-        )
-        db.session.add(case_connector)
-        db.session.commit()
-    
-    ## Case Custom Tags
-    for c_t in CommonModel.get_case_custom_tags(case_template.id):
-        case_custom_tags = Case_Custom_Tags(
-            case_id=case.id,
-            custom_tag_id=c_t.custom_tag_id
-        )
-        db.session.add(case_custom_tags)
-        db.session.commit()
-
-    # Add the current user's org to the case
-    case_org = Case_Org(
-        case_id=case.id, 
-        org_id=user.org_id
-    )
-
-    db.session.add(case_org)
-    db.session.commit()
-
-    task_case_template = CommonModel.get_task_by_case(cid)
-    for task in task_case_template:
-        task_in_case = CommonModel.get_task_by_case_class(cid, task.id)
-        t = Task(
-            uuid=str(uuid.uuid4()),
-            title=task.title,
-            description=task.description,
-            url=task.url,
-            creation_date=datetime.datetime.now(tz=datetime.timezone.utc),
-            last_modif=datetime.datetime.now(tz=datetime.timezone.utc),
-            case_id=case.id,
-            status_id=1,
-            case_order_id=task_in_case.case_order_id,
-            nb_notes=task.nb_notes
-        )
-        db.session.add(t)
-        db.session.commit()
-
-        for t_note in task.notes:
-            note = Note(
-                uuid=str(uuid.uuid4()),
-                note=t_note.note,
-                task_id=t.id,
-                task_order_id=task.nb_notes+1
-            )
-            db.session.add(note)
-            db.session.commit()
-
-        ## Task Tags
-        for t_t in Task_Template_Tags.query.filter_by(task_id=task.id).all():
-            task_tag = Task_Tags(
-                task_id=t.id,
-                tag_id=t_t.tag_id
-            )
-            db.session.add(task_tag)
-            db.session.commit()
-        
-        ## Task Clusters
-        for t_t in Task_Template_Galaxy_Tags.query.filter_by(template_id=task.id).all():
-            task_cluster = Task_Galaxy_Tags(
-                task_id=t.id,
-                cluster_id=t_t.cluster_id
-            )
-            db.session.add(task_cluster)
-            db.session.commit()
-
-        ## Task Connectors
-        for t_c in Task_Template_Connector_Instance.query.filter_by(template_id=task.id).all():
-            task_connector = Task_Connector_Instance(
-                task_id=t.id,
-                instance_id=t_c.instance_id
-            )
-            db.session.add(task_connector)
-            db.session.commit()
-
-        ## Task Custom Tags
-        for c_t in CommonModel.get_task_custom_tags(task.id):
-            task_custom_tags = Task_Custom_Tags(
-                task_id=t.id,
-                custom_tag_id=c_t.custom_tag_id
-            )
-            db.session.add(task_custom_tags)
-            db.session.commit()
+    case = clone_core.clone_template_to_case(case_template, case_title_fork, user)
     
     common_core.save_history(case.uuid, user, f"Case created from template: {case_template.id} - {case_template.title}")
     return case
@@ -480,10 +360,10 @@ def core_read_json_file(case, current_user):
     if Case.query.filter_by(uuid=case["uuid"]).first():
         case["uuid"] = str(uuid.uuid4())
 
-    # tags
-    for tag in case["tags"]:
-        if not utils.check_tag(tag):
-            return {"message": f"Case '{case['title']}': tag '{tag}' doesn't exist"}
+    # tags, of the case and all its tasks at once
+    invalid = TagHelper.find_invalid(tags=case["tags"] + [tag for task in case["tasks"] for tag in task["tags"]])
+    if invalid:
+        return {"message": f"Case '{case['title']}': {TagHelper.invalid_message(invalid)}", "invalid": invalid}
         
     # connectors
     case['connectors'] = []
@@ -509,10 +389,6 @@ def core_read_json_file(case, current_user):
             task["deadline_date"] = ""
             task["deadline_time"] = ""
 
-        for tag in task["tags"]:
-            if not utils.check_tag(tag):
-                return {"message": f"Task '{task['title']}': tag '{tag}' doesn't exist"}
-        
         task['connectors'] = []
 
 
@@ -0,0 +1,39 @@
+import threading
+
+from flask import current_app
+from .. import db
+from ..db_class.db import Change_Counter
+from sqlalchemy import select
+
+
+# Counter of the taxonomies, tags, galaxies, clusters and custom tags
+REFERENCE = ["reference"]
+# Counter of the tags, clusters, custom tags and connectors of the cases
+CASE_LINKS = ["case_links"]
+
+_lock = threading.Lock()
+
+
+def change_signature(names):
+    """Uuid and value of the change counters, a write on one of their tables gives a new signature"""
+    return tuple(tuple(row) for row in db.session.execute(
+        select(Change_Counter.name, Change_Counter.uuid, Change_Counter.value)
+            .where(Change_Counter.name.in_(names)).order_by(Change_Counter.name)
+    ).all())
+
+
+def cached(key, names, build):
+    """Object of the app built by build(signature), built again when a counter of names moved
+
+    The counters are in the db, a write made by another process is seen on the next call.
+    """
+    signature = change_signature(names)
+    entries = current_app.extensions.setdefault("cached", {})
+    entry = entries.get(key)
+    if entry is None or entry[0] != signature:
+        with _lock:
+            entry = entries.get(key)
+            if entry is None or entry[0] != signature:
+                entry = (signature, build(signature))
+                entries[key] = entry
+    return entry[1]
@@ -0,0 +1,40 @@
+import hashlib
+import datetime
+from flask import request, Response
+from werkzeug.http import http_date
+
+
+def get_validators(obj, *extra):
+    """Return the ETag and the Last-Modified date of an object"""
+    last_modif = obj.last_modif
+    if last_modif and not last_modif.tzinfo:
+        last_modif = last_modif.replace(tzinfo=datetime.timezone.utc)
+    raw = f"{obj.__tablename__}:{obj.id}:{obj.version or 0}:{last_modif.isoformat() if last_modif else ''}"
+    for loc in extra:
+        raw += f":{loc}"
+    return hashlib.sha1(raw.encode()).hexdigest(), last_modif
+
+
+def is_not_modified(etag, last_modif):
+    """Check the validators sent by the client"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modif:
+        return last_modif.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def validators_headers(etag, last_modif):
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"}
+    if last_modif:
+        headers["Last-Modified"] = http_date(last_modif)
+    return headers
+
+
+def conditional_response(obj, serialize, *extra):
+    """Return a 304 if the client is up to date, otherwise serialize the object"""
+    etag, last_modif = get_validators(obj, *extra)
+    headers = validators_headers(etag, last_modif)
+    if is_not_modified(etag, last_modif):
+        return Response(status=304, headers=headers)
+    return serialize(), 200, headers
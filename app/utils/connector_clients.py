@@ -0,0 +1,67 @@
+import time
+import threading
+from collections import defaultdict
+
+import conf.config_module as Config
+
+
+# Seconds a client can stay unused before being dropped
+IDLE_TIMEOUT = getattr(Config, "CONNECTOR_IDLE_TIMEOUT", 300)
+# Idle clients kept per key
+MAX_IDLE = 4
+
+
+class ClientRegistry:
+    """Warm connector clients, each one leased to a single caller at a time"""
+    def __init__(self, idle_timeout=IDLE_TIMEOUT, max_idle=MAX_IDLE):
+        self.idle_timeout = idle_timeout
+        self.max_idle = max_idle
+        self.idle = defaultdict(list)
+        self.lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def _evict(self, now):
+        for key in list(self.idle):
+            self.idle[key] = [(client, used) for client, used in self.idle[key] if now - used < self.idle_timeout]
+            if not self.idle[key]:
+                del self.idle[key]
+
+    def acquire(self, key, factory):
+        """Return an idle client of key or a new one made by factory"""
+        now = time.monotonic()
+        with self.lock:
+            self._evict(now)
+            if self.idle.get(key):
+                self.reused += 1
+                return self.idle[key].pop()[0]
+        client = factory()
+        with self.lock:
+            self.created += 1
+        return client
+
+    def release(self, key, client, healthy=True):
+        """Give back a client, a client that failed is dropped"""
+        if not healthy:
+            return
+        with self.lock:
+            if len(self.idle[key]) < self.max_idle:
+                self.idle[key].append((client, time.monotonic()))
+
+    def clear(self):
+        with self.lock:
+            self.idle.clear()
+
+    def stats(self):
+        with self.lock:
+            return {"created": self.created, "reused": self.reused,
+                    "idle": sum(len(clients) for clients in self.idle.values())}
+
+
+# Shared by the modules of the process
+registry = ClientRegistry()
+
+
+def client_key(kind, instance, verify):
+    """Clients are reused per instance, api key and tls setting"""
+    return (kind, instance["url"], instance.get("api_key"), verify)
@@ -1,72 +1,44 @@
-from .utils import check_tag
 from ..case import common_core as CommonModel
+from . import tagHelper as TagHelper
 
-def creation_verification_tags_connectors(data_dict):
-    if "tags" in data_dict:
-        for tag in data_dict["tags"]:
-            if not check_tag(tag):
-                return {"message": f"Tag '{tag}' doesn't exist"}
-    else:
-        data_dict["tags"] = []
 
-    if "clusters" in data_dict:
-        loc = CommonModel.check_cluster(data_dict["clusters"])
-        if not isinstance(loc, bool):
-            return {"message": f"Cluster '{loc}' doesn't exist"}
-    else:
-        data_dict["clusters"] = []
+def _verif_names(data_dict):
+    """Validate tags, clusters and custom tags together, return an error with every invalid name"""
+    invalid = TagHelper.find_invalid(tags=data_dict["tags"], clusters=data_dict["clusters"], custom_tags=data_dict["custom_tags"])
+    if invalid:
+        return {"message": TagHelper.invalid_message(invalid), "invalid": invalid}
+    return None
+
+def creation_verification_tags_connectors(data_dict):
+    for key in ["tags", "clusters", "connectors", "custom_tags"]:
+        if key not in data_dict:
+            data_dict[key] = []
 
-    if "connectors" in data_dict:
-        loc = CommonModel.check_connector(data_dict["connectors"])
-        if not isinstance(loc, bool):
-            return {"message": f"Connector '{loc}' doesn't exist"}
-    else:
-        data_dict["connectors"] = []
+    error = _verif_names(data_dict)
+    if error:
+        return error
 
-    if "custom_tags" in data_dict:
-        loc = CommonModel.check_custom_tags(data_dict["custom_tags"])
-        if not isinstance(loc, bool):
-            return {"message": f"Custom tag '{loc}' doesn't exist"}
-    else:
-        data_dict["custom_tags"] = []
+    loc = CommonModel.check_connector(data_dict["connectors"])
+    if not isinstance(loc, bool):
+        return {"message": f"Connector '{loc}' doesn't exist"}
 
     return data_dict
 
 def edition_verification_tags_connectors(data_dict, case_task):
-    if "tags" in data_dict:
-        for tag in data_dict["tags"]:
-            if not check_tag(tag):
-                return {"message": f"Tag '{tag}' doesn't exist"}
-    elif case_task.to_json()["tags"]:
-        data_dict["tags"] = case_task.to_json()["tags"]
-    else:
-        data_dict["tags"] = []
+    case_task_json = case_task.to_json()
+    for key in ["tags", "clusters", "connectors", "custom_tags"]:
+        if key not in data_dict:
+            if case_task_json[key]:
+                data_dict[key] = case_task_json[key]
+            else:
+                data_dict[key] = []
+
+    error = _verif_names(data_dict)
+    if error:
+        return error
+
+    loc = CommonModel.check_connector(data_dict["connectors"])
+    if not isinstance(loc, bool):
+        return {"message": f"Connector '{loc}' doesn't exist"}
 
-    if "clusters" in data_dict:
-        loc = CommonModel.check_cluster(data_dict["clusters"])
-        if not isinstance(loc, bool):
-            return {"message": f"Cluster '{loc}' doesn't exist"}
-    elif case_task.to_json()["clusters"]:
-        data_dict["clusters"] = case_task.to_json()["clusters"]
-    else:
-        data_dict["clusters"] = []
-
-    if "connectors" in data_dict:
-        loc = CommonModel.check_connector(data_dict["connectors"])
-        if not isinstance(loc, bool):
-            return {"message": f"Connector '{loc}' doesn't exist"}
-    elif case_task.to_json()["connectors"]:
-        data_dict["connectors"] = case_task.to_json()["connectors"]
-    else:
-        data_dict["connectors"] = []
-            
-    if "custom_tags" in data_dict:
-        loc = CommonModel.check_custom_tags(data_dict["custom_tags"])
-        if not isinstance(loc, bool):
-            return {"message": f"Custom tag '{loc}' doesn't exist"}
-    elif case_task.to_json()["custom_tags"]:
-        data_dict["custom_tags"] = case_task.to_json()["custom_tags"]
-    else:
-        data_dict["custom_tags"] = []
-
-    return data_dict
\ No newline at end of file
+    return data_dict
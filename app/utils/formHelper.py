@@ -1,12 +1,13 @@
-from ..case import common_core as CommonModel
+from . import tagHelper as TagHelper
 
 def prepare_tags_connectors(request):
     tag_list = request.form.getlist("tags_select")
     cluster_list = request.form.getlist("clusters_select")
     connector_list = request.form.getlist("connectors_select")
     custom_tags_list = request.form.getlist("custom_select")
-    if isinstance(CommonModel.check_tag(tag_list), bool):
-        if isinstance(CommonModel.check_cluster(cluster_list), bool):
+    invalid = TagHelper.find_invalid(tags=tag_list, clusters=cluster_list)
+    if not "tags" in invalid:
+        if not "clusters" in invalid:
             identifier_dict = dict()
             for connector in connector_list:
                 identifier_dict[connector] = request.form.get(f"identifier_{connector}")
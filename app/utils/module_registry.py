@@ -0,0 +1,137 @@
+import os
+import re
+import ast
+import sys
+import time
+import fnmatch
+import importlib
+import threading
+
+
+# Seconds between two checks of the generation file
+CHECK_INTERVAL = 2
+
+
+def read_config(path):
+    """Literal module_config of a module file, read without importing it"""
+    with open(path) as read_file:
+        tree = ast.parse(read_file.read(), filename=path)
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(target, ast.Name) and target.id == "module_config" for target in node.targets):
+            return ast.literal_eval(node.value)
+    return None
+
+
+class ModuleRegistry:
+    """Modules of app/modules, their config is read from the files and the code imported on first use
+
+    A reload bumps a generation counter kept in a file, every worker sharing the folder rescans
+    when it sees a new generation.
+    """
+    def __init__(self, path, configs):
+        self.path = path
+        # MODULES_CONFIG, updated in place as it's imported elsewhere
+        self.configs = configs
+        self.files = dict()
+        self.loaded = dict()
+        self.generation = None
+        self.checked_at = 0
+        self.lock = threading.RLock()
+        self.generation_file = os.path.join(path, ".generation")
+
+    def _walk(self):
+        for root, dirnames, filenames in os.walk(self.path):
+            if os.path.basename(root) == '__pycache__':
+                continue
+            if re.match(r'^\.', os.path.basename(root)):
+                continue
+            for filename in fnmatch.filter(filenames, '*.py'):
+                if filename == '__init__.py':
+                    continue
+                yield os.path.basename(root), filename.split(".")[0], os.path.join(root, filename)
+
+    def scan(self, force=False):
+        """Read the config of each module file, modules changed on disk are imported again on next use"""
+        with self.lock:
+            if self.path not in sys.path:
+                sys.path.append(self.path)
+            found = dict()
+            for root_dir, modulename, path in self._walk():
+                mtime = os.stat(path).st_mtime_ns
+                known = self.files.get(modulename)
+                if known and known["mtime"] == mtime and not force and modulename in self.configs:
+                    found[modulename] = known
+                    continue
+                config = read_config(path)
+                if config is None:
+                    # Not a literal, the module has to be imported to know it
+                    config = self._import(root_dir, modulename, reload=force).module_config
+                found[modulename] = {"type": root_dir, "path": path, "mtime": mtime}
+                self.configs[modulename] = {"type": root_dir, "config": config}
+                if modulename in self.loaded and (force or not known or known["mtime"] != mtime):
+                    self.loaded[modulename]["stale"] = True
+
+            for modulename in list(self.configs):
+                if modulename not in found:
+                    del self.configs[modulename]
+                    self.loaded.pop(modulename, None)
+            self.files = found
+            self.generation = self.read_generation()
+            self.checked_at = time.monotonic()
+
+    def _import(self, root_dir, modulename, reload=False):
+        name = f"{root_dir}.{modulename}"
+        if reload and name in sys.modules:
+            module = importlib.reload(sys.modules[name])
+        else:
+            module = importlib.import_module(name)
+        self.loaded[modulename] = {"module": module, "stale": False}
+        return module
+
+    def __getitem__(self, modulename):
+        loaded = self.loaded.get(modulename)
+        if loaded and not loaded["stale"]:
+            return loaded["module"]
+        with self.lock:
+            if modulename not in self.files:
+                raise KeyError(modulename)
+            loaded = self.loaded.get(modulename)
+            if loaded and not loaded["stale"]:
+                return loaded["module"]
+            return self._import(self.files[modulename]["type"], modulename, reload=bool(loaded))
+
+    def __contains__(self, modulename):
+        return modulename in self.files
+
+    def __iter__(self):
+        return iter(self.files)
+
+    def __len__(self):
+        return len(self.files)
+
+    def read_generation(self):
+        try:
+            with open(self.generation_file) as read_file:
+                return int(read_file.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def reload(self):
+        """Rescan and re-import the modules here, and make the other workers do the same"""
+        with self.lock:
+            generation = self.read_generation() + 1
+            tmp = f"{self.generation_file}.{os.getpid()}"
+            with open(tmp, "w") as write_file:
+                write_file.write(str(generation))
+            os.replace(tmp, self.generation_file)
+            self.scan(force=True)
+
+    def check(self):
+        """Rescan if another worker reloaded the modules, the file is only read every CHECK_INTERVAL"""
+        if self.generation is not None and time.monotonic() - self.checked_at < CHECK_INTERVAL:
+            return
+        generation = self.read_generation()
+        if generation != self.generation:
+            self.scan(force=self.generation is not None)
+        else:
+            self.checked_at = time.monotonic()
@@ -0,0 +1,176 @@
+import json
+import time
+import logging
+import threading
+from collections import Counter, defaultdict, deque
+
+from flask import g, request, current_app, has_request_context, request_started, request_finished
+from sqlalchemy import event
+
+
+# Number of requests kept per endpoint for the report
+MAX_SAMPLES = 1000
+# Number of duplicate statements shown for a request
+MAX_DUPLICATES = 5
+PERCENTILES = [50, 95, 99]
+
+logger = logging.getLogger("flowintel.profiler")
+_file_lock = threading.Lock()
+
+
+class RequestProfile:
+    """Queries executed during one request"""
+    __slots__ = ("start", "queries", "db_time", "statements")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+
+    def add(self, statement, duration):
+        self.queries += 1
+        self.db_time += duration
+        self.statements[statement] += 1
+
+    def duplicates(self):
+        """Statements executed more than once, most repeated first"""
+        return [(statement, nb) for statement, nb in self.statements.most_common() if nb > 1]
+
+    def nb_duplicates(self):
+        return sum(nb - 1 for nb in self.statements.values() if nb > 1)
+
+
+class ProfileStore:
+    """Last samples of each endpoint, aggregated on demand"""
+    def __init__(self, max_samples=MAX_SAMPLES):
+        self.samples = defaultdict(lambda: deque(maxlen=max_samples))
+        self.lock = threading.Lock()
+
+    def add(self, record):
+        with self.lock:
+            self.samples[record["endpoint"]].append(record)
+
+    def report(self):
+        with self.lock:
+            samples = {endpoint: list(records) for endpoint, records in self.samples.items()}
+        return aggregate(samples)
+
+
+def percentile(values, pct):
+    """Nearest rank percentile of a sorted list"""
+    if not values:
+        return 0
+    rank = max(1, -(-len(values) * pct // 100))
+    return values[int(rank) - 1]
+
+
+def aggregate(samples):
+    """Percentiles per endpoint of {endpoint: [request records]}, slowest first"""
+    out = list()
+    for endpoint, records in samples.items():
+        wall = sorted(record["wall_ms"] for record in records)
+        db_time = sorted(record["db_ms"] for record in records)
+        queries = sorted(record["queries"] for record in records)
+        loc = {"endpoint": endpoint, "count": len(records)}
+        for pct in PERCENTILES:
+            loc[f"wall_p{pct}"] = round(percentile(wall, pct), 2)
+            loc[f"db_p{pct}"] = round(percentile(db_time, pct), 2)
+        loc["queries_p50"] = percentile(queries, 50)
+        loc["queries_max"] = queries[-1]
+        loc["duplicates_max"] = max(record["duplicates"] for record in records)
+        out.append(loc)
+    out.sort(key=lambda loc: loc["wall_p95"], reverse=True)
+    return out
+
+
+def report_from_file(path):
+    """Aggregate the request records of a profiler log file"""
+    samples = defaultdict(list)
+    with open(path) as read_file:
+        for line in read_file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("event") == "request":
+                samples[record["endpoint"]].append(record)
+    return aggregate(samples)
+
+
+def _write(app, record):
+    """Log slow events and append every record to the profiler file if any"""
+    if record.get("slow"):
+        logger.warning(json.dumps(record))
+    path = app.config.get("QUERY_PROFILER_LOG")
+    if path:
+        with _file_lock:
+            with open(path, "a") as write_file:
+                write_file.write(json.dumps(record) + "\n")
+
+
+def _endpoint():
+    rule = request.url_rule.rule if request.url_rule else request.path
+    return f"{request.method} {rule}"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "query_profile" in g:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not (has_request_context() and "query_profile" in g) or not conn.info.get("query_start"):
+        return
+    duration = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+    g.query_profile.add(statement, duration)
+    if duration >= current_app.config.get("QUERY_PROFILER_SLOW_QUERY_MS", 100):
+        _write(current_app, {"event": "slow_query", "slow": True, "endpoint": _endpoint(),
+                             "db_ms": round(duration, 2), "statement": statement})
+
+
+def _request_started(app, **extra):
+    g.query_profile = RequestProfile()
+
+def _request_finished(app, response, **extra):
+    profile = g.pop("query_profile", None)
+    if profile is None:
+        return
+    wall = (time.perf_counter() - profile.start) * 1000
+    record = {
+        "event": "request",
+        "endpoint": _endpoint(),
+        "status": response.status_code,
+        "wall_ms": round(wall, 2),
+        "db_ms": round(profile.db_time, 2),
+        "queries": profile.queries,
+        "duplicates": profile.nb_duplicates(),
+        "slow": wall >= app.config.get("QUERY_PROFILER_SLOW_REQUEST_MS", 500)
+    }
+    app.extensions["query_profiler"].add(record)
+    if record["slow"]:
+        record["duplicate_statements"] = [{"statement": statement, "count": nb}
+                                          for statement, nb in profile.duplicates()[:MAX_DUPLICATES]]
+    _write(app, record)
+
+
+def init_app(app, db):
+    """Hook the profiler on the engines and requests of the app, nothing is done when disabled"""
+    if not app.config.get("QUERY_PROFILER"):
+        return
+    app.extensions["query_profiler"] = ProfileStore()
+    with app.app_context():
+        for engine in db.engines.values():
+            if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+                event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+                event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    request_started.connect(_request_started, app)
+    request_finished.connect(_request_finished, app)
+
+
+def is_enabled(app):
+    return "query_profiler" in app.extensions
+
+
+def get_report(app):
+    """Per endpoint percentiles of the requests seen by this worker"""
+    return app.extensions["query_profiler"].report()
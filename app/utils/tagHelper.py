@@ -0,0 +1,54 @@
+from .. import db
+from ..db_class.db import Tags, Cluster, Custom_Tags
+from sqlalchemy import select
+from .utils import get_machinetags
+from . import cacheHelper as CacheHelper
+
+
+KINDS = ["tags", "clusters", "custom_tags"]
+
+
+class TagIndex:
+    """Frozen sets of the valid names of each kind"""
+    def __init__(self, signature=None):
+        self.signature = signature
+        # A tag is valid if it's a machinetag and it's present in the db
+        db_tags = {name for (name,) in db.session.execute(select(Tags.name)).all()}
+        self.names = {
+            "tags": get_machinetags() & frozenset(db_tags),
+            "clusters": frozenset(name for (name,) in db.session.execute(select(Cluster.name)).all()),
+            "custom_tags": frozenset(name for (name,) in db.session.execute(select(Custom_Tags.name)).all())
+        }
+
+    def invalid(self, **names_by_kind):
+        """Return all invalid names of each kind given, kinds without error are left out"""
+        out = dict()
+        for kind, names in names_by_kind.items():
+            missing = [name for name in dict.fromkeys(names or []) if name not in self.names[kind]]
+            if missing:
+                out[kind] = missing
+        return out
+
+
+def get_index():
+    """Return the index of the app, rebuilt when the tables changed"""
+    return CacheHelper.cached("tag_index", CacheHelper.REFERENCE, TagIndex)
+
+
+def find_invalid(tags=None, clusters=None, custom_tags=None):
+    """Validate lists of names in one pass, return {kind: [invalid names]}"""
+    return get_index().invalid(tags=tags, clusters=clusters, custom_tags=custom_tags)
+
+
+def invalid_message(invalid):
+    """Human readable message listing all invalid names"""
+    labels = {"tags": "Tag", "clusters": "Cluster", "custom_tags": "Custom tag"}
+    messages = list()
+    for kind in KINDS:
+        if kind in invalid:
+            names = ", ".join(f"'{name}'" for name in invalid[kind])
+            if len(invalid[kind]) == 1:
+                messages.append(f"{labels[kind]} {names} doesn't exist")
+            else:
+                messages.append(f"{labels[kind]}s {names} don't exist")
+    return ". ".join(messages)
@@ -1,10 +1,6 @@
-import fnmatch
-import importlib
 import os
 import glob
 import json
-import re
-import sys
 import uuid
 import random
 import string
@@ -13,10 +9,12 @@ from ..db_class.db import User
 from pytaxonomies import Taxonomies
 from pymispgalaxies import Galaxies, Clusters
 from conf.config import Config
+from .module_registry import ModuleRegistry
 
-MODULES = {}
 MODULES_CONFIG = {}
 MODULE_PATH = os.path.join(os.getcwd(), "app", "modules")
+# Modules are imported on their first use
+MODULES = ModuleRegistry(MODULE_PATH, MODULES_CONFIG)
 
 manifest = os.path.join(os.getcwd(), "modules/misp-taxonomies/MANIFEST.json")
 
@@ -83,30 +81,8 @@ def get_module_type():
     return type_list
 
 def get_modules_list():
-    modulename_list = list()
-    sys.path.append(MODULE_PATH)
-    for root, dirnames, filenames in os.walk(MODULE_PATH):
-        if os.path.basename(root) == '__pycache__':
-            continue
-        if re.match(r'^\.', os.path.basename(root)):
-            continue
-        for filename in fnmatch.filter(filenames, '*.py'):
-            if filename == '__init__.py':
-                continue
-            modulename = filename.split(".")[0]
-            root_dir = os.path.basename(root)
-            MODULES[modulename] = importlib.import_module(root_dir + '.' + modulename)
-            MODULES_CONFIG[modulename] = {"type": root_dir, "config": MODULES[modulename].module_config}
-            modulename_list.append(modulename)
-
-    loc_elem = []
-    for elem in MODULES_CONFIG:
-        if elem not in modulename_list:
-            loc_elem.append(elem)
-    
-    for elem in loc_elem:
-        del MODULES_CONFIG[elem]
-        del MODULES[elem]
+    """Read the config of the modules, the modules themselves are imported when used"""
+    MODULES.scan()
 
 caseSchema = {
     "type": "object",
@@ -174,9 +150,14 @@ def validateTaskJson(json_data):
         return False
     return True
 
+_machinetags = None
+
+def get_machinetags():
+    """Frozen set of every machinetag of the taxonomies, built once per process"""
+    global _machinetags
+    if _machinetags is None:
+        _machinetags = frozenset(tag for name in taxonomies.keys() for tag in taxonomies.get(name).machinetags())
+    return _machinetags
+
 def check_tag(tag):
-    try:
-        name = tag.split(":")[0]
-        return tag in taxonomies.get(name).machinetags()
-    except:
-        return False
+    return tag in get_machinetags()
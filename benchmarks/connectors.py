@@ -0,0 +1,151 @@
+"""Push cases and tasks through the misp connectors against a local MISP stand-in
+
+    python -m benchmarks.connectors --cases 20 --tasks 5 --latency 0.02 --error_rate 0.05
+
+The testing database is dropped and recreated.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.append(os.getcwd())
+os.environ["FLASKENV"] = "testing"
+os.environ.setdefault("HISTORY_DIR", tempfile.mkdtemp(prefix="flowintel-bench-"))
+
+from app import create_app, db
+from app.db_class.db import User, Case, Connector, Connector_Instance, User_Connector_Instance, Case_Connector_Instance, Task_Connector_Instance
+from app.utils.init_db import create_user_test
+from app.utils.utils import get_modules_list
+from app.case import case_core as CaseModel
+from app.case import task_core as TaskModel
+from app.utils.profiler import percentile
+from benchmarks.dataset import generate
+from benchmarks import misp_standin
+
+
+INSTANCE_NAME = "misp-standin"
+USER_ID = 1
+
+
+def create_instance(url, api_key=misp_standin.API_KEY):
+    """Misp connector with one instance pointing to the stand-in"""
+    connector = Connector(name="Misp", description="Misp connector", uuid="00000000-0000-4000-8000-000000000001")
+    db.session.add(connector)
+    db.session.flush()
+    instance = Connector_Instance(name=INSTANCE_NAME, url=url, description="MISP stand-in", type="send_to",
+                                  uuid="00000000-0000-4000-8000-000000000002", connector_id=connector.id)
+    db.session.add(instance)
+    db.session.flush()
+    db.session.add(User_Connector_Instance(user_id=USER_ID, instance_id=instance.id, api_key=api_key))
+    db.session.commit()
+    return instance
+
+
+def _call(function, *args):
+    """Run a connector call, return (milliseconds, error or None)"""
+    start = time.perf_counter()
+    try:
+        res = function(*args)
+        error = res.get("message", str(res)) if isinstance(res, dict) else None
+    except Exception as e:
+        db.session.rollback()
+        error = f"{type(e).__name__}: {e}"
+    return (time.perf_counter() - start) * 1000, error
+
+
+def push_cases(instance, user):
+    """Send every case with its tasks, update it if it was already sent"""
+    timings, errors = list(), list()
+    for case in Case.query.order_by(Case.id).all():
+        identifier = Case_Connector_Instance.query.filter_by(case_id=case.id, instance_id=instance.id).first()
+        instances = {INSTANCE_NAME: identifier.identifier if identifier else None}
+        elapsed, error = _call(CaseModel.call_module_case, "misp_event", instances, case, user)
+        timings.append(elapsed)
+        if error:
+            errors.append(error)
+    return timings, errors
+
+
+def push_tasks(instance, user):
+    """Send every task on its own"""
+    timings, errors = list(), list()
+    for case in Case.query.order_by(Case.id).all():
+        for task in case.tasks:
+            identifier = Task_Connector_Instance.query.filter_by(task_id=task.id, instance_id=instance.id).first()
+            instances = {INSTANCE_NAME: identifier.identifier if identifier else None}
+            elapsed, error = _call(TaskModel.call_module_task, "misp_event_task", instances, case, task, user)
+            timings.append(elapsed)
+            if error:
+                errors.append(error)
+    return timings, errors
+
+
+def summary(name, timings, errors, duration):
+    timings = sorted(timings)
+    return {
+        "benchmark": name,
+        "calls": len(timings),
+        "errors": len(errors),
+        "first_errors": list(dict.fromkeys(errors))[:3],
+        "throughput": round(len(timings) / duration, 2) if duration else 0,
+        "p50_ms": round(percentile(timings, 50), 2),
+        "p95_ms": round(percentile(timings, 95), 2),
+        "max_ms": round(timings[-1], 2) if timings else 0
+    }
+
+
+def run(nb_cases, nb_tasks, passes=2, seed=0, **standin_options):
+    """Create the dataset, then push cases and tasks passes times, the first pass creates the events"""
+    server, standin, url = misp_standin.start(seed=seed, **standin_options)
+    try:
+        app = create_app()
+        app.config.update({"TESTING": True, "SERVER_NAME": f"{app.config.get('FLASK_URL')}:{app.config.get('FLASK_PORT')}"})
+        results = list()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            create_user_test()
+            generate(nb_orgs=2, nb_users=5, nb_cases=nb_cases, nb_tasks=nb_tasks, seed=seed, owner_id=USER_ID)
+            instance = create_instance(url)
+            user = User.query.get(USER_ID)
+            get_modules_list()
+
+            for loc_pass in range(passes):
+                for name, push in [("misp_event", push_cases), ("misp_event_task", push_tasks)]:
+                    start = time.perf_counter()
+                    timings, errors = push(instance, user)
+                    results.append(dict(summary(name, timings, errors, time.perf_counter() - start), loc_pass=loc_pass))
+        return {"results": results, "standin": standin.stats()}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the misp connectors against a local stand-in")
+    parser.add_argument("--cases", type=int, default=10)
+    parser.add_argument("--tasks", type=int, default=3, help="Number of tasks per case")
+    parser.add_argument("--passes", type=int, default=2, help="Number of times everything is pushed")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to each request of the stand-in")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Part of the requests answered with a 500")
+    parser.add_argument("--hang_rate", type=float, default=0.0, help="Part of the requests hanging --hang seconds")
+    parser.add_argument("--hang", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Json file of the results, printed if not given")
+    args = parser.parse_args(argv)
+
+    output = run(args.cases, args.tasks, args.passes, args.seed, latency=args.latency, jitter=args.jitter,
+                 error_rate=args.error_rate, hang_rate=args.hang_rate, hang=args.hang)
+    if args.output:
+        with open(args.output, "w") as write_file:
+            json.dump(output, write_file, indent=2)
+    else:
+        print(json.dumps(output, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import uuid
+import random
+import datetime
+
+from app import db
+from app.db_class.db import Org, User, Case, Case_Org, Task, Task_User, Note, Taxonomy, Tags, Galaxy, Cluster
+from app.db_class.db import Case_Tags, Task_Tags, Case_Galaxy_Tags, Task_Galaxy_Tags, Case_Link_Case, Notification
+
+
+BASE_DATE = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+TAGS = ["tlp:white", "tlp:green", "tlp:amber", "tlp:red", "tlp:clear"]
+NB_CLUSTERS = 20
+# Rows are flushed every FLUSH_EVERY cases to keep the session small
+FLUSH_EVERY = 50
+
+
+class Generator:
+    """Deterministic dataset, same seed and sizes give the same rows"""
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+
+    def uuid(self):
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def date(self, max_days=365):
+        return BASE_DATE + datetime.timedelta(days=self.rng.randrange(max_days), minutes=self.rng.randrange(1440))
+
+    def create_reference(self):
+        """Tlp taxonomy and a galaxy with NB_CLUSTERS clusters"""
+        taxonomy = Taxonomy(name="tlp", description="Traffic Light Protocol", exclude=False)
+        galaxy = Galaxy(name="Bench Actor", uuid=self.uuid(), version=1, description="Benchmark galaxy",
+                        icon="user-secret", type="bench-actor", exclude=False)
+        db.session.add_all([taxonomy, galaxy])
+        db.session.flush()
+        tags = [Tags(name=name, color="#ffc000", exclude=False, taxonomy_id=taxonomy.id) for name in TAGS]
+        clusters = [Cluster(name=f"Actor {i}", uuid=self.uuid(), version=1, description="Benchmark cluster",
+                            tag=f'misp-galaxy:bench-actor="Actor {i}"', exclude=False, galaxy_id=galaxy.id)
+                    for i in range(NB_CLUSTERS)]
+        db.session.add_all(tags + clusters)
+        db.session.flush()
+        return [tag.id for tag in tags], [cluster.id for cluster in clusters]
+
+    def create_orgs_users(self, nb_orgs, nb_users):
+        orgs = [Org(name=f"Bench org {i}", description="Benchmark org", uuid=self.uuid(), default_org=False)
+                for i in range(nb_orgs)]
+        db.session.add_all(orgs)
+        db.session.flush()
+        # Hash of an unusable password, hashing a real one for each user is too slow
+        users = [User(first_name=f"user{i}", last_name="bench", email=f"user{i}@bench.local",
+                      role_id=2, password_hash="!", api_key=f"bench_api_key_{i}", org_id=orgs[i % nb_orgs].id)
+                 for i in range(nb_users)]
+        db.session.add_all(users)
+        db.session.flush()
+        return [org.id for org in orgs], [user.id for user in users]
+
+    def create_case(self, index, nb_tasks, owner, orgs_id, users_id, tags_id, clusters_id):
+        creation_date = self.date()
+        case = Case(title=f"Bench case {index}", description=f"Synthetic case {index}", uuid=self.uuid(),
+                    creation_date=creation_date, last_modif=creation_date, status_id=self.rng.choice([1, 2]),
+                    owner_org_id=owner.org_id, nb_tasks=nb_tasks, completed=False)
+        db.session.add(case)
+        db.session.flush()
+
+        orgs = {owner.org_id, self.rng.choice(orgs_id)}
+        db.session.add_all([Case_Org(case_id=case.id, org_id=org_id) for org_id in orgs])
+        db.session.add_all([Case_Tags(case_id=case.id, tag_id=tag_id) for tag_id in self.rng.sample(tags_id, 2)])
+        db.session.add(Case_Galaxy_Tags(case_id=case.id, cluster_id=self.rng.choice(clusters_id)))
+
+        for order in range(1, nb_tasks + 1):
+            task = Task(title=f"Task {order} of case {index}", description="Synthetic task", uuid=self.uuid(),
+                        creation_date=creation_date, last_modif=creation_date, case_id=case.id,
+                        status_id=1, case_order_id=order, completed=False, nb_notes=1)
+            db.session.add(task)
+            db.session.flush()
+            db.session.add(Note(uuid=self.uuid(), note=f"Note of task {order}", task_id=task.id, task_order_id=1))
+            db.session.add(Task_User(task_id=task.id, user_id=self.rng.choice(users_id)))
+            db.session.add(Task_Tags(task_id=task.id, tag_id=self.rng.choice(tags_id)))
+            db.session.add(Task_Galaxy_Tags(task_id=task.id, cluster_id=self.rng.choice(clusters_id)))
+
+        db.session.add(Notification(message=f"Case '{case.id}-{case.title}' created", is_read=False,
+                                    user_id=self.rng.choice(users_id + [owner.id]), case_id=case.id,
+                                    creation_date=creation_date, html_icon="fa-solid fa-plus"))
+        return case
+
+
+def generate(nb_orgs, nb_users, nb_cases, nb_tasks, seed=0, owner_id=1):
+    """Create orgs, users, cases with tasks, notes, tags, clusters, links and notifications"""
+    generator = Generator(seed)
+    owner = User.query.get(owner_id)
+    tags_id, clusters_id = generator.create_reference()
+    orgs_id, users_id = generator.create_orgs_users(nb_orgs, nb_users)
+
+    cases_id = list()
+    for index in range(nb_cases):
+        case = generator.create_case(index, nb_tasks, owner, orgs_id, users_id, tags_id, clusters_id)
+        cases_id.append(case.id)
+        if index and generator.rng.random() < 0.3:
+            db.session.add(Case_Link_Case(case_id_1=case.id, case_id_2=generator.rng.choice(cases_id[:-1])))
+        if index % FLUSH_EVERY == 0:
+            db.session.flush()
+    db.session.commit()
+    return {"orgs": orgs_id, "users": users_id, "cases": cases_id}
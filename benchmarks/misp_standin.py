@@ -0,0 +1,286 @@
+"""Local stand-in of the MISP endpoints used by the misp_event and misp_event_task modules
+
+    python -m benchmarks.misp_standin --port 8443 --latency 0.05 --error_rate 0.01
+
+Events are kept in memory. Latency, server errors and hanging requests can be injected
+to exercise the connectors offline.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pymisp
+
+
+MISP_VERSION = "2.4.190"
+API_KEY = "standin_api_key"
+DESCRIBE_TYPES = os.path.join(os.path.dirname(pymisp.__file__), "data", "describeTypes.json")
+
+
+class MispStandin:
+    """In memory events, objects and event reports"""
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, hang_rate=0.0, hang=30.0, seed=0, api_key=API_KEY):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang = hang
+        self.api_key = api_key
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.events = dict()
+        self.objects = dict()
+        self.reports = dict()
+        self.next_id = Counter()
+        self.calls = Counter()
+        self.errors = Counter()
+
+    def _id(self, kind):
+        self.next_id[kind] += 1
+        return str(self.next_id[kind])
+
+    def _resolve(self, table, key):
+        """Id of a row given by id or uuid, like MISP does"""
+        key = str(key)
+        if key in table:
+            return key
+        for row_id, row in table.items():
+            if row.get("uuid") == key:
+                return row_id
+        return None
+
+    def _objects(self, event_id, objects):
+        """Give an id to the new objects and attributes of an event"""
+        out = list()
+        for misp_object in objects:
+            misp_object = dict(misp_object)
+            misp_object["id"] = str(misp_object.get("id") or self._id("object"))
+            misp_object.setdefault("uuid", str(uuid.uuid4()))
+            misp_object["event_id"] = event_id
+            attributes = list()
+            for attribute in misp_object.get("Attribute", []):
+                attribute = dict(attribute)
+                attribute["id"] = str(attribute.get("id") or self._id("attribute"))
+                attribute.setdefault("uuid", str(uuid.uuid4()))
+                attribute["event_id"] = event_id
+                attribute["object_id"] = misp_object["id"]
+                attributes.append(attribute)
+            misp_object["Attribute"] = attributes
+            self.objects[misp_object["id"]] = misp_object
+            out.append(misp_object)
+        return out
+
+    def save_event(self, body, event_id=None):
+        event = dict(body.get("Event", body))
+        with self.lock:
+            if event_id is None:
+                event_id = self._id("event")
+            else:
+                event_id = self._resolve(self.events, event_id)
+                if event_id is None:
+                    return None
+            old = self.events.get(event_id, {})
+            event["id"] = event_id
+            event.setdefault("uuid", old.get("uuid", str(uuid.uuid4())))
+            event.setdefault("date", time.strftime("%Y-%m-%d"))
+            event["timestamp"] = str(int(time.time()))
+            event["Object"] = self._objects(event_id, event.get("Object", []))
+            event["EventReport"] = [self.reports[report_id] for report_id in old.get("report_ids", [])]
+            event["report_ids"] = old.get("report_ids", [])
+            self.events[event_id] = event
+        return self.get_event(event_id)
+
+    def get_event(self, event_id):
+        with self.lock:
+            event_id = self._resolve(self.events, event_id)
+            if event_id is None:
+                return None
+            event = dict(self.events[event_id])
+            event["EventReport"] = [self.reports[report_id] for report_id in event.pop("report_ids")]
+        return {"Event": event}
+
+    def save_object(self, body, event_id=None, object_id=None):
+        misp_object = dict(body.get("Object", body))
+        with self.lock:
+            if object_id is not None:
+                object_id = self._resolve(self.objects, object_id)
+                if object_id is None:
+                    return None
+                misp_object["id"] = object_id
+                event_id = self.objects[object_id]["event_id"]
+            event_id = self._resolve(self.events, event_id)
+            if event_id is None:
+                return None
+            misp_object = self._objects(event_id, [misp_object])[0]
+            objects = [loc for loc in self.events[event_id]["Object"] if loc["id"] != misp_object["id"]]
+            self.events[event_id]["Object"] = objects + [misp_object]
+        return {"Object": misp_object}
+
+    def save_report(self, body, event_id=None, report_id=None):
+        report = dict(body.get("EventReport", body))
+        with self.lock:
+            if report_id is not None:
+                report_id = self._resolve(self.reports, report_id)
+                if report_id is None:
+                    return None
+                report = dict(self.reports[report_id], **dict(report, id=report_id))
+            else:
+                event_id = self._resolve(self.events, event_id)
+                if event_id is None:
+                    return None
+                report["id"] = self._id("report")
+                report["event_id"] = event_id
+                self.events[event_id]["report_ids"].append(report["id"])
+            report.setdefault("uuid", str(uuid.uuid4()))
+            self.reports[report["id"]] = report
+        return {"EventReport": report}
+
+    def inject(self, route):
+        """Wait the configured latency, return an error status to send if one is injected"""
+        with self.lock:
+            self.calls[route] += 1
+            draw = self.rng.random()
+            delay = self.latency + self.rng.uniform(0, self.jitter)
+        if draw < self.hang_rate:
+            time.sleep(self.hang)
+            with self.lock:
+                self.errors["hang"] += 1
+            return 504
+        time.sleep(delay)
+        if draw < self.hang_rate + self.error_rate:
+            with self.lock:
+                self.errors["server"] += 1
+            return 500
+        return None
+
+    def stats(self):
+        with self.lock:
+            return {"calls": dict(self.calls), "errors": dict(self.errors), "events": len(self.events)}
+
+
+ROUTES = [
+    ("GET", r"servers/getVersion(\.json)?", "version"),
+    ("GET", r"users/view/me(\.json)?", "user"),
+    ("GET", r"attributes/describeTypes(\.json)?", "describe_types"),
+    ("GET", r"events/view/(?P<event_id>[^/]+)", "get_event"),
+    ("POST", r"events/view/(?P<event_id>[^/]+)", "get_event"),
+    ("POST", r"events/add(/metadata:1)?", "add_event"),
+    ("POST", r"events/edit/(?P<event_id>[^/]+?)(/metadata:1)?", "update_event"),
+    ("POST", r"objects/add/(?P<event_id>[^/]+)", "add_object"),
+    ("POST", r"objects/edit/(?P<object_id>[^/]+)", "update_object"),
+    ("POST", r"eventReports/add/(?P<event_id>[^/]+)", "add_event_report"),
+    ("POST", r"eventReports/edit/(?P<report_id>[^/]+)", "update_event_report")
+]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are sent separately, without it each response waits for a delayed ack
+    disable_nagle_algorithm = True
+    standin = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self, method):
+        path = self.path.split("?")[0].strip("/")
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+        if self.headers.get("Authorization") != self.standin.api_key:
+            return self._send(403, {"name": "Authentication failed", "message": "Authentication failed", "url": self.path})
+
+        for route_method, pattern, route in ROUTES:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                break
+        else:
+            return self._send(404, {"name": "Not Found", "message": "Not Found", "url": self.path})
+
+        status = self.standin.inject(route)
+        if status:
+            return self._send(status, {"name": "Injected error", "message": "Injected error", "url": self.path})
+
+        args = {key: value for key, value in match.groupdict().items() if value is not None}
+        if route == "version":
+            result = {"version": MISP_VERSION, "pymisp_recommended_version": pymisp.__version__}
+        elif route == "user":
+            result = {"User": {"id": "1", "email": "admin@standin.local", "org_id": "1", "role_id": "1"},
+                      "Role": {"id": "1", "name": "admin", "perm_admin": True}, "UserSetting": {}}
+        elif route == "describe_types":
+            with open(DESCRIBE_TYPES) as read_file:
+                result = json.load(read_file)
+        elif route == "get_event":
+            result = self.standin.get_event(args["event_id"])
+        elif route == "add_event":
+            result = self.standin.save_event(body)
+        elif route == "update_event":
+            result = self.standin.save_event(body, args["event_id"])
+        elif route == "add_object":
+            result = self.standin.save_object(body, event_id=args["event_id"])
+        elif route == "update_object":
+            result = self.standin.save_object(body, object_id=args["object_id"])
+        elif route == "add_event_report":
+            result = self.standin.save_report(body, event_id=args["event_id"])
+        else:
+            result = self.standin.save_report(body, report_id=args["report_id"])
+
+        if result is None:
+            return self._send(404, {"name": "Invalid id", "message": "Invalid id", "url": self.path})
+        self._send(200, result)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+
+def start(host="127.0.0.1", port=0, **options):
+    """Run a stand-in in a thread, return (server, standin, url). Stop it with server.shutdown()"""
+    standin = MispStandin(**options)
+    handler = type("StandinHandler", (Handler,), {"standin": standin})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, standin, f"http://{host}:{server.server_address[1]}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local MISP stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--api_key", default=API_KEY)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to each request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random seconds added to the latency")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Part of the requests answered with a 500")
+    parser.add_argument("--hang_rate", type=float, default=0.0, help="Part of the requests waiting --hang seconds")
+    parser.add_argument("--hang", type=float, default=30.0)
+    args = parser.parse_args(argv)
+
+    server, _, url = start(args.host, args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                           hang_rate=args.hang_rate, hang=args.hang, api_key=args.api_key)
+    print(f"MISP stand-in listening on {url}, api key: {args.api_key}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
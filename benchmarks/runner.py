@@ -0,0 +1,209 @@
+"""Time key endpoints on synthetic datasets of several sizes
+
+    python -m benchmarks.runner --sizes 10,100 --repeat 5 --output bench.json
+    python -m benchmarks.runner --compare old.json new.json
+
+The testing database is dropped and recreated for each size.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+sys.path.append(os.getcwd())
+os.environ["FLASKENV"] = "testing"
+os.environ.setdefault("HISTORY_DIR", tempfile.mkdtemp(prefix="flowintel-bench-"))
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.utils.init_db import create_user_test
+from benchmarks.dataset import generate
+
+
+API_HEADERS = {"X-API-KEY": "admin_api_key"}
+# Admin user created by create_user_test
+USER_ID = 1
+
+
+def _case_list(client, data, i):
+    return client.get("/case/sort_by_ongoing")
+
+def _case_list_api(client, data, i):
+    return client.get("/api/case/all", headers=API_HEADERS)
+
+def _case_view(client, data, i):
+    return client.get(f"/case/{data['cases'][0]}/get_case_info")
+
+def _task_list(client, data, i):
+    return client.get(f"/case/{data['cases'][0]}/sort_by_ongoing_task")
+
+def _dashboard(client, data, i):
+    return client.get("/")
+
+def _notification_count(client, data, i):
+    return client.get("/notification/get_user_notifications_len")
+
+def _search(client, data, i):
+    return client.get("/case/search?text=Bench case 1")
+
+def _import(client, data, i):
+    case = dict(data["export"], title=f"Imported case {i}")
+    return client.post("/api/importer/", json=case, headers=API_HEADERS)
+
+def _fork(client, data, i):
+    return client.post(f"/case/{data['cases'][0]}/fork", json={"case_title_fork": f"Forked case {i}"})
+
+def _delete(client, data, i):
+    # A different case each time, never the one used by the other benchmarks
+    return client.get(f"/case/{data['cases'][-(i + 1)]}/delete")
+
+
+# Destructive benchmarks run last
+BENCHMARKS = {
+    "case_list": _case_list,
+    "case_list_api": _case_list_api,
+    "case_view": _case_view,
+    "task_list": _task_list,
+    "dashboard": _dashboard,
+    "notification_count": _notification_count,
+    "search": _search,
+    "import": _import,
+    "fork": _fork,
+    "delete": _delete
+}
+
+
+def importable(case):
+    """Download of a case in the format of the importer, clusters are given by name"""
+    for loc in [case] + case["tasks"]:
+        loc.setdefault("custom_tags", [])
+        loc["clusters"] = [cluster["name"] if isinstance(cluster, dict) else cluster for cluster in loc.get("clusters", [])]
+    return case
+
+
+class QueryCounter:
+    """Number of statements sent to the engine"""
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "after_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def prepare(app, nb_cases, nb_tasks, nb_orgs, nb_users, seed):
+    """Recreate the testing db with a synthetic dataset"""
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        create_user_test()
+        data = generate(nb_orgs, nb_users, nb_cases, nb_tasks, seed=seed, owner_id=USER_ID)
+    return data
+
+
+def run_size(nb_cases, nb_tasks, nb_orgs, nb_users, repeat, seed=0, names=None):
+    """Time each benchmark repeat times on a dataset of nb_cases cases"""
+    app = create_app()
+    app.config.update({"TESTING": True, "SERVER_NAME": f"{app.config.get('FLASK_URL')}:{app.config.get('FLASK_PORT')}"})
+    data = prepare(app, nb_cases, nb_tasks, nb_orgs, nb_users, seed)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(USER_ID)
+        session["_fresh"] = True
+    data["export"] = importable(json.loads(client.get(f"/case/{data['cases'][0]}/download").get_data(as_text=True)))
+
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+
+    results = list()
+    for name, benchmark in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        timings, statuses, queries = list(), set(), list()
+        for i in range(repeat):
+            before = counter.count
+            start = time.perf_counter()
+            response = benchmark(client, data, i)
+            timings.append((time.perf_counter() - start) * 1000)
+            queries.append(counter.count - before)
+            statuses.add(response.status_code)
+        timings.sort()
+        results.append({
+            "benchmark": name,
+            "cases": nb_cases,
+            "tasks_per_case": nb_tasks,
+            "repeat": repeat,
+            "min_ms": round(timings[0], 2),
+            "median_ms": round(statistics.median(timings), 2),
+            "max_ms": round(timings[-1], 2),
+            "queries": max(queries),
+            "status": sorted(statuses)
+        })
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path, new_path):
+    """Print the median ratio between two result files"""
+    with open(old_path) as read_file:
+        old = {(loc["benchmark"], loc["cases"]): loc for loc in json.load(read_file)["results"]}
+    with open(new_path) as read_file:
+        new = json.load(read_file)["results"]
+    for loc in new:
+        before = old.get((loc["benchmark"], loc["cases"]))
+        if before:
+            ratio = loc["median_ms"] / before["median_ms"] if before["median_ms"] else 0
+            print(f"{loc['benchmark']:<20} {loc['cases']:>6} cases  {before['median_ms']:>9} -> {loc['median_ms']:>9} ms  x{ratio:.2f}  queries {before['queries']} -> {loc['queries']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark flowintel endpoints on synthetic data")
+    parser.add_argument("--sizes", default="10,100", help="Number of cases of each dataset, comma separated")
+    parser.add_argument("--tasks", type=int, default=5, help="Number of tasks per case")
+    parser.add_argument("--orgs", type=int, default=5, help="Number of orgs")
+    parser.add_argument("--users", type=int, default=20, help="Number of users")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of times each endpoint is called")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", help="Benchmarks to run, comma separated")
+    parser.add_argument("--output", help="Json file of the results, printed if not given")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    names = args.only.split(",") if args.only else None
+    results = list()
+    for size in [int(size) for size in args.sizes.split(",")]:
+        # Delete benchmark needs one case per repeat besides the first one
+        results += run_size(max(size, args.repeat + 1), args.tasks, args.orgs, args.users, args.repeat, args.seed, names)
+
+    output = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w") as write_file:
+            json.dump(output, write_file, indent=2)
+    else:
+        print(json.dumps(output, indent=2))
+
+
+if __name__ == "__main__":
+    main()
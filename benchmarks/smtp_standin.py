@@ -0,0 +1,170 @@
+"""Local stand-in of an SMTP server for the email module
+
+    python -m benchmarks.smtp_standin --port 8025 --latency 0.05 --error_rate 0.1
+
+Messages are kept in memory. Latency and temporary failures can be injected
+to exercise the mail worker offline. STARTTLS is not offered.
+"""
+import time
+import base64
+import random
+import argparse
+import threading
+from collections import Counter
+from email import message_from_bytes
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+
+
+USER = "flowintel@standin.local"
+PASSWORD = "standin_password"
+
+
+class SmtpStandin:
+    """Received messages and counters"""
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0, user=USER, password=PASSWORD):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.user = user
+        self.password = password
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.messages = list()
+        self.counts = Counter()
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def fail(self):
+        """Wait the configured latency, True if a temporary failure is injected"""
+        time.sleep(self.latency)
+        with self.lock:
+            return self.rng.random() < self.error_rate
+
+    def add(self, sender, recipients, data):
+        message = message_from_bytes(data)
+        with self.lock:
+            self.messages.append({"from": sender, "to": list(recipients), "subject": message["Subject"], "message": message})
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts, messages=len(self.messages))
+
+
+class Handler(StreamRequestHandler):
+    standin = None
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def read_line(self):
+        return self.rfile.readline().decode(errors="replace").rstrip("\r\n")
+
+    def read_data(self):
+        lines = list()
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b".\r\n", b".\n"):
+                break
+            lines.append(line[1:] if line.startswith(b"..") else line)
+        return b"".join(lines)
+
+    def authenticate(self, args):
+        if args[0].upper() == "PLAIN":
+            if len(args) > 1:
+                credentials = args[1]
+            else:
+                self.reply("334 ")
+                credentials = self.read_line()
+            _, user, password = base64.b64decode(credentials).decode().split("\0")
+        else:
+            self.reply("334 " + base64.b64encode(b"Username:").decode())
+            user = base64.b64decode(self.read_line()).decode()
+            self.reply("334 " + base64.b64encode(b"Password:").decode())
+            password = base64.b64decode(self.read_line()).decode()
+        return user == self.standin.user and password == self.standin.password
+
+    def handle(self):
+        standin = self.standin
+        standin.count("sessions")
+        self.reply("220 standin ESMTP")
+        sender, recipients, authenticated = None, list(), False
+        while True:
+            line = self.read_line()
+            if not line:
+                return
+            command, _, arg = line.partition(" ")
+            command = command.upper()
+            if command in ("EHLO", "HELO"):
+                self.reply("250-standin")
+                self.reply("250-AUTH PLAIN LOGIN")
+                self.reply("250 8BITMIME")
+            elif command == "AUTH":
+                if self.authenticate(arg.split()):
+                    authenticated = True
+                    standin.count("logins")
+                    self.reply("235 Authentication successful")
+                else:
+                    self.reply("535 Authentication failed")
+            elif command == "MAIL":
+                if not authenticated:
+                    self.reply("530 Authentication required")
+                    continue
+                sender, recipients = arg.split(":", 1)[1].strip("<> "), list()
+                self.reply("250 OK")
+            elif command == "RCPT":
+                recipients.append(arg.split(":", 1)[1].strip("<> "))
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = self.read_data()
+                if standin.fail():
+                    standin.count("errors")
+                    self.reply("451 Injected temporary failure")
+                else:
+                    standin.add(sender, recipients, data)
+                    self.reply("250 OK")
+            elif command == "RSET":
+                sender, recipients = None, list()
+                self.reply("250 OK")
+            elif command == "NOOP":
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+def start(host="127.0.0.1", port=0, **options):
+    """Run a stand-in in a thread, return (server, standin, port). Stop it with server.shutdown()"""
+    standin = SmtpStandin(**options)
+    handler = type("StandinHandler", (Handler,), {"standin": standin})
+    server = ThreadingTCPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, standin, server.server_address[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local SMTP stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--user", default=USER)
+    parser.add_argument("--password", default=PASSWORD)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to each message")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Part of the messages answered with a 451")
+    args = parser.parse_args(argv)
+
+    server, standin, port = start(args.host, args.port, latency=args.latency, error_rate=args.error_rate,
+                                  user=args.user, password=args.password)
+    print(f"SMTP stand-in listening on {args.host}:{port}, user: {args.user}, password: {args.password}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(standin.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,18 @@ class Config:
     SESSION_TYPE = "sqlalchemy"
     SESSION_SQLALCHEMY_TABLE = "flask_sessions"
 
+    # Per request query profiler, opt-in
+    QUERY_PROFILER = False
+    QUERY_PROFILER_SLOW_REQUEST_MS = 500
+    QUERY_PROFILER_SLOW_QUERY_MS = 100
+    # Json lines file where every profiled request is written, optional
+    QUERY_PROFILER_LOG = None
+
+    # Modules run on several connector instances at once
+    MODULE_WORKERS = 8
+    # Seconds given to each instance before it's reported in error
+    MODULE_INSTANCE_TIMEOUT = 60
+
 
 class DevelopmentConfig(Config):
     DEBUG = True
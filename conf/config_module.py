@@ -5,9 +5,17 @@ SMTP_SERVER = ""
 SMTP_PORT = 587  # Port TLS
 SENDER_EMAIL = ""
 SENDER_PASSOWRD = ""
+SMTP_STARTTLS = True
+SMTP_TIMEOUT = 10
+SMTP_DIGEST_WINDOW = 60  # Seconds notifications to a same user are gathered in one mail
 
 # Matrix bot
 MATRIX_SERVER = ""
 MATRIX_USER = ""
 MATRIX_PASSWORD = ""
 MATRIX_ROOM_ID = ""
+
+# Connectors
+CONNECTOR_VERIFY_TLS = False  # Verify the certificate of the instances, or path to a CA bundle
+CONNECTOR_TIMEOUT = 20
+CONNECTOR_IDLE_TIMEOUT = 300  # Seconds before an unused connection to an instance is closed
@@ -0,0 +1,32 @@
+"""empty message
+
+Revision ID: c4d81e6f2a95
+Revises: 6b2e9f4a7c31
+Create Date: 2026-10-19 19:10:33.284615
+
+"""
+import uuid
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d81e6f2a95'
+down_revision = '6b2e9f4a7c31'
+branch_labels = None
+depends_on = None
+
+
+change_counter = sa.table('change__counter',
+    sa.column('name', sa.String),
+    sa.column('uuid', sa.String),
+    sa.column('value', sa.Integer)
+)
+
+
+def upgrade():
+    op.bulk_insert(change_counter, [{"name": "case_links", "uuid": str(uuid.uuid4()), "value": 0}])
+
+
+def downgrade():
+    op.execute(change_counter.delete().where(change_counter.c.name == "case_links"))
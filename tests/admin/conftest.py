@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture
+def default_query_budget():
+    """Statements allowed per request in the admin tests"""
+    return 15
@@ -0,0 +1,21 @@
+import pytest
+from benchmarks.dataset import generate
+
+API_KEY = "admin_api_key"
+
+
+@pytest.fixture
+def dataset(app):
+    with app.app_context():
+        generate(nb_orgs=10, nb_users=20, nb_cases=1, nb_tasks=1)
+
+
+@pytest.mark.query_budget(2)
+def test_list_users_budget(client, dataset):
+    response = client.get("/api/admin/users", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200 and len(response.json["users"]) == 23
+
+@pytest.mark.query_budget(2)
+def test_list_orgs_budget(client, dataset):
+    response = client.get("/api/admin/orgs", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200 and len(response.json["orgs"]) == 13
@@ -0,0 +1,39 @@
+import json
+from sqlalchemy import event
+from app import db
+from app.utils import profiler as Profiler
+
+
+def enable_profiler(app, log_file=None):
+    app.config.update({"QUERY_PROFILER": True, "QUERY_PROFILER_SLOW_REQUEST_MS": 0, "QUERY_PROFILER_LOG": log_file})
+    Profiler.init_app(app, db)
+
+
+def test_profiler_report(client, app, tmp_path):
+    log_file = str(tmp_path / "profiler.jsonl")
+    enable_profiler(app, log_file)
+    for _ in range(3):
+        response = client.get("/api/case/all", headers={"X-API-KEY": "admin_api_key"})
+        assert response.status_code == 200
+
+    report = Profiler.get_report(app)
+    assert [loc["endpoint"] for loc in report] == ["GET /api/case/all"]
+    assert report[0]["count"] == 3 and report[0]["queries_max"] > 0
+
+    with open(log_file) as read_file:
+        records = [json.loads(line) for line in read_file]
+    requests = [record for record in records if record["event"] == "request"]
+    assert len(requests) == 3 and all(record["slow"] for record in requests)
+    assert Profiler.report_from_file(log_file)[0]["count"] == 3
+
+def test_profiler_duplicates():
+    profile = Profiler.RequestProfile()
+    for statement in ["SELECT 1", "SELECT 2", "SELECT 2", "SELECT 2"]:
+        profile.add(statement, 1)
+    assert profile.nb_duplicates() == 2 and profile.duplicates() == [("SELECT 2", 3)]
+    assert Profiler.percentile([1, 2, 3, 4], 50) == 2 and Profiler.percentile([1, 2, 3, 4], 99) == 4
+
+def test_profiler_disabled(app):
+    with app.app_context():
+        assert not Profiler.is_enabled(app)
+        assert not event.contains(db.engine, "before_cursor_execute", Profiler._before_cursor_execute)
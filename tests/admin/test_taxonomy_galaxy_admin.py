@@ -0,0 +1,45 @@
+from app import db
+from app.db_class.db import Taxonomy, Tags, Galaxy, Cluster
+from app.admin import admin_core as AdminModel
+
+
+def create_taxonomies(nb):
+    for i in range(nb):
+        taxo = Taxonomy(name=f"taxo-{i:02d}", description="test", exclude=False)
+        db.session.add(taxo)
+        db.session.flush()
+        for j in range(i % 3):
+            db.session.add(Tags(name=f"taxo-{i:02d}:tag-{j}", taxonomy_id=taxo.id))
+    db.session.commit()
+
+def create_galaxies(nb):
+    for i in range(nb):
+        galaxy = Galaxy(name=f"galaxy-{i:02d}", description="test", exclude=False)
+        db.session.add(galaxy)
+        db.session.flush()
+        for j in range(i % 4):
+            db.session.add(Cluster(name=f"cluster-{i}-{j}", galaxy_id=galaxy.id))
+    db.session.commit()
+
+
+def test_taxonomies_last_page(app):
+    with app.app_context():
+        create_taxonomies(30)
+        taxonomies, nb_pages = AdminModel.get_taxonomies_page(2)
+        assert nb_pages == 2 and [taxo["name"] for taxo in taxonomies] == [f"taxo-{i}" for i in range(25, 30)]
+        assert [taxo["nb_tags"] for taxo in taxonomies] == [i % 3 for i in range(25, 30)]
+
+def test_taxonomies_search(app):
+    with app.app_context():
+        create_taxonomies(30)
+        taxonomies, nb_pages = AdminModel.get_taxonomies_page(1, "taxo-1")
+        assert nb_pages == 1 and len(taxonomies) == 10
+        assert AdminModel.get_nb_page_taxo() == 2 and AdminModel.get_nb_page_taxo("nothing") == 1
+
+def test_galaxies_page(app):
+    with app.app_context():
+        create_galaxies(26)
+        galaxies, nb_pages = AdminModel.get_galaxies_page(2)
+        assert nb_pages == 2 and len(galaxies) == 1 and galaxies[0]["nb_clusters"] == 25 % 4
+        galaxies, nb_pages = AdminModel.get_galaxies_page(1, "GALAXY-2")
+        assert len(galaxies) == 6
@@ -1,4 +1,11 @@
+import io
+import json
+import tarfile
 from flask import url_for
+from sqlalchemy import update
+from app import db
+from app.case import case_core as CaseModel
+from app.db_class.db import User, Notification, Task, Task_User, Case_Org, Case
 
 API_KEY = "admin_api_key"
 
@@ -74,6 +81,24 @@ def test_complete_case(client):
     response = client.get("/api/case/1/complete", headers={"X-API-KEY": API_KEY})
     assert response.status_code == 200 and b"Case 1 completed" in response.data
 
+def test_complete_case_with_tasks(client, app):
+    test_create_task(client)
+    test_create_task(client, flag=False, multiple=True)
+    with app.app_context():
+        editor_id = User.query.filter_by(email="editor@editor.editor").first().id
+    client.post("/api/task/1/assign_users", headers={"X-API-KEY": API_KEY}, json={"users_id": [editor_id]})
+    client.post("/api/task/2/assign_users", headers={"X-API-KEY": API_KEY}, json={"users_id": [editor_id]})
+
+    response = client.get("/api/case/1/complete", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200 and b"Case 1 completed" in response.data
+    for tid in [1, 2]:
+        task = client.get(f"/api/task/{tid}", headers={"X-API-KEY": API_KEY}).json["task"]
+        assert task["completed"] and task["case_order_id"] == -1
+
+    with app.app_context():
+        notifs = Notification.query.filter_by(user_id=editor_id).filter(Notification.message.like("%completed%")).all()
+        assert len(notifs) == 1 and "2 of your tasks completed" in notifs[0].message
+
 def test_create_template(client):
     test_create_case(client)
     response = client.post("/api/case/1/create_template", headers={"X-API-KEY": API_KEY},
@@ -214,6 +239,19 @@ def test_delete_case(client):
     response = client.get("/api/case/1/delete", headers={"X-API-KEY": API_KEY})
     assert response.status_code == 200 and b"Case deleted" in response.data
 
+def test_delete_case_with_tasks(client, app):
+    test_create_task(client)
+    test_create_task(client, flag=False, multiple=True)
+    client.post("/api/task/1/assign_users", headers={"X-API-KEY": API_KEY}, json={"users_id": [2]})
+
+    response = client.get("/api/case/1/delete", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200 and b"Case deleted" in response.data
+
+    response = client.get("/api/task/1", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 404
+    with app.app_context():
+        assert not Task.query.count() and not Task_User.query.count() and not Case_Org.query.count()
+
 
 
 ##########
@@ -379,6 +417,29 @@ def test_move_task_down(client):
     response = client.get("/api/task/1", headers={"X-API-KEY": API_KEY})
     assert response.status_code == 200 and response.json["task"]["case_order_id"] == 2
 
+def test_reorder_tasks(client):
+    test_create_task(client)
+    for _ in range(2):
+        client.post("/api/case/1/create_task", headers={"X-API-KEY": API_KEY}, json={"title": "Test task admin"})
+    response = client.post("/api/case/1/reorder_tasks", headers={"X-API-KEY": API_KEY}, json={"tasks": [3, 1, 2]})
+    assert response.status_code == 200 and b"Order changed" in response.data
+
+    orders = [client.get(f"/api/task/{tid}", headers={"X-API-KEY": API_KEY}).json["task"]["case_order_id"] for tid in [1, 2, 3]]
+    assert orders == [2, 3, 1]
+
+    response = client.post("/api/case/1/reorder_tasks", headers={"X-API-KEY": API_KEY}, json={"tasks": [3, 1]})
+    assert response.status_code == 400
+
+def test_complete_task_order(client):
+    test_create_task(client)
+    for _ in range(2):
+        client.post("/api/case/1/create_task", headers={"X-API-KEY": API_KEY}, json={"title": "Test task admin"})
+    response = client.get("/api/task/2/complete", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200
+
+    orders = [client.get(f"/api/task/{tid}", headers={"X-API-KEY": API_KEY}).json["task"]["case_order_id"] for tid in [1, 2, 3]]
+    assert orders == [1, -1, 2]
+
 
 def test_get_all_notes(client):
     test_modif_note(client)
@@ -409,4 +470,177 @@ def test_fork_case(client):
     assert response.status_code == 201
 
     response = client.get("/api/case/2", headers={"X-API-KEY": API_KEY})
-    assert response.status_code == 200 and response.json["title"] == "Test fork case"
\ No newline at end of file
+    assert response.status_code == 200 and response.json["title"] == "Test fork case"
+def test_export_cases_ndjson(client):
+    test_create_task(client)
+    response = client.get("/api/case/export", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200
+    lines = response.data.decode().splitlines()
+    assert len(lines) == 1 and json.loads(lines[0])["tasks"][0]["title"] == "Test task admin"
+
+def test_export_cases_filter_completed(client):
+    test_create_case(client)
+    response = client.get("/api/case/export?completed=true", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200 and response.data == b""
+
+def test_export_cases_tar(client):
+    test_create_case(client)
+    response = client.get("/api/case/export?format=tar", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200
+    with tarfile.open(fileobj=io.BytesIO(response.data), mode="r:gz") as tar:
+        assert len([m for m in tar.getnames() if m.startswith("cases/")]) == 1
+
+def test_export_cases_wrong_date(client):
+    response = client.get("/api/case/export?date_from=2023/09/30", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 400 and b"date_from bad format" in response.data
+
+def test_get_all_cases_cursor(client):
+    test_create_case(client)
+    client.post("/api/case/create", headers={"X-API-KEY": API_KEY}, json={"title": "Test Case admin 2"})
+    response = client.get("/api/case/all?limit=1&fields=id,title", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200 and response.json["cases"] == [{"id": 2, "title": "Test Case admin 2"}]
+
+    response = client.get(f"/api/case/all?limit=1&fields=id&cursor={response.json['next_cursor']}", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200 and response.json["cases"] == [{"id": 1}] and response.json["next_cursor"] is None
+
+def test_get_all_cases_cursor_empty_last_modif(client, app):
+    for i in range(4):
+        client.post("/api/case/create", headers={"X-API-KEY": API_KEY}, json={"title": f"Test Case cursor {i}"})
+    with app.app_context():
+        db.session.execute(update(Case).where(Case.id.in_([1, 3])).values(last_modif=None))
+        db.session.commit()
+
+    ids, cursor = list(), ""
+    while cursor is not None:
+        response = client.get(f"/api/case/all?limit=1&fields=id&cursor={cursor}", headers={"X-API-KEY": API_KEY})
+        assert response.status_code == 200
+        ids.extend(case["id"] for case in response.json["cases"])
+        cursor = response.json["next_cursor"]
+    # Cases without last_modif come after the others
+    assert ids == [4, 2, 3, 1]
+
+def test_get_all_cases_include(client):
+    test_create_task(client)
+    response = client.get("/api/case/all?fields=id&include=tasks,orgs", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200
+    assert response.json["cases"][0]["tasks"][0]["title"] == "Test task admin" and len(response.json["cases"][0]["orgs"]) == 1
+
+def test_get_all_cases_wrong_field(client):
+    response = client.get("/api/case/all?fields=id,not_a_field", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 400 and b"Unknown fields" in response.data
+
+def test_get_all_tasks_fields(client):
+    test_create_task(client)
+    response = client.get("/api/case/1/tasks?fields=id,title&include=notes", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200 and response.json["tasks"] == [{"id": 1, "title": "Test task admin", "notes": []}]
+
+def test_get_case_not_modified(client):
+    test_create_case(client)
+    response = client.get("/api/case/1", headers={"X-API-KEY": API_KEY})
+    etag = response.headers["ETag"]
+    response = client.get("/api/case/1", headers={"X-API-KEY": API_KEY, "If-None-Match": etag})
+    assert response.status_code == 304 and response.data == b""
+
+    client.post("/api/case/1/modif_case_note", headers={"X-API-KEY": API_KEY}, json={"note": "Test super note"})
+    response = client.get("/api/case/1", headers={"X-API-KEY": API_KEY, "If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["ETag"] != etag
+
+def test_link_changes_linked_case(client, app):
+    test_create_case(client)
+    client.post("/api/case/create", headers={"X-API-KEY": API_KEY}, json={"title": "Test Case admin 2"})
+    etag = client.get("/api/case/2", headers={"X-API-KEY": API_KEY}).headers["ETag"]
+    with app.app_context():
+        assert CaseModel.add_new_link({"case_id": [2]}, 1, User.query.get(1))
+    response = client.get("/api/case/2", headers={"X-API-KEY": API_KEY, "If-None-Match": etag})
+    assert response.status_code == 200 and response.json["link_to"][0]["id"] == 1
+
+    etag = response.headers["ETag"]
+    with app.app_context():
+        assert CaseModel.remove_case_link(1, 2, User.query.get(1))
+    response = client.get("/api/case/2", headers={"X-API-KEY": API_KEY, "If-None-Match": etag})
+    assert response.status_code == 200 and response.json["link_to"] == []
+
+def test_get_task_not_modified(client):
+    test_create_task(client)
+    response = client.get("/api/task/1", headers={"X-API-KEY": API_KEY})
+    response = client.get("/api/task/1", headers={"X-API-KEY": API_KEY, "If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+
+def test_batch_operations(client):
+    test_create_case(client)
+    response = client.post("/api/batch/",
+                           content_type='application/json',
+                           headers={"X-API-KEY": API_KEY},
+                           json={"operations": [
+                               {"op": "create_task", "case_id": 1, "title": "Batch task"},
+                               {"op": "change_status", "task_id": 1, "status_id": 2},
+                               {"op": "assign_users", "task_id": 1, "users_id": [1]},
+                               {"op": "complete", "task_id": 1},
+                               {"op": "change_status", "task_id": 42, "status_id": 2}
+                           ]}
+                        )
+    assert response.status_code == 200
+    results = response.json["results"]
+    assert [r["status"] for r in results] == ["ok", "ok", "ok", "ok", "error"] and results[4]["message"] == "Task not found"
+
+    response = client.get("/api/task/1", headers={"X-API-KEY": API_KEY})
+    assert response.json["task"]["completed"] and response.json["is_current_user_assign"]
+
+def test_batch_no_operations(client):
+    response = client.post("/api/batch/", content_type='application/json', headers={"X-API-KEY": API_KEY}, json={"ops": []})
+    assert response.status_code == 400 and b"Need to pass 'operations'" in response.data
+
+def test_batch_complete_closes_gap(client):
+    test_create_case(client)
+    client.post("/api/batch/", headers={"X-API-KEY": API_KEY},
+                json={"operations": [{"op": "create_task", "case_id": 1, "title": f"Batch task {i}"} for i in range(3)]})
+    etag = client.get("/api/task/3", headers={"X-API-KEY": API_KEY}).headers["ETag"]
+    response = client.post("/api/batch/", headers={"X-API-KEY": API_KEY}, json={"operations": [{"op": "complete", "task_id": 1}]})
+    assert response.status_code == 200
+
+    response = client.get("/api/case/1", headers={"X-API-KEY": API_KEY})
+    assert response.json["nb_tasks"] == 2
+    response = client.get("/api/case/1/tasks", headers={"X-API-KEY": API_KEY})
+    assert [(task["id"], task["case_order_id"]) for task in response.json] == [(2, 1), (3, 2)]
+    # The shifted task has a new version
+    assert client.get("/api/task/3", headers={"X-API-KEY": API_KEY, "If-None-Match": etag}).status_code == 200
+
+    client.post("/api/batch/", headers={"X-API-KEY": API_KEY}, json={"operations": [{"op": "create_task", "case_id": 1, "title": "Next task"}]})
+    response = client.get("/api/case/1/tasks", headers={"X-API-KEY": API_KEY})
+    assert sorted(task["case_order_id"] for task in response.json) == [1, 2, 3]
+
+def test_fork_case_with_tasks(client):
+    test_create_task(client)
+    client.post("/api/task/1/modif_note", headers={"X-API-KEY": API_KEY}, json={"note": "Forked note", "note_id": "-1"})
+    response = client.post("/api/case/1/fork", headers={"X-API-KEY": API_KEY}, json={"case_title_fork": "Test fork case"})
+    assert response.status_code == 201
+
+    response = client.get("/api/case/2/tasks", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200 and response.json[0]["title"] == "Test task admin"
+    assert response.json[0]["notes"][0]["note"] == "Forked note" and response.json[0]["case_order_id"] == 1
+
+def test_create_template_from_case(client):
+    test_create_task(client)
+    response = client.post("/api/case/1/create_template", headers={"X-API-KEY": API_KEY}, json={"title_template": "Template from case"})
+    assert response.status_code == 201
+
+    response = client.post("/api/template/create_case_from_template/1", headers={"X-API-KEY": API_KEY}, json={"title": "Case from template"})
+    assert response.status_code == 201
+    response = client.get("/api/case/2/tasks", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200 and response.json[0]["title"] == "Test task admin"
+
+def test_clone_counts_active_tasks(client):
+    test_create_case(client)
+    client.post("/api/batch/", headers={"X-API-KEY": API_KEY},
+                json={"operations": [{"op": "create_task", "case_id": 1, "title": f"Clone task {i}"} for i in range(3)]})
+    client.post("/api/batch/", headers={"X-API-KEY": API_KEY}, json={"operations": [{"op": "complete", "task_id": 2}]})
+
+    assert client.post("/api/case/1/fork", headers={"X-API-KEY": API_KEY}, json={"case_title_fork": "Fork"}).status_code == 201
+    assert client.get("/api/case/2", headers={"X-API-KEY": API_KEY}).json["nb_tasks"] == 2
+
+    assert client.post("/api/case/1/create_template", headers={"X-API-KEY": API_KEY}, json={"title_template": "Template"}).status_code == 201
+    client.post("/api/template/create_case_from_template/1", headers={"X-API-KEY": API_KEY}, json={"title": "From template"})
+    assert client.get("/api/case/3", headers={"X-API-KEY": API_KEY}).json["nb_tasks"] == 3
+    response = client.get("/api/case/3/tasks", headers={"X-API-KEY": API_KEY})
+    assert [(task["title"], task["case_order_id"]) for task in response.json] == \
+        [("Clone task 0", 1), ("Clone task 2", 2), ("Clone task 1", 3)]
@@ -0,0 +1,43 @@
+from app.db_class.db import User
+from app.case import case_core as CaseModel
+from benchmarks.dataset import generate
+
+API_KEY = "admin_api_key"
+
+
+def create_links(app):
+    """Cycle 0-1-2-3-0 and a separate pair 4-5"""
+    with app.app_context():
+        cases = generate(nb_orgs=1, nb_users=1, nb_cases=6, nb_tasks=0)["cases"]
+        user = User.query.get(1)
+        for case_1, case_2 in [(0, 1), (1, 2), (2, 3), (3, 0), (4, 5)]:
+            assert CaseModel.add_new_link({"case_id": [cases[case_2]]}, cases[case_1], user)
+    return cases
+
+
+def test_graph_depth(client, app):
+    cases = create_links(app)
+    response = client.get(f"/api/case/{cases[0]}/graph", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200
+    assert {node["id"]: node["depth"] for node in response.json["nodes"]} == {cases[0]: 0, cases[1]: 1, cases[3]: 1}
+    assert response.json["edges"] == [[cases[0], cases[1]], [cases[0], cases[3]]]
+
+    response = client.get(f"/api/case/{cases[0]}/graph?depth=2", headers={"X-API-KEY": API_KEY})
+    assert {node["id"]: node["depth"] for node in response.json["nodes"]} == {cases[0]: 0, cases[1]: 1, cases[2]: 2, cases[3]: 1}
+    assert len(response.json["edges"]) == 4 and not response.json["truncated"]
+
+def test_graph_component(client, app):
+    cases = create_links(app)
+    response = client.get(f"/api/case/{cases[4]}/graph?depth=all", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200
+    assert sorted(node["id"] for node in response.json["nodes"]) == [cases[4], cases[5]]
+    assert response.json["edges"] == [[cases[4], cases[5]]]
+
+def test_graph_errors(client, app):
+    cases = create_links(app)
+    response = client.get(f"/api/case/{cases[0]}/graph?depth=100", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 400
+    response = client.get(f"/api/case/{cases[0]}/graph?depth=a", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 400
+    response = client.get("/api/case/1000/graph", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 404
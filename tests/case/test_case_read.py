@@ -291,4 +291,12 @@ def test_move_task_down(client):
 
     response = client.get("/api/task/1", headers={"X-API-KEY": API_KEY})
     assert response.status_code == 200 and response.json["task"]["case_order_id"] == 1
-    
\ No newline at end of file
+    
+def test_batch_operations(client):
+    test_create_case(client)
+    response = client.post("/api/batch/",
+                           content_type='application/json',
+                           headers={"X-API-KEY": API_KEY},
+                           json={"operations": [{"op": "complete", "case_id": 1}]}
+                        )
+    assert response.status_code == 403
@@ -0,0 +1,123 @@
+import os
+import time
+import threading
+import pytest
+from types import SimpleNamespace
+from app.utils.utils import MODULES, get_modules_list
+from benchmarks import smtp_standin
+
+
+@pytest.fixture
+def email(monkeypatch, tmp_path):
+    server, standin, port = smtp_standin.start()
+    get_modules_list()
+    module = MODULES["email"]
+    monkeypatch.setattr(module.Config, "SMTP_SERVER", "127.0.0.1")
+    monkeypatch.setattr(module.Config, "SMTP_PORT", port)
+    monkeypatch.setattr(module.Config, "SMTP_STARTTLS", False)
+    monkeypatch.setattr(module.Config, "SENDER_EMAIL", smtp_standin.USER)
+    monkeypatch.setattr(module.Config, "SENDER_PASSOWRD", smtp_standin.PASSWORD)
+    worker = module.MailWorker(module.Spool(str(tmp_path)), window=0)
+    yield module, worker, standin
+    worker.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_digest_per_recipient(email):
+    module, worker, standin = email
+    for i in range(3):
+        worker.spool.put("a@flowintel.local", module.SUBJECT, f"task {i}")
+    worker.spool.put("b@flowintel.local", module.SUBJECT, "task 3")
+
+    assert worker.drain() == 2
+    assert not worker.spool.load()
+    subjects = {message["to"][0]: message["subject"] for message in standin.messages}
+    assert subjects == {"a@flowintel.local": "flowintel notifications (3)", "b@flowintel.local": module.SUBJECT}
+    # One authenticated session for both mails
+    assert standin.stats()["sessions"] == 1 and standin.stats()["logins"] == 1
+
+def test_digest_window(email):
+    module, worker, standin = email
+    worker.window = 60
+    worker.spool.put("a@flowintel.local", module.SUBJECT, "task")
+    assert worker.drain() == 0
+    assert worker.drain(now=time.time() + 61) == 1
+
+def test_retry_with_backoff(email):
+    module, worker, standin = email
+    standin.error_rate = 1
+    worker.spool.put("a@flowintel.local", module.SUBJECT, "task")
+    now = time.time()
+    assert worker.drain(now) == 0
+    [(_, message)] = worker.spool.load()
+    assert message["attempts"] == 1 and message["next_try"] == now + module.BACKOFF
+
+    standin.error_rate = 0
+    assert worker.drain(now + 1) == 0
+    assert worker.drain(now + module.BACKOFF) == 1
+    assert len(standin.messages) == 1
+
+def test_give_up(email):
+    module, worker, standin = email
+    standin.error_rate = 1
+    worker.spool.put("a@flowintel.local", module.SUBJECT, "task")
+    for attempt in range(module.MAX_ATTEMPTS):
+        worker.drain(time.time() + module.BACKOFF * 2 ** attempt)
+    assert not worker.spool.load()
+    assert len(os.listdir(worker.spool.failed_path)) == 1
+
+def test_handler_not_configured(monkeypatch):
+    get_modules_list()
+    module = MODULES["email"]
+    monkeypatch.setattr(module.Config, "SMTP_SERVER", "")
+    user = SimpleNamespace(first_name="a", last_name="b", email="a@flowintel.local")
+    task = SimpleNamespace(title="task", case_id=1)
+    assert module.handler(task, None, user, user) == {"message": "Email is not configured"}
+
+def test_claimed_message_sent_once(email):
+    module, worker, standin = email
+    worker.spool.put("a@flowintel.local", module.SUBJECT, "task")
+    [(path, _)] = worker.spool.load()
+    # Another process claimed it after this one listed the spool
+    other = module.Spool(worker.spool.path)
+    claimed, _ = other.claim(path)
+    assert other.claim(path) is None
+    assert worker.drain() == 0 and not standin.messages
+
+    other.remove(claimed)
+    other.remove(claimed)
+    assert not os.listdir(worker.spool.processing_path)
+
+def test_recover_stale_claim(email):
+    module, worker, standin = email
+    worker.spool.put("a@flowintel.local", module.SUBJECT, "task")
+    [(path, _)] = worker.spool.load()
+    claimed, _ = worker.spool.claim(path)
+    assert worker.drain() == 0
+    # The process holding the claim stopped before sending
+    old = time.time() - module.CLAIM_TIMEOUT - 1
+    os.utime(claimed, (old, old))
+    assert worker.drain() == 1 and len(standin.messages) == 1
+
+def test_worker_kept_across_reload(email, app, monkeypatch, tmp_path):
+    module, worker, standin = email
+    monkeypatch.setattr(module, "SPOOL_FOLDER", str(tmp_path))
+    with app.app_context():
+        started = module.get_worker()
+        try:
+            MODULES.reload()
+            reloaded = MODULES["email"]
+            # The module is executed again, its globals are new
+            assert type(started) is not reloaded.MailWorker and reloaded.get_worker() is started
+            assert [thread.name for thread in threading.enumerate()].count("mail-delivery") == 1
+        finally:
+            started.stop()
+
+def test_drain_spool(email, monkeypatch, tmp_path):
+    module, worker, standin = email
+    monkeypatch.setattr(module, "SPOOL_FOLDER", str(tmp_path))
+    monkeypatch.setattr(module.Config, "SMTP_DIGEST_WINDOW", 0)
+    worker.spool.put("a@flowintel.local", module.SUBJECT, "task")
+    # Left by a stopped process, sent by the scheduler without a running worker
+    assert module.drain_spool() == 1 and len(standin.messages) == 1
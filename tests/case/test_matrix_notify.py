@@ -0,0 +1,87 @@
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+from app.utils.utils import MODULES, get_modules_list
+
+
+def get_matrix():
+    get_modules_list()
+    return MODULES["matrix"]
+
+
+def test_coalesce():
+    matrix = get_matrix()
+    messages = matrix.coalesce([
+        ("room_a", "first", {"user_ids": ["@a:server"]}),
+        ("room_b", "other", {}),
+        ("room_a", "second", {"user_ids": ["@b:server", "@a:server"]}),
+        ("room_a", "first", {})
+    ])
+    assert messages == [
+        ("room_a", {"msgtype": "m.text", "body": "first\nsecond", "m.mentions": {"user_ids": ["@a:server", "@b:server"]}}),
+        ("room_b", {"msgtype": "m.text", "body": "other", "m.mentions": {}})
+    ]
+
+def test_service_batches_per_room():
+    matrix = get_matrix()
+    delivered = list()
+
+    async def deliver(room_id, content):
+        delivered.append((room_id, content["body"]))
+
+    service = matrix.MatrixService(deliver=deliver, delay=0.2)
+    try:
+        for i in range(3):
+            service.send("room_a", f"task {i}")
+        service.send("room_b", "task 3")
+        for _ in range(50):
+            if service.sent == 2:
+                break
+            time.sleep(0.05)
+        assert sorted(delivered) == [("room_a", "task 0\ntask 1\ntask 2"), ("room_b", "task 3")]
+    finally:
+        service.stop()
+
+def test_service_retries(monkeypatch):
+    matrix = get_matrix()
+    calls = list()
+
+    async def deliver(room_id, content):
+        calls.append(room_id)
+        if len(calls) == 1:
+            raise ConnectionError("homeserver down")
+
+    async def no_wait(delay):
+        pass
+
+    service = matrix.MatrixService(deliver=deliver, delay=0)
+    monkeypatch.setattr(asyncio, "sleep", no_wait)
+    try:
+        service.send("room_a", "task")
+        for _ in range(50):
+            if service.sent == 1:
+                break
+            time.sleep(0.05)
+        assert calls == ["room_a", "room_a"] and service.failed == 0
+    finally:
+        service.stop()
+
+def test_service_kept_across_reload(app):
+    matrix = get_matrix()
+    with app.app_context():
+        started = matrix.get_service()
+        try:
+            MODULES.reload()
+            # The module is executed again, a second service would sync on the same device
+            assert MODULES["matrix"].get_service() is started
+            assert [thread.name for thread in threading.enumerate()].count("matrix-delivery") == 1
+        finally:
+            started.stop()
+            app.extensions.pop("matrix_service")
+
+def test_handler_not_configured():
+    matrix = get_matrix()
+    user = SimpleNamespace(matrix_id=None, first_name="a", last_name="b")
+    task = SimpleNamespace(title="task", case_id=1)
+    assert matrix.handler(task, SimpleNamespace(title="case"), user, user) == {"message": "Matrix is not configured"}
@@ -0,0 +1,196 @@
+import time
+import datetime
+import pytest
+from app import db
+from app.db_class.db import User, Case, Case_Connector_Instance, Connector_Instance, User_Connector_Instance
+from app.utils.utils import get_modules_list
+from app.case import case_core as CaseModel
+from app.case import task_core as TaskModel
+from app.utils.connector_clients import registry
+from benchmarks.dataset import generate
+from benchmarks import misp_standin
+from benchmarks.connectors import create_instance, INSTANCE_NAME
+
+
+@pytest.fixture
+def standin():
+    server, standin, url = misp_standin.start()
+    yield standin, url
+    server.shutdown()
+    server.server_close()
+
+
+def test_push_case(app, standin):
+    standin, url = standin
+    with app.app_context():
+        generate(nb_orgs=1, nb_users=2, nb_cases=1, nb_tasks=2)
+        instance = create_instance(url)
+        user = User.query.get(1)
+        case = Case.query.first()
+        get_modules_list()
+
+        assert not CaseModel.call_module_case("misp_event", {INSTANCE_NAME: None}, case, user)
+        identifier = Case_Connector_Instance.query.filter_by(case_id=case.id, instance_id=instance.id).first().identifier
+        event = standin.get_event(identifier)["Event"]
+        assert sorted(misp_object["name"] for misp_object in event["Object"]) == \
+            ["flowintel-case", "flowintel-task", "flowintel-task", "flowintel-task-note", "flowintel-task-note"]
+
+        # Second push updates the same event
+        case.title = "Renamed case"
+        case.last_modif = datetime.datetime.now(tz=datetime.timezone.utc) + datetime.timedelta(minutes=1)
+        db.session.commit()
+        assert not CaseModel.call_module_case("misp_event", {INSTANCE_NAME: identifier}, case, user)
+        event = standin.get_event(identifier)["Event"]
+        assert len(event["Object"]) == 5 and standin.stats()["events"] == 1
+        titles = [attribute["value"] for misp_object in event["Object"] if misp_object["name"] == "flowintel-case"
+                  for attribute in misp_object["Attribute"] if attribute["object_relation"] == "title"]
+        assert titles == ["Renamed case"]
+
+        assert not TaskModel.call_module_task("misp_event_task", {INSTANCE_NAME: None}, case, case.tasks.first(), user)
+        assert standin.stats()["events"] == 2
+
+def test_push_case_incremental(app, standin):
+    standin, url = standin
+    with app.app_context():
+        generate(nb_orgs=1, nb_users=2, nb_cases=1, nb_tasks=2)
+        instance = create_instance(url)
+        user = User.query.get(1)
+        case = Case.query.first()
+        get_modules_list()
+
+        # Everything was modified before the first push
+        past = datetime.datetime.now(tz=datetime.timezone.utc) - datetime.timedelta(hours=1)
+        case.last_modif = past
+        for task in case.tasks:
+            task.last_modif = past
+        db.session.commit()
+
+        assert not CaseModel.call_module_case("misp_event", {INSTANCE_NAME: None}, case, user)
+        identifier = Case_Connector_Instance.query.filter_by(case_id=case.id, instance_id=instance.id).first().identifier
+
+        # Nothing changed, MISP is not contacted
+        calls = dict(standin.stats()["calls"])
+        assert not CaseModel.call_module_case("misp_event", {INSTANCE_NAME: identifier}, case, user)
+        assert standin.stats()["calls"] == calls
+
+        # Only the modified task is sent
+        task = case.tasks.first()
+        task.title = "Renamed task"
+        task.last_modif = datetime.datetime.now(tz=datetime.timezone.utc) + datetime.timedelta(minutes=1)
+        db.session.commit()
+        assert not CaseModel.call_module_case("misp_event", {INSTANCE_NAME: identifier}, case, user)
+        new_calls = standin.stats()["calls"]
+        assert new_calls.get("update_object", 0) == calls.get("update_object", 0) + 1
+        assert new_calls.get("add_object", 0) == calls.get("add_object", 0)
+        assert new_calls.get("update_event", 0) == 0
+
+        event = standin.get_event(identifier)["Event"]
+        titles = [attribute["value"] for misp_object in event["Object"] if misp_object["name"] == "flowintel-task"
+                  for attribute in misp_object["Attribute"] if attribute["object_relation"] == "title"]
+        assert "Renamed task" in titles and len(event["Object"]) == 5
+
+def test_push_case_server_error(app, standin):
+    standin, url = standin
+    standin.error_rate = 1
+    with app.app_context():
+        generate(nb_orgs=1, nb_users=2, nb_cases=1, nb_tasks=1)
+        create_instance(url)
+        get_modules_list()
+        res = CaseModel.call_module_case("misp_event", {INSTANCE_NAME: None}, Case.query.first(), User.query.get(1))
+        assert res["instances"] == {INSTANCE_NAME: "Error connecting to MISP"}
+
+def test_push_reuses_client(app, standin):
+    standin, url = standin
+    with app.app_context():
+        generate(nb_orgs=1, nb_users=2, nb_cases=2, nb_tasks=1)
+        create_instance(url)
+        user = User.query.get(1)
+        get_modules_list()
+        reused = registry.stats()["reused"]
+
+        for case in Case.query.all():
+            assert not CaseModel.call_module_case("misp_event", {INSTANCE_NAME: None}, case, user)
+        # The connection is only checked by the first push
+        assert standin.stats()["calls"]["version"] == 1
+        assert registry.stats()["reused"] == reused + 1
+        assert standin.stats()["events"] == 2
+
+def test_push_unknown_instance(app, standin):
+    with app.app_context():
+        generate(nb_orgs=1, nb_users=2, nb_cases=1, nb_tasks=1)
+        get_modules_list()
+        res = CaseModel.call_module_case("misp_event", {"unknown": None}, Case.query.first(), User.query.get(1))
+        assert res == {"message": "unknown: Instance not found", "instances": {"unknown": "Instance not found"}}
+
+def add_instance(name, url, connector_id):
+    instance = Connector_Instance(name=name, url=url, description="MISP stand-in", type="send_to",
+                                  uuid=f"00000000-0000-4000-8000-00000000001{len(name) % 10}", connector_id=connector_id)
+    db.session.add(instance)
+    db.session.flush()
+    db.session.add(User_Connector_Instance(user_id=1, instance_id=instance.id, api_key=misp_standin.API_KEY))
+    db.session.commit()
+    return instance
+
+def test_push_several_instances(app, standin):
+    standin, url = standin
+    server_slow, slow, url_slow = misp_standin.start(latency=0.3)
+    server_down, down, url_down = misp_standin.start(error_rate=1)
+    app.config["MODULE_INSTANCE_TIMEOUT"] = 5
+    try:
+        with app.app_context():
+            generate(nb_orgs=1, nb_users=2, nb_cases=1, nb_tasks=1)
+            instance = create_instance(url)
+            instance_slow = add_instance("misp-slow", url_slow, instance.connector_id)
+            add_instance("misp-down", url_down, instance.connector_id)
+            user = User.query.get(1)
+            case = Case.query.first()
+            get_modules_list()
+
+            instances = {INSTANCE_NAME: None, "misp-slow": None, "misp-down": None}
+            res = CaseModel.call_module_case("misp_event", instances, case, user)
+            # The failing instance doesn't stop the others
+            assert res["instances"] == {"misp-down": "Error connecting to MISP"}
+            assert standin.stats()["events"] == 1 and slow.stats()["events"] == 1
+            identifiers = {cc.instance_id for cc in Case_Connector_Instance.query.filter_by(case_id=case.id).all()}
+            assert identifiers == {instance.id, instance_slow.id}
+    finally:
+        for server in (server_slow, server_down):
+            server.shutdown()
+            server.server_close()
+
+def test_push_deadline(app, standin):
+    standin, url = standin
+    standin.latency = 0.5
+    app.config["MODULE_INSTANCE_TIMEOUT"] = 0.2
+    with app.app_context():
+        generate(nb_orgs=1, nb_users=2, nb_cases=1, nb_tasks=1)
+        create_instance(url)
+        case = Case.query.first()
+        get_modules_list()
+        res = CaseModel.call_module_case("misp_event", {INSTANCE_NAME: None}, case, User.query.get(1))
+        assert res["instances"] == {INSTANCE_NAME: "No answer before the deadline"}
+        assert not Case_Connector_Instance.query.filter_by(case_id=case.id).first()
+
+        # The event created after the deadline is saved when the call ends, not left orphan
+        for _ in range(50):
+            db.session.rollback()
+            case_instance = Case_Connector_Instance.query.filter_by(case_id=case.id).first()
+            if case_instance:
+                break
+            time.sleep(0.1)
+        assert standin.stats()["events"] == 1 and case_instance.identifier == str(next(iter(standin.events)))
+
+def test_push_deadline_starts_with_the_call(app, standin):
+    standin, url = standin
+    standin.latency = 0.2
+    # The first push makes 5 requests and the second one 2 on the reused client, after waiting for the only worker
+    app.config.update({"MODULE_WORKERS": 1, "MODULE_INSTANCE_TIMEOUT": 1.2})
+    with app.app_context():
+        generate(nb_orgs=1, nb_users=2, nb_cases=1, nb_tasks=1)
+        instance = create_instance(url)
+        add_instance("misp-second", url, instance.connector_id)
+        get_modules_list()
+        start = time.monotonic()
+        res = CaseModel.call_module_case("misp_event", {INSTANCE_NAME: None, "misp-second": None}, Case.query.first(), User.query.get(1))
+        assert res is None and standin.stats()["events"] == 2
+        assert time.monotonic() - start > 1.2
@@ -0,0 +1,69 @@
+import datetime
+import pytest
+from app import db
+from app.db_class.db import Task, Task_User, File
+from benchmarks.dataset import generate
+
+API_KEY = "admin_api_key"
+NB_TASKS = 30
+
+
+def assign_tasks(app):
+    """Assign every task to the admin, a third of them without deadline and one with a file"""
+    with app.app_context():
+        generate(nb_orgs=2, nb_users=5, nb_cases=10, nb_tasks=3)
+        tasks = Task.query.order_by(Task.id).all()
+        for index, task in enumerate(tasks):
+            db.session.add(Task_User(task_id=task.id, user_id=1))
+            task.deadline = None if index % 3 == 0 else datetime.datetime(2025, 1, 1 + index % 5)
+        db.session.add(File(name="file.txt", task_id=tasks[0].id, uuid="00000000-0000-4000-8000-000000000001"))
+        db.session.commit()
+
+
+def fetch_all(client, sort, order, limit=7):
+    tasks, cursor = list(), None
+    while True:
+        url = f"/api/my_assignment/tasks?sort={sort}&order={order}&limit={limit}"
+        if cursor:
+            url += f"&cursor={cursor}"
+        response = client.get(url, headers={"X-API-KEY": API_KEY})
+        assert response.status_code == 200
+        tasks.extend(response.json["tasks"])
+        cursor = response.json["next_cursor"]
+        if not cursor:
+            return tasks
+
+
+@pytest.mark.query_budget(8)
+def test_assigned_tasks_page(client, app):
+    assign_tasks(app)
+    response = client.get("/api/my_assignment/tasks?limit=50", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200
+    tasks = response.json["tasks"]
+    assert len(tasks) == NB_TASKS and response.json["next_cursor"] is None
+    task = next(task for task in tasks if task["nb_files"])
+    assert task["case_title"].startswith("Bench case") and task["status"]["name"] == "Created"
+    assert 1 in [user["id"] for user in task["users"]] and len(task["users"]) == 2
+    assert task["tags"] and task["clusters"] and task["nb_notes"] == 1
+
+def test_keyset_pages(client, app):
+    assign_tasks(app)
+    for sort in ["deadline", "case_title", "title"]:
+        for order in ["asc", "desc"]:
+            tasks = fetch_all(client, sort, order)
+            assert len({task["id"] for task in tasks}) == NB_TASKS
+            values = [task[sort] for task in tasks]
+            present = [value for value in values if value is not None]
+            # Empty deadlines come last whatever the order
+            assert values == present + [None] * (len(values) - len(present))
+            assert present == sorted(present, reverse=order == "desc")
+
+def test_assigned_tasks_errors(client, app):
+    assign_tasks(app)
+    assert client.get("/api/my_assignment/tasks?sort=password_hash", headers={"X-API-KEY": API_KEY}).status_code == 400
+    assert client.get("/api/my_assignment/tasks?order=up", headers={"X-API-KEY": API_KEY}).status_code == 400
+    assert client.get("/api/my_assignment/tasks?cursor=abc", headers={"X-API-KEY": API_KEY}).status_code == 400
+    cursor = client.get("/api/my_assignment/tasks?sort=title&limit=1", headers={"X-API-KEY": API_KEY}).json["next_cursor"]
+    # A cursor is only valid for the sort it was made for
+    assert client.get(f"/api/my_assignment/tasks?sort=deadline&cursor={cursor}", headers={"X-API-KEY": API_KEY}).status_code == 400
+    assert client.get("/api/my_assignment/tasks?user_id=1000", headers={"X-API-KEY": API_KEY}).status_code == 404
@@ -0,0 +1,60 @@
+import pytest
+from sqlalchemy import update
+from app import db
+from app.db_class.db import Case
+from benchmarks.dataset import generate
+
+API_KEY = "admin_api_key"
+NB_CASES = 10
+
+
+def create_cases(app, nb_cases=NB_CASES, nb_completed=0):
+    with app.app_context():
+        generate(nb_orgs=2, nb_users=5, nb_cases=nb_cases, nb_tasks=3)
+        if nb_completed:
+            db.session.execute(update(Case).where(Case.id <= nb_completed).values(completed=True))
+            db.session.commit()
+
+
+# The tags, clusters, connectors, custom tags and links are loaded for the whole page
+@pytest.mark.query_budget(7)
+def test_list_cases_budget(client, app):
+    create_cases(app)
+    response = client.get("/api/case/all", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200 and len(response.json["cases"]) == NB_CASES
+    case = response.json["cases"][0]
+    assert case["tags"] and case["clusters"]
+
+def test_list_cases_queries_constant(client, app, query_budget):
+    create_cases(app, nb_cases=20, nb_completed=18)
+    with query_budget(100) as small:
+        response = client.get("/api/case/all", headers={"X-API-KEY": API_KEY})
+    assert len(response.json["cases"]) == 2
+    with app.app_context():
+        db.session.execute(update(Case).values(completed=False))
+        db.session.commit()
+    # Ten times more cases, not one more statement
+    with query_budget(small.profile.queries):
+        response = client.get("/api/case/all", headers={"X-API-KEY": API_KEY})
+    assert len(response.json["cases"]) == 20
+
+@pytest.mark.query_budget(7)
+def test_list_completed_cases_budget(client, app):
+    create_cases(app, nb_completed=4)
+    response = client.get("/api/case/completed", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200 and len(response.json["cases"]) == 4
+    assert all(case["completed"] and case["tags"] for case in response.json["cases"])
+
+@pytest.mark.query_budget(12)
+def test_get_case_budget(client, app):
+    create_cases(app)
+    response = client.get("/api/case/1", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200
+
+def test_budget_report(app, query_budget):
+    with pytest.raises(pytest.fail.Exception) as error:
+        with query_budget(2):
+            with app.app_context():
+                for _ in range(3):
+                    db.session.execute(db.text("SELECT 1"))
+    assert "3 queries, budget is 2" in str(error.value) and "3x SELECT 1" in str(error.value)
@@ -0,0 +1,133 @@
+import gzip
+import json
+from app import db
+from app.db_class.db import Taxonomy, Tags, Galaxy, Cluster, Custom_Tags
+
+API_KEY = "read_api_key"
+
+
+def create_reference_data():
+    taxo = Taxonomy(name="tlp", description="test", exclude=False)
+    other = Taxonomy(name="pap", description="test", exclude=False)
+    galaxy = Galaxy(name="Threat Actor", description="test", icon="user-secret", exclude=False)
+    db.session.add_all([taxo, other, galaxy])
+    db.session.flush()
+    db.session.add_all([
+        Tags(name="tlp:amber", color="#ffc000", taxonomy_id=taxo.id),
+        Tags(name="tlp:amber+strict", color="#ffc000", taxonomy_id=taxo.id),
+        Tags(name="tlp:red", color="#ff2b2b", taxonomy_id=taxo.id),
+        Tags(name="pap:amber", color="#ffc000", taxonomy_id=other.id),
+        Cluster(name="APT28", tag='misp-galaxy:threat-actor="APT28"', galaxy_id=galaxy.id,
+                meta=json.dumps({"synonyms": ["Fancy Bear", "Sofacy"]})),
+        Cluster(name="APT29", tag='misp-galaxy:threat-actor="APT29"', galaxy_id=galaxy.id,
+                meta=json.dumps({"synonyms": ["Cozy Bear"]}))
+    ])
+    db.session.commit()
+
+
+def test_typeahead_prefix(client, app):
+    with app.app_context():
+        create_reference_data()
+    response = client.get("/api/case/typeahead?q=tlp:am", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200
+    assert [result["name"] for result in response.json["results"]] == ["tlp:amber", "tlp:amber+strict"]
+
+def test_typeahead_synonym_and_scope(client, app):
+    with app.app_context():
+        create_reference_data()
+    response = client.get("/api/case/typeahead?q=fancy", headers={"X-API-KEY": API_KEY})
+    results = response.json["results"]
+    assert response.status_code == 200 and results[0]["name"] == "APT28" and results[0]["synonym"] == "Fancy Bear"
+
+    response = client.get("/api/case/typeahead?q=amber&taxonomies=pap", headers={"X-API-KEY": API_KEY})
+    assert [result["name"] for result in response.json["results"]] == ["pap:amber"]
+
+    response = client.get("/api/case/typeahead?q=bear&type=tag", headers={"X-API-KEY": API_KEY})
+    assert response.json["results"] == []
+
+def test_typeahead_similar(client, app):
+    with app.app_context():
+        create_reference_data()
+    response = client.get("/api/case/typeahead?q=sofcy", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200 and [result["name"] for result in response.json["results"]] == ["APT28"]
+
+def test_typeahead_excluded_taxonomy(client, app):
+    with app.app_context():
+        create_reference_data()
+        Taxonomy.query.filter_by(name="tlp").first().exclude = True
+        db.session.commit()
+    response = client.get("/api/case/typeahead?q=amber", headers={"X-API-KEY": API_KEY})
+    assert [result["name"] for result in response.json["results"]] == ["pap:amber"]
+
+def test_typeahead_wrong_limit(client):
+    response = client.get("/api/case/typeahead?q=tlp&limit=1000", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 400
+
+
+def test_bundle_api(client, app):
+    with app.app_context():
+        create_reference_data()
+    response = client.get("/api/case/get_taxonomies", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200 and [taxo["name"] for taxo in response.json["taxonomies"]] == ["tlp", "pap"]
+
+    response = client.get("/api/case/get_taxonomies", headers={"X-API-KEY": API_KEY, "If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+
+    response = client.post("/api/case/get_tags", headers={"X-API-KEY": API_KEY}, json={"taxonomies": ["pap", "unknown"]})
+    assert response.status_code == 200 and response.json["tags"]["unknown"] == []
+    assert [tag["name"] for tag in response.json["tags"]["pap"]] == ["pap:amber"]
+
+def test_bundle_versioned_url(client, app):
+    app.config["LOGIN_DISABLED"] = True
+    with app.app_context():
+        create_reference_data()
+    response = client.get('/case/bundle/old/clusters?galaxies=["Threat Actor"]')
+    assert response.status_code == 302
+    url = response.headers["Location"]
+
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200 and response.headers["Content-Encoding"] == "gzip"
+    assert "immutable" in response.headers["Cache-Control"]
+    clusters = json.loads(gzip.decompress(response.data))["clusters"]["Threat Actor"]
+    assert sorted(cluster["name"] for cluster in clusters) == ["APT28", "APT29"] and clusters[0]["icon"] == "user-secret"
+
+    with app.app_context():
+        Galaxy.query.filter_by(name="Threat Actor").first().exclude = True
+        db.session.commit()
+    assert client.get(url).status_code == 302
+
+
+def test_validate_all_invalid_names(client, app):
+    with app.app_context():
+        create_reference_data()
+    response = client.post("/api/case/create", headers={"X-API-KEY": "admin_api_key"},
+                           json={"title": "Test tags", "tags": ["tlp:red", "tlp:unknown", "tlp:white"], "clusters": ["APT28", "APT99"]})
+    assert response.status_code == 400
+    # tlp:white is a machinetag but it's not in the db
+    assert response.json["invalid"] == {"tags": ["tlp:unknown", "tlp:white"], "clusters": ["APT99"]}
+
+    response = client.post("/api/case/create", headers={"X-API-KEY": "admin_api_key"},
+                           json={"title": "Test tags", "tags": ["tlp:red"], "clusters": ["APT28"]})
+    assert response.status_code == 201
+
+def test_index_sees_same_size_changes(client, app):
+    with app.app_context():
+        create_reference_data()
+        db.session.add(Custom_Tags(name="urgent", color="#ff0000"))
+        db.session.commit()
+    case = {"title": "Test renames", "clusters": ["APT28"], "custom_tags": ["urgent"]}
+    assert client.post("/api/case/create", headers={"X-API-KEY": "admin_api_key"}, json=case).status_code == 201
+
+    with app.app_context():
+        # Same number of rows, same ids and same name lengths
+        cluster = Cluster.query.filter_by(name="APT28").first()
+        cluster.name, cluster.version = "APT27", 2
+        Custom_Tags.query.filter_by(name="urgent").first().name = "urgant"
+        Tags.query.filter_by(name="tlp:red").delete()
+        db.session.commit()
+    response = client.post("/api/case/create", headers={"X-API-KEY": "admin_api_key"}, json={**case, "title": "Test renames 2"})
+    assert response.status_code == 400 and response.json["invalid"] == {"clusters": ["APT28"], "custom_tags": ["urgent"]}
+    response = client.get("/api/case/typeahead?q=apt27", headers={"X-API-KEY": API_KEY})
+    assert [result["name"] for result in response.json["results"]] == ["APT27"]
+    response = client.get("/api/case/typeahead?q=tlp:red", headers={"X-API-KEY": API_KEY})
+    assert "tlp:red" not in [result["name"] for result in response.json["results"]]
@@ -0,0 +1,70 @@
+from app import db
+from app.db_class.db import Case_Tags, Case_Galaxy_Tags, Tags, Cluster, Connector, Connector_Instance, Case_Connector_Instance
+from benchmarks.dataset import generate
+
+API_KEY = "admin_api_key"
+
+
+def create_cases(app):
+    """Every case has tlp:white, cases 0 and 1 share two clusters, case 2 one, case 4 an event with case 0"""
+    with app.app_context():
+        cases = generate(nb_orgs=1, nb_users=1, nb_cases=5, nb_tasks=0)["cases"]
+        Case_Tags.query.delete()
+        Case_Galaxy_Tags.query.delete()
+        tag = Tags.query.filter_by(name="tlp:white").first()
+        clusters = [cluster.id for cluster in Cluster.query.order_by(Cluster.id).limit(2)]
+        db.session.add_all([Case_Tags(case_id=case_id, tag_id=tag.id) for case_id in cases])
+        for case_index, cluster_ids in [(0, clusters), (1, clusters), (2, clusters[:1])]:
+            db.session.add_all([Case_Galaxy_Tags(case_id=cases[case_index], cluster_id=cluster_id) for cluster_id in cluster_ids])
+
+        connector = Connector(name="Misp", uuid="00000000-0000-4000-8000-000000000001")
+        db.session.add(connector)
+        db.session.flush()
+        instance = Connector_Instance(name="misp", url="http://misp", type="send_to", connector_id=connector.id,
+                                      uuid="00000000-0000-4000-8000-000000000002")
+        db.session.add(instance)
+        db.session.flush()
+        for case_index in [0, 4]:
+            db.session.add(Case_Connector_Instance(case_id=cases[case_index], instance_id=instance.id, identifier="42"))
+        db.session.commit()
+    return cases
+
+
+def test_similar_ranking(client, app):
+    cases = create_cases(app)
+    response = client.get(f"/api/case/{cases[0]}/similar", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200
+    similar = response.json["cases"]
+    assert [loc["id"] for loc in similar] == [cases[1], cases[4], cases[2], cases[3]]
+    assert similar[0]["shared"]["clusters"] and similar[0]["shared"]["tags"] == ["tlp:white"]
+    assert similar[1]["shared"]["connectors"] == ["misp: 42"]
+    # Every case has tlp:white, sharing only it is a weak link
+    assert similar[-1]["score"] < 0.2 < similar[0]["score"]
+
+    response = client.get(f"/api/case/{cases[0]}/similar?limit=1", headers={"X-API-KEY": API_KEY})
+    assert [loc["id"] for loc in response.json["cases"]] == [cases[1]]
+
+def test_similar_follows_writes(client, app):
+    cases = create_cases(app)
+    client.get(f"/api/case/{cases[3]}/similar", headers={"X-API-KEY": API_KEY})
+    with app.app_context():
+        Case_Tags.query.filter_by(case_id=cases[3]).delete()
+        db.session.commit()
+    response = client.get(f"/api/case/{cases[3]}/similar", headers={"X-API-KEY": API_KEY})
+    assert response.json["cases"] == []
+
+def test_similar_errors(client, app):
+    cases = create_cases(app)
+    assert client.get(f"/api/case/{cases[0]}/similar?limit=0", headers={"X-API-KEY": API_KEY}).status_code == 400
+    assert client.get("/api/case/1000/similar", headers={"X-API-KEY": API_KEY}).status_code == 404
+
+def test_similar_follows_moved_tag(client, app):
+    cases = create_cases(app)
+    assert client.get(f"/api/case/{cases[3]}/similar", headers={"X-API-KEY": API_KEY}).json["cases"]
+    with app.app_context():
+        # Same number of rows and same ids, the tag goes to another case
+        case_tag = Case_Tags.query.filter_by(case_id=cases[3]).first()
+        case_tag.case_id = cases[4]
+        db.session.commit()
+    response = client.get(f"/api/case/{cases[3]}/similar", headers={"X-API-KEY": API_KEY})
+    assert response.json["cases"] == []
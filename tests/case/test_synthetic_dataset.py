@@ -0,0 +1,26 @@
+from app import db
+from app.utils.init_db import create_user_test
+from app.db_class.db import Case, Task, User
+from benchmarks.dataset import generate
+from benchmarks import runner
+
+
+def test_generate_dataset(app):
+    with app.app_context():
+        data = generate(nb_orgs=2, nb_users=4, nb_cases=3, nb_tasks=2, seed=1)
+        assert len(data["cases"]) == 3 and len(data["users"]) == 4
+        assert Case.query.count() == 3 and Task.query.count() == 6
+        assert User.query.filter_by(email="user3@bench.local").first().org_id == data["orgs"][1]
+        uuids = [case.uuid for case in Case.query.order_by(Case.id)]
+
+        # Same seed, same rows
+        db.drop_all()
+        db.create_all()
+        create_user_test()
+        generate(nb_orgs=2, nb_users=4, nb_cases=3, nb_tasks=2, seed=1)
+        assert [case.uuid for case in Case.query.order_by(Case.id)] == uuids
+
+def test_runner(app):
+    results = runner.run_size(nb_cases=3, nb_tasks=2, nb_orgs=1, nb_users=2, repeat=2, names=["case_view", "import", "delete"])
+    assert [result["benchmark"] for result in results] == ["case_view", "import", "delete"]
+    assert all(result["status"] == [200] for result in results)
@@ -3,8 +3,54 @@ import os
 sys.path.append(os.getcwd())
 from app import create_app, db
 from app.utils.init_db import create_user_test
+from app.utils.profiler import RequestProfile, MAX_DUPLICATES
+from flask.testing import FlaskClient
+from sqlalchemy import event
 import pytest
 
+
+class QueryRecorder:
+    """Record the statements executed on an engine"""
+    def __init__(self, engine):
+        self.engine = engine
+        self.profile = RequestProfile()
+
+    def __enter__(self):
+        self.profile = RequestProfile()
+        event.listen(self.engine, "after_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "after_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, *args):
+        self.profile.add(statement, 0)
+
+
+def check_budget(profile, budget, label):
+    """Fail the test if more statements than the budget were executed, listing the repeated ones"""
+    if profile.queries <= budget:
+        return
+    lines = [f"{label}: {profile.queries} queries, budget is {budget}"]
+    for statement, nb in profile.duplicates()[:MAX_DUPLICATES]:
+        lines.append(f"  {nb}x {' '.join(statement.split())}")
+    pytest.fail("\n".join(lines), pytrace=False)
+
+
+class BudgetClient(FlaskClient):
+    """Test client failing when a request executes more statements than its budget"""
+    engine = None
+    budget = None
+
+    def open(self, *args, **kwargs):
+        if self.budget is None:
+            return super().open(*args, **kwargs)
+        with QueryRecorder(self.engine) as recorder:
+            response = super().open(*args, **kwargs)
+        check_budget(recorder.profile, self.budget, f"{response.request.method} {response.request.path}")
+        return response
+
+
 @pytest.fixture
 def app():
     os.environ.setdefault("FLASKENV", "testing")
@@ -21,11 +67,39 @@ def app():
 
     yield app
 
+@pytest.fixture
+def default_query_budget():
+    """Statements allowed per request of the client, None to not check, overridden by directories"""
+    return None
+
 @pytest.fixture()
-def client(app):
-    return app.test_client()
+def client(app, request, default_query_budget):
+    app.test_client_class = BudgetClient
+    client = app.test_client()
+    with app.app_context():
+        client.engine = db.engine
+    marker = request.node.get_closest_marker("query_budget")
+    client.budget = marker.args[0] if marker else default_query_budget
+    return client
+
+@pytest.fixture()
+def query_budget(app):
+    """Context manager failing when its block executes more statements than the budget"""
+    with app.app_context():
+        engine = db.engine
+
+    class Budget(QueryRecorder):
+        def __init__(self, budget):
+            super().__init__(engine)
+            self.budget = budget
+
+        def __exit__(self, *exc):
+            super().__exit__(*exc)
+            if not exc[0]:
+                check_budget(self.profile, self.budget, "Block")
+    return Budget
 
 
 @pytest.fixture()
 def runner(app):
-    return app.test_cli_runner()
\ No newline at end of file
+    return app.test_cli_runner()
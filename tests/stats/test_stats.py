@@ -0,0 +1,90 @@
+import datetime
+from app import db
+from app.db_class.db import Case, Task, Task_User, Stats_Rollup
+from app.stats import stats_core as StatsModel
+
+API_KEY = "admin_api_key"
+
+
+def at(days_ago, hour=12):
+    """Naive UTC datetime of days_ago days before today"""
+    day = datetime.datetime.now(tz=datetime.timezone.utc).date() - datetime.timedelta(days=days_ago)
+    return datetime.datetime.combine(day, datetime.time(hour))
+
+
+def day(days_ago):
+    return at(days_ago).date().isoformat()
+
+
+def create_cases(app):
+    """Case 0 closed after 7 days past its deadline, case 1 open and overdue, a task of case 1 closed after 4 days"""
+    with app.app_context():
+        cases = [
+            Case(title="closed", uuid="00000000-0000-4000-8000-000000000001", creation_date=at(10), last_modif=at(3),
+                 deadline=at(5), finish_date=at(3), completed=True, status_id=1, owner_org_id=1, nb_tasks=0),
+            Case(title="overdue", uuid="00000000-0000-4000-8000-000000000002", creation_date=at(8), last_modif=at(8),
+                 deadline=at(2), completed=False, status_id=1, owner_org_id=1, nb_tasks=1)
+        ]
+        db.session.add_all(cases)
+        db.session.flush()
+        task = Task(title="task", uuid="00000000-0000-4000-8000-000000000003", case_id=cases[1].id, creation_date=at(8),
+                    last_modif=at(4), finish_date=at(4), completed=True, status_id=1, case_order_id=-1, nb_notes=0)
+        db.session.add(task)
+        db.session.flush()
+        db.session.add(Task_User(task_id=task.id, user_id=1))
+        db.session.commit()
+        return [case.id for case in cases]
+
+
+def test_summary(client, app):
+    create_cases(app)
+    response = client.get(f"/api/stats/summary?start={day(12)}&end={day(0)}", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200
+    summary = response.json
+    assert (summary["opened"], summary["closed"], summary["open"], summary["overdue"]) == (2, 1, 1, 1)
+    days = {loc["day"]: loc for loc in summary["days"]}
+    assert (days[day(5)]["open"], days[day(5)]["overdue"]) == (2, 1)
+    assert (days[day(3)]["open"], days[day(3)]["overdue"]) == (1, 0)
+    assert days[day(2)]["overdue"] == 1
+    # 168 hours falls in the 120-168 bucket
+    assert 120 < summary["median_hours"] <= 168 and summary["mean_hours"] == 168
+
+    response = client.get(f"/api/stats/assignees?start={day(12)}&end={day(0)}", headers={"X-API-KEY": API_KEY})
+    assert [(loc["id"], loc["opened"], loc["closed"], loc["open"]) for loc in response.json["users"]] == [(1, 1, 1, 0)]
+
+def test_past_days_from_rollups(client, app):
+    cases = create_cases(app)
+    client.get(f"/api/stats/summary?start={day(12)}&end={day(0)}", headers={"X-API-KEY": API_KEY})
+    with app.app_context():
+        # From the first creation to yesterday
+        assert Stats_Rollup.query.count() == 10
+        Case.query.filter_by(id=cases[1]).delete()
+        db.session.commit()
+
+    response = client.get(f"/api/stats/summary?start={day(12)}&end={day(0)}", headers={"X-API-KEY": API_KEY})
+    days = {loc["day"]: loc for loc in response.json["days"]}
+    # Past days keep what was rolled up, today is computed
+    assert days[day(1)]["open"] == 1 and days[day(0)]["open"] == 0
+    with app.app_context():
+        assert StatsModel.rollup_missing() == 0
+
+def test_completion_records_finish_date(client, app):
+    cases = create_cases(app)
+    assert client.get(f"/api/case/{cases[1]}/complete", headers={"X-API-KEY": API_KEY}).status_code == 200
+    with app.app_context():
+        assert Case.query.get(cases[1]).finish_date is not None
+    response = client.get(f"/api/stats/summary?start={day(0)}", headers={"X-API-KEY": API_KEY})
+    assert (response.json["closed"], response.json["open"], response.json["overdue"]) == (1, 0, 0)
+
+    client.get(f"/api/case/{cases[1]}/complete", headers={"X-API-KEY": API_KEY})
+    with app.app_context():
+        assert Case.query.get(cases[1]).finish_date is None
+
+def test_stats_errors(client, app):
+    create_cases(app)
+    assert client.get("/api/stats/summary?kind=note", headers={"X-API-KEY": API_KEY}).status_code == 400
+    assert client.get("/api/stats/summary?start=2024-13-01", headers={"X-API-KEY": API_KEY}).status_code == 400
+    assert client.get(f"/api/stats/summary?start={day(0)}&end={day(1)}", headers={"X-API-KEY": API_KEY}).status_code == 400
+    assert client.get("/api/stats/summary?org_id=1", headers={"X-API-KEY": "editor_api_key"}).status_code == 403
+    response = client.get("/api/stats/orgs", headers={"X-API-KEY": "editor_api_key"})
+    assert response.status_code == 200 and response.json["orgs"] == []
@@ -193,3 +193,25 @@ def test_move_task_down(client):
 
     response = client.get("/api/template/case/1/task/1", headers={"X-API-KEY": API_KEY})
     assert response.status_code == 200 and response.json["case_order_id"] == 2
+
+def test_reorder_tasks(client):
+    test_create_case_template(client)
+    test_create_task_template(client)
+    test_create_task_template(client, flag=False)
+
+    response = client.post("/api/template/case/1/add_tasks", 
+                           content_type='application/json',
+                           headers={"X-API-KEY": API_KEY},
+                           json={"tasks": [1, 2]}
+                        )
+    assert response.status_code == 200 and b"Tasks added" in response.data
+
+    response = client.post("/api/template/case/1/reorder_tasks", headers={"X-API-KEY": API_KEY}, json={"tasks": [2, 1]})
+    assert response.status_code == 200 and b"Order changed" in response.data
+
+    response = client.get("/api/template/case/1/task/1", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200 and response.json["case_order_id"] == 2
+
+    response = client.get("/api/template/case/1/remove_task/2", headers={"X-API-KEY": API_KEY})
+    response = client.get("/api/template/case/1/task/1", headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200 and response.json["case_order_id"] == 1